@@ -1,12 +1,37 @@
-import ast
+import asyncio
+import inspect
 import json
+import logging
 import os
+import time
+from collections.abc import AsyncIterator
 
 import chainlit as cl
 import engineio
+from conversation import (
+    ConversationHistory,
+    ResponseCache,
+    StreamStats,
+    coalesce,
+    replay,
+)
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
-from pdf_context import process_pdf_file
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletionMessageParam
+from pdf_context import ExtractionCache, iter_pages
+from retrieval import (
+    BM25Retriever,
+    ChunkStore,
+    EmbeddingCache,
+    HashingEmbedder,
+    HybridRetriever,
+    OpenAIEmbedder,
+    Retriever,
+    StoreRetriever,
+    VectorRetriever,
+    retrieve_context,
+)
+from telemetry import configure, count, measure_stream, observe, span
 
 # Increase the number of packets allowed in a single payload to prevent "Too
 # many packets in payload" errors. This is especially helpful during streaming
@@ -15,6 +40,13 @@ engineio.payload.Payload.max_decode_packets = 200
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Export traces and latency metrics as set by TELEMETRY (off by default):
+# "otel", "prometheus" (on TELEMETRY_PORT), "jsonl" (to TELEMETRY_FILE) or
+# "auto".
+configure()
+
 # Configure OpenAI
 api_key = os.getenv("OPENAI_API_KEY")
 base_url = os.getenv("OPENAI_BASE_URL")
@@ -22,6 +54,85 @@ model = os.getenv("OPENAI_MODEL")
 
 client = AsyncOpenAI(api_key=api_key, base_url=base_url)
 
+# Cache extracted text so re-uploaded documents skip parsing. Set
+# PDF_CACHE_DIR to also persist it on disk across restarts.
+extraction_cache = ExtractionCache(directory=os.getenv("PDF_CACHE_DIR"))
+
+# Bound how many attachments are extracted at once across all sessions, so a
+# burst of uploads can't starve token streaming for other users.
+extraction_semaphore = asyncio.BoundedSemaphore(
+    int(os.getenv("MAX_CONCURRENT_EXTRACTIONS", "4"))
+)
+
+# Streamed answers are emitted in chunks, at most every STREAM_INTERVAL
+# seconds or STREAM_MAX_CHARS characters, rather than token by token.
+stream_interval = float(os.getenv("STREAM_INTERVAL", "0.05"))
+stream_max_chars = int(os.getenv("STREAM_MAX_CHARS", "256"))
+
+# Seconds a tool call may take before the model is told it timed out, and
+# maximum number of rounds of tool calls per answer.
+tool_timeout = float(os.getenv("TOOL_TIMEOUT", "30"))
+max_tool_rounds = int(os.getenv("MAX_TOOL_ROUNDS", "5"))
+
+# Maximum number of tokens of past turns resent with each message; older
+# turns are folded into a summary.
+history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+
+# Maximum number of tokens of attachment content injected per message.
+context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000"))
+
+# Embed attachment chunks with EMBEDDING_MODEL when set; otherwise fall back
+# to an offline hashing embedder (lexical matching only). Embeddings are
+# cached, so re-uploaded documents and repeated questions aren't re-embedded;
+# set EMBEDDING_CACHE_DIR to also persist them on disk across restarts.
+embedding_model = os.getenv("EMBEDDING_MODEL")
+embedder = (
+    OpenAIEmbedder(
+        OpenAI(api_key=api_key, base_url=base_url),
+        embedding_model,
+        max_concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", "4")),
+        cache=EmbeddingCache(directory=os.getenv("EMBEDDING_CACHE_DIR")),
+    )
+    if embedding_model
+    else HashingEmbedder()
+)
+
+# Answers to messages already sent with the same history and context are
+# replayed from a cache for RESPONSE_CACHE_TTL seconds (0, the default,
+# disables it). Set RESPONSE_CACHE_SIMILARITY to also reuse the answers of
+# messages whose embeddings are at least that similar. Answers are only
+# replayed within the session that received them, unless RESPONSE_CACHE_SCOPE
+# is "shared": every user of the worker then gets the answers of the others.
+response_cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", "0"))
+response_cache_shared = os.getenv("RESPONSE_CACHE_SCOPE", "session") == "shared"
+response_cache_similarity = os.getenv("RESPONSE_CACHE_SIMILARITY")
+response_cache = (
+    ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+        ttl=response_cache_ttl,
+        embed=embedder.embed if response_cache_similarity else None,
+        threshold=float(response_cache_similarity or "0.95"),
+    )
+    if response_cache_ttl > 0
+    else None
+)
+
+# Number of attachment chunks injected per question.
+retrieval_top_k = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+# Seconds to wait for query embedding and vector search before answering
+# from lexical matches only.
+retrieval_budget = float(os.getenv("RETRIEVAL_BUDGET", "2"))
+
+# Optional corpus ingested with `python -m ingestion`, searched alongside the
+# attachments. The store is memory-mapped, so opening it is instant.
+index_dir = os.getenv("INDEX_DIR")
+corpus = (
+    StoreRetriever(ChunkStore(index_dir, readonly=True), embedder)
+    if index_dir
+    else None
+)
+
 
 # Example dummy function
 def get_current_weather(location, unit="fahrenheit"):
@@ -65,104 +176,125 @@ tools = [
 @cl.on_chat_start
 def start_chat():
     cl.user_session.set(
-        "message_history",
-        [{"role": "system", "content": "You are a helpful assistant."}],
+        "history",
+        ConversationHistory(
+            "You are a helpful assistant.", max_tokens=history_token_budget
+        ),
+    )
+    retrievers: dict[str, Retriever | StoreRetriever] = {
+        "bm25": BM25Retriever(),
+        "vector": VectorRetriever(embedder),
+    }
+    if corpus is not None:
+        retrievers["corpus"] = corpus
+    cl.user_session.set(
+        "retriever",
+        HybridRetriever(
+            retrievers,
+            budgets={"vector": retrieval_budget, "corpus": retrieval_budget},
+        ),
     )
 
 
-@cl.step(type="tool")
-async def call_tool(tool_call, message_history):
-    function_name = tool_call.function.name
-    arguments = ast.literal_eval(tool_call.function.arguments)
-
-    if function_name == "get_current_weather":
-        current_weather = get_current_weather(
-            location=arguments.get("location"),
-            unit=arguments.get("unit"),
-        )
+# Functions the model can call, by name. Sync functions run in worker threads.
+tool_functions = {"get_current_weather": get_current_weather}
 
-        message_history.append(
-            {
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "name": function_name,
-                "content": current_weather,
-            }
-        )
 
-        return current_weather
-    else:
+@cl.step(type="tool")
+async def call_tool(tool_call):
+    """Run a tool call, returning its result or an error for the model."""
+    function_name = tool_call.function.name
+    function = tool_functions.get(function_name)
+    if function is None:
         return "Function not found"
 
-
-@cl.on_message
-async def main(message: cl.Message):
-    message_history = cl.user_session.get("message_history")
-
-    # Handle attachments
-    file_content = ""
-    if message.elements:
-        for element in message.elements:
-            if element.name.endswith(".pdf") and element.path:
-                try:
-                    file_content += process_pdf_file(element.path, element.name)
-                except Exception as e:
-                    file_content += f"\n\nError reading PDF '{element.name}': {e!s}\n"
-
-    user_message = message.content
-    if file_content:
-        user_message += file_content
-
-    message_history.append({"role": "user", "content": user_message})
-
-    msg = cl.Message(content="")
-
-    # Send an empty message to start the stream UI
-    await msg.send()
-
-    # Create the completion with streaming
-    stream = await client.chat.completions.create(
-        model=model,
-        messages=message_history,
-        tools=tools,
-        tool_choice="auto",
-        stream=True,
-    )
-
-    cur_tool_calls = []
-
+    with span("tool.call", tool=function_name) as call:
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+            if inspect.iscoroutinefunction(function):
+                result = function(**arguments)
+            else:
+                result = cl.make_async(function)(**arguments)
+            return str(await asyncio.wait_for(result, tool_timeout))
+        except TimeoutError:
+            call.set(outcome="timeout")
+            return f"Function timed out after {tool_timeout:g}s"
+        except Exception as e:
+            call.set(outcome="error")
+            return f"Function failed: {e!s}"
+
+
+async def stream_deltas(stream, tool_calls: list | None = None) -> AsyncIterator[str]:
+    """Yield the text deltas of a completion stream, collecting its tool calls."""
     async for part in stream:
         if not part.choices:
             continue
 
         # Handle new tool calls
-        if part.choices[0].delta.tool_calls:
+        if part.choices[0].delta.tool_calls and tool_calls is not None:
             for tool_call_delta in part.choices[0].delta.tool_calls:
                 index = tool_call_delta.index
 
-                if index == len(cur_tool_calls):
-                    cur_tool_calls.append(tool_call_delta)
+                if index == len(tool_calls):
+                    tool_calls.append(tool_call_delta)
                 else:
                     # We are updating an existing tool call
                     if tool_call_delta.id:
-                        cur_tool_calls[index].id = tool_call_delta.id
+                        tool_calls[index].id = tool_call_delta.id
                     if tool_call_delta.function.name:
-                        cur_tool_calls[index].function.name = (
-                            cur_tool_calls[index].function.name or ""
+                        tool_calls[index].function.name = (
+                            tool_calls[index].function.name or ""
                         ) + tool_call_delta.function.name
                     if tool_call_delta.function.arguments:
-                        cur_tool_calls[index].function.arguments = (
-                            cur_tool_calls[index].function.arguments or ""
+                        tool_calls[index].function.arguments = (
+                            tool_calls[index].function.arguments or ""
                         ) + tool_call_delta.function.arguments
 
         # Handle content
         if part.choices[0].delta.content:
-            token = part.choices[0].delta.content
-            await msg.stream_token(token)
+            yield part.choices[0].delta.content
+
+
+async def stream_answer(
+    msg: cl.Message,
+    message_history: list[ChatCompletionMessageParam],
+    stats: StreamStats,
+) -> int:
+    """Stream the model's answer into a message, running its tool calls.
+
+    The answer is streamed in coalesced chunks, each one a websocket emit.
+    Tools are offered for up to max_tool_rounds rounds of calls, then the
+    model has to answer.
+
+    Returns:
+        The number of rounds of tool calls.
+    """
+    for tool_round in range(max_tool_rounds + 1):
+        options = (
+            {"tools": tools, "tool_choice": "auto"}
+            if tool_round < max_tool_rounds
+            else {}
+        )
+        started = time.perf_counter()
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=message_history,
+            stream=True,
+            **options,
+        )
+
+        cur_tool_calls = []
+        async for text in coalesce(
+            measure_stream(stream_deltas(stream, cur_tool_calls), started, model=model),
+            stream_interval,
+            stream_max_chars,
+            stats,
+        ):
+            await msg.stream_token(text)
 
-    # We are done with the first stream
+        if not cur_tool_calls:
+            return tool_round
 
-    if cur_tool_calls:
         # We have tool calls to execute
         message_history.append(
             {
@@ -181,22 +313,156 @@ async def main(message: cl.Message):
             }
         )
 
-        # Execute tools
-        for tool_call in cur_tool_calls:
-            await call_tool(tool_call, message_history)
+        # Execute the tools concurrently, recording their results in call order
+        results = await asyncio.gather(
+            *(call_tool(tool_call) for tool_call in cur_tool_calls)
+        )
+        for tool_call, result in zip(cur_tool_calls, results, strict=True):
+            message_history.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": result,
+                }
+            )
 
-        # Now we need to get the final response from the model
-        stream_post_tool = await client.chat.completions.create(
-            model=model,
-            messages=message_history,
-            stream=True,
+    return max_tool_rounds
+
+
+def read_pages(path: str) -> list[tuple[int, str]]:
+    """Extract the pages of a PDF, through the extraction cache."""
+    return list(iter_pages(path, cache=extraction_cache))
+
+
+async def extract_attachment(element: cl.Element) -> list[tuple[int, str]]:
+    """Extract the pages of a PDF attachment in a worker thread."""
+    async with extraction_semaphore:
+        with span("upload.extract", file=element.name) as extract:
+            pages = await cl.make_async(read_pages)(element.path)
+            extract.set(pages=len(pages))
+            return pages
+
+
+@cl.on_message
+async def main(message: cl.Message):
+    history: ConversationHistory = cl.user_session.get("history")
+    retriever: HybridRetriever = cl.user_session.get("retriever")
+    started = time.perf_counter()
+    count("chat.questions", app="chainlit")
+
+    # Handle attachments, extracting them concurrently, then indexing them
+    errors = ""
+    attachments = []
+    if message.elements:
+        attachments = [
+            element
+            for element in message.elements
+            if element.name.endswith(".pdf") and element.path
+        ]
+        results = await asyncio.gather(
+            *(extract_attachment(element) for element in attachments),
+            return_exceptions=True,
         )
 
-        async for part in stream_post_tool:
-            if not part.choices:
-                continue
-            if part.choices[0].delta.content:
-                token = part.choices[0].delta.content
-                await msg.stream_token(token)
+        for element, result in zip(attachments, results, strict=True):
+            if isinstance(result, Exception):
+                errors += f"\n\nError reading PDF '{element.name}': {result!s}\n"
+            elif isinstance(result, BaseException):
+                # Cancellation and interrupts aren't extraction errors.
+                raise result
+            else:
+                with span("upload.index", file=element.name):
+                    await cl.make_async(retriever.add_document)(element.name, result)
+
+    # Only inject the chunks most relevant to the question, within the budget
+    file_content = ""
+    sources = []
+    block_hashes: list[str] = []
+    if len(retriever):
+        retrieval = await retrieve_context(
+            retriever, message.content, retrieval_top_k, context_token_budget
+        )
+        for stage, seconds in retrieval.timings.items():
+            observe("retrieval.stage", seconds, stage=stage)
+        file_content = retrieval.context
+        sources = sorted({result.chunk.doc_id for result in retrieval.results})
+        block_hashes = retrieval.block_hashes
+    file_content += errors
+
+    # The chunks are only sent with this question; later turns keep a
+    # reference to the documents instead.
+    references = []
+    if attachments:
+        references.append(f"Attached: {', '.join(e.name for e in attachments)}")
+    if sources:
+        references.append(f"Context from: {', '.join(sources)}")
+    reference = f"[{'; '.join(references)}]" if references else ""
+
+    message_history = history.messages(message.content, file_content)
+    previous_blocks = set(cl.user_session.get("block_hashes") or [])
+    cl.user_session.set("block_hashes", block_hashes)
+    reused_blocks = sum(block in previous_blocks for block in block_hashes)
+    logger.info(
+        "Prompt prefix %s: %d messages, %d reused from the previous turn; "
+        "context blocks %s, %d reused",
+        history.prefix.hash,
+        history.prefix.messages,
+        history.prefix.reused,
+        " ".join(block_hashes) or "none",
+        reused_blocks,
+    )
+    # The share of prefix messages reused is prompt.prefix_reused over
+    # prompt.prefix_messages, and likewise for the context blocks.
+    count("prompt.prefix_messages", history.prefix.messages, app="chainlit")
+    count("prompt.prefix_reused", history.prefix.reused, app="chainlit")
+    count("prompt.context_blocks", len(block_hashes), app="chainlit")
+    count("prompt.context_blocks_reused", reused_blocks, app="chainlit")
+    observe("prompt.build", time.perf_counter() - started, app="chainlit")
+
+    msg = cl.Message(content="")
+
+    # Send an empty message to start the stream UI
+    await msg.send()
+
+    # Replay the answer to the same message sent with the same prompt, and
+    # stream the others from the model.
+    fingerprint = ResponseCache.fingerprint(
+        history.prefix.hash,
+        file_content,
+        "" if response_cache_shared else cl.user_session.get("id"),
+    )
+    # Without OPENAI_MODEL, answers come from the API's default model.
+    cache_model = model or ""
+    cached = None
+    if response_cache is not None and not errors:
+        cached = await cl.make_async(response_cache.get)(
+            cache_model, message.content, fingerprint
+        )
+        count("response_cache.lookups", app="chainlit", hit=cached is not None)
+
+    stats = StreamStats()
+    if cached is not None:
+        async for text in coalesce(
+            measure_stream(replay(cached), model=model, cached=True),
+            stream_interval,
+            stream_max_chars,
+            stats,
+        ):
+            await msg.stream_token(text)
+    else:
+        tool_rounds = await stream_answer(msg, message_history, stats)
+        # Answers built from tool results may be stale by the next question.
+        if response_cache is not None and not errors and not tool_rounds:
+            await cl.make_async(response_cache.put)(
+                cache_model, message.content, fingerprint, msg.content
+            )
 
     await msg.update()
+    observe("chat.answer", time.perf_counter() - started, app="chainlit")
+    history.add(message.content, msg.content, reference)
+    logger.info(
+        "Answer streamed in %d emits (%d tokens, %.1f per emit)",
+        stats.flushes,
+        stats.tokens,
+        stats.tokens_per_flush,
+    )
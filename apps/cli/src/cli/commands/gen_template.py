@@ -101,6 +101,20 @@ def _generate_template_yml(app_type: AppType) -> str:
     return yaml.dump(config, sort_keys=False, allow_unicode=True)
 
 
+# Workspace packages copied into the chat app templates, under packages/
+BUNDLED_PACKAGES = ["conversation", "pdf-context", "retrieval", "telemetry"]
+
+
+def _rewrite_workspace_sources(content: str, packages_dir: str) -> str:
+    """Point the workspace sources of a pyproject.toml at the bundled packages."""
+    for package in BUNDLED_PACKAGES:
+        content = content.replace(
+            f"{package} = {{ workspace = true }}",
+            f'{package} = {{ path = "{packages_dir}/{package}" }}',
+        )
+    return content
+
+
 # Placeholders to maintain valid Python syntax during CST pass
 PLACEHOLDERS = {
     "chainlit_chat": "__PROJECT_SLUG_PLACEHOLDER__",
@@ -177,16 +191,23 @@ def generate(
     # Copy source to target, ignoring artifacts
     shutil.copytree(source, target, ignore=shutil.ignore_patterns(*artifacts))
 
-    # Bundle pdf-context package for chainlit-chat and reflex-chat
+    # Bundle the workspace packages chainlit-chat and reflex-chat depend on
     if app_type in [AppType.chainlit, AppType.reflex]:
-        pdf_pkg_src = repo_root / "packages" / "pdf-context"
-        if pdf_pkg_src.exists():
-            pkg_target = target / "packages" / "pdf-context"
-            # Ignore same artifacts in pdf-context bundle
-            shutil.copytree(
-                pdf_pkg_src, pkg_target, ignore=shutil.ignore_patterns(*artifacts)
-            )
-            console.print("✔ Bundled pdf-context package")
+        for package in BUNDLED_PACKAGES:
+            pkg_src = repo_root / "packages" / package
+            if pkg_src.exists():
+                pkg_target = target / "packages" / package
+                # Ignore same artifacts in the bundled packages
+                shutil.copytree(
+                    pkg_src, pkg_target, ignore=shutil.ignore_patterns(*artifacts)
+                )
+                # Bundled packages depend on each other through the workspace
+                pkg_pyproject = pkg_target / "pyproject.toml"
+                if pkg_pyproject.exists():
+                    pkg_pyproject.write_text(
+                        _rewrite_workspace_sources(pkg_pyproject.read_text(), "..")
+                    )
+                console.print(f"✔ Bundled {package} package")
 
     # Moon renders all files, so we don't strictly need .jinja suffixes.
     # We'll remove them to ensure the output files have the correct names.
@@ -257,11 +278,8 @@ def generate(
         content = pyproject_path.read_text()
         content = content.replace(f'"{app_type.value}"', '"{{ project_name }}"')
 
-        # Rewrite pdf-context dependency to local path
-        content = content.replace(
-            "pdf-context = { workspace = true }",
-            'pdf-context = { path = "packages/pdf-context" }',
-        )
+        # Rewrite the workspace dependencies to the bundled packages
+        content = _rewrite_workspace_sources(content, "packages")
 
         if app_type == AppType.chainlit:
             msg = "Chainlit Chat with OpenAI Functions Streaming"
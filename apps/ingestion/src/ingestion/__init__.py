@@ -1 +1,38 @@
-"""Ingestion Pipeline"""
+"""Ingestion Pipeline
+
+Batch ingestion of PDF corpora into retrieval indexes: files are
+discovered, extracted and chunked in a process pool, embedded in batches
+and written to a chunk store the chat apps search.
+
+Example usage:
+    from ingestion import ingest
+    from retrieval import HashingEmbedder
+
+    report = ingest(["data/"], "index/", HashingEmbedder(), workers=8)
+    print(report)  # documents, pages, chunks, docs/s and pages/s
+
+    # Later runs only process new and changed files
+    report = ingest(["data/"], "index/", HashingEmbedder(), workers=8)
+
+Or from the command line:
+    python -m ingestion data/ --output index/ --workers 8
+"""
+
+from .manifest import FileRecord, Manifest
+from .pipeline import (
+    IngestionReport,
+    ProcessedDocument,
+    discover,
+    ingest,
+    process_document,
+)
+
+__all__ = [
+    "ingest",
+    "discover",
+    "process_document",
+    "ProcessedDocument",
+    "IngestionReport",
+    "Manifest",
+    "FileRecord",
+]
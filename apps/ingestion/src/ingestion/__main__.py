@@ -0,0 +1,98 @@
+"""Ingest a corpus of PDFs into a retrieval index.
+
+Chunks are embedded with EMBEDDING_MODEL through the OpenAI-compatible API
+configured by OPENAI_BASE_URL and OPENAI_API_KEY when it is set, several
+requests at a time, and with the offline hashing embedder otherwise.
+
+Runs are incremental: re-running over the same sources only processes new
+and changed files.
+
+Usage:
+    python -m ingestion data/ "archive/**/*.pdf" --output index/ --workers 8
+"""
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+from openai import OpenAI
+from retrieval import Embedder, EmbeddingCache, HashingEmbedder, OpenAIEmbedder
+
+from .pipeline import DEFAULT_PATTERN, ingest
+
+
+def make_embedder(
+    model: str | None, output: str, batch_size: int, concurrency: int
+) -> Embedder:
+    """Return the embedder for a model name, or the offline fallback.
+
+    Embeddings are cached in the output directory, so re-ingesting a
+    document only embeds the chunks that changed.
+    """
+    if model:
+        return OpenAIEmbedder(
+            OpenAI(base_url=os.getenv("OPENAI_BASE_URL")),
+            model,
+            batch_size=batch_size,
+            max_concurrency=concurrency,
+            cache=EmbeddingCache(directory=output),
+        )
+    return HashingEmbedder()
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="+", help="directories, files or globs")
+    parser.add_argument("--output", required=True, help="chunk store directory")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--batch-size", type=int, default=64, help="texts per embedding request"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="embedding requests in flight"
+    )
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument(
+        "--strategy", choices=["fixed", "sentence", "page"], default="sentence"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--embedding-model", default=os.getenv("EMBEDDING_MODEL"))
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "float16", "int8"],
+        default="float32",
+        help="storage type of the embeddings of a new store",
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="reprocess every file from scratch"
+    )
+    args = parser.parse_args()
+
+    report = ingest(
+        args.sources,
+        args.output,
+        make_embedder(
+            args.embedding_model, args.output, args.batch_size, args.concurrency
+        ),
+        pattern=args.pattern,
+        workers=args.workers,
+        batch_size=args.batch_size * args.concurrency,
+        queue_size=args.queue_size,
+        strategy=args.strategy,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        rebuild=args.rebuild,
+        dtype=args.dtype,
+    )
+
+    for path, error in report.failures.items():
+        print(f"Failed: {path}: {error}")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Ingestion manifest.
+
+Records, for each ingested file, its size, modification time and content
+hash, and where its chunks are in the chunk store. Re-runs use it to skip
+unchanged files, reprocess changed ones and tombstone deleted ones.
+
+The manifest is a SQLite database next to the chunk store. A file's record
+is committed once its chunks are committed to the store, so an interrupted
+run loses at most the files it hadn't committed yet and the next run
+resumes from there.
+"""
+
+import sqlite3
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True, slots=True)
+class FileRecord:
+    """State of an ingested file.
+
+    Attributes:
+        path: Path of the file, as discovered.
+        size: Size of the file, in bytes.
+        mtime_ns: Modification time of the file, in nanoseconds.
+        sha256: Hash of the file content.
+        first_row: Store row of the file's first chunk.
+        rows: Number of chunks of the file.
+        error: Why the file couldn't be read, if it couldn't.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    first_row: int = 0
+    rows: int = 0
+    error: str | None = None
+
+
+class Manifest:
+    """SQLite record of the files ingested into an index directory.
+
+    Thread-safe: the ingestion pipeline reads it from the discovery loop and
+    commits to it from the embedding stage.
+
+    Args:
+        directory: Index directory the manifest belongs to.
+    """
+
+    FILENAME = "manifest.sqlite3"
+
+    def __init__(self, directory: str | Path):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(directory / self.FILENAME, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL, "
+            "first_row INTEGER NOT NULL, rows INTEGER NOT NULL, error TEXT, "
+            "deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def get(self, path: str) -> FileRecord | None:
+        """Return the record of a file, or None if it isn't ingested."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, size, mtime_ns, sha256, first_row, rows, error "
+                "FROM files WHERE path = ? AND NOT deleted",
+                (path,),
+            ).fetchone()
+        return FileRecord(*row) if row is not None else None
+
+    def records(self) -> list[FileRecord]:
+        """Return the records of the ingested files, in store order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, size, mtime_ns, sha256, first_row, rows, error "
+                "FROM files WHERE NOT deleted ORDER BY first_row, path"
+            ).fetchall()
+        return [FileRecord(*row) for row in rows]
+
+    def paths(self) -> set[str]:
+        """Return the paths of the ingested files."""
+        with self._lock:
+            rows = self._db.execute("SELECT path FROM files WHERE NOT deleted")
+            return {path for (path,) in rows}
+
+    def commit(self, records: Iterable[FileRecord]) -> None:
+        """Record files, replacing their previous records."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (
+                    (
+                        r.path,
+                        r.size,
+                        r.mtime_ns,
+                        r.sha256,
+                        r.first_row,
+                        r.rows,
+                        r.error,
+                    )
+                    for r in records
+                ),
+            )
+
+    def tombstone(self, paths: Iterable[str]) -> None:
+        """Mark files as deleted."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE files SET deleted = 1 WHERE path = ?",
+                ((path,) for path in paths),
+            )
+
+    def clear(self) -> None:
+        """Forget all files."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files")
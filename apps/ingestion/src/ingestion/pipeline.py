@@ -0,0 +1,393 @@
+"""Batch ingestion pipeline.
+
+Discovers PDFs, extracts and chunks them in a process pool, embeds the
+chunks in batches and writes them to a `retrieval.ChunkStore`. Stages are
+connected by bounded buffers, so memory use doesn't grow with the corpus:
+discovery stops submitting files while extraction results are waiting, and
+extraction results wait while the embedding queue is full.
+
+Runs are incremental: files whose size and modification time match the
+manifest are skipped without being opened, files whose content hash still
+matches are not reprocessed, and files that disappeared are tombstoned.
+"""
+
+import glob
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from queue import Queue
+
+from pdf_context import Chunk, iter_chunks, iter_pages
+from pdf_context.chunker import Strategy
+from retrieval import ChunkStore, Embedder
+from retrieval.store import Dtype
+
+from .manifest import FileRecord, Manifest
+
+DEFAULT_PATTERN = "**/*.pdf"
+
+
+def discover(
+    sources: Iterable[str | Path], pattern: str = DEFAULT_PATTERN
+) -> Iterator[Path]:
+    """Find the files to ingest.
+
+    Args:
+        sources: Directories, files or glob patterns (e.g. ``"data/*.pdf"``).
+        pattern: Glob pattern matched under directories.
+
+    Yields:
+        Each matching file once, in sorted order within each source.
+    """
+    seen: set[Path] = set()
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            matches = sorted(path.glob(pattern))
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(str(source), recursive=True))
+
+        for match in matches:
+            resolved = match.resolve()
+            if resolved not in seen and match.is_file():
+                seen.add(resolved)
+                yield match
+
+
+@dataclass(slots=True)
+class ProcessedDocument:
+    """Chunks of a document, as returned by the extraction workers.
+
+    Attributes:
+        record: Manifest record of the file; its rows are set once written.
+        pages: Number of pages with text.
+        chunks: Chunks of the document and their texts.
+        unchanged: Whether the content matched the previous hash, in which
+                   case the document wasn't extracted.
+    """
+
+    record: FileRecord
+    pages: int = 0
+    chunks: list[tuple[Chunk, str]] = field(default_factory=list)
+    unchanged: bool = False
+
+
+def _hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def process_document(
+    path: str,
+    strategy: Strategy = "sentence",
+    chunk_size: int = 1500,
+    overlap: int = 200,
+    previous_sha256: str | None = None,
+) -> ProcessedDocument:
+    """Extract and chunk a document, recording errors instead of raising.
+
+    Args:
+        path: Path of the PDF file.
+        strategy: Chunking strategy (see `pdf_context.iter_chunks`).
+        chunk_size: Maximum chunk size, in characters.
+        overlap: Number of characters shared by consecutive chunks.
+        previous_sha256: Content hash of the previously ingested version.
+                         If the content still matches, extraction is skipped.
+    """
+    try:
+        # Stat before hashing: if the file changes in between, the next run
+        # sees a newer mtime and checks it again.
+        stat = os.stat(path)
+        record = FileRecord(path, stat.st_size, stat.st_mtime_ns, _hash_file(path))
+    except OSError as e:
+        return ProcessedDocument(FileRecord(path, 0, 0, "", error=str(e)))
+    if record.sha256 == previous_sha256:
+        return ProcessedDocument(record, unchanged=True)
+
+    try:
+        pages = list(iter_pages(path))
+    except Exception as e:
+        return ProcessedDocument(replace(record, error=str(e)))
+    chunks = list(iter_chunks(pages, path, strategy, chunk_size, overlap))
+    return ProcessedDocument(record, len(pages), chunks)
+
+
+@dataclass
+class IngestionReport:
+    """Counters of an ingestion run.
+
+    Attributes:
+        documents: Number of documents ingested.
+        pages: Number of pages with text in the ingested documents.
+        chunks: Number of chunks written to the index.
+        skipped: Number of unchanged documents.
+        deleted: Number of previously ingested documents that disappeared.
+        failures: Error message of each document that couldn't be read.
+        seconds: Wall-clock duration of the run.
+    """
+
+    documents: int = 0
+    pages: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    failures: dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.documents} documents, {self.pages} pages, {self.chunks} chunks "
+            f"in {self.seconds:.1f}s ({self.docs_per_second:.1f} docs/s, "
+            f"{self.pages_per_second:.1f} pages/s), {self.skipped} unchanged, "
+            f"{self.deleted} deleted, {len(self.failures)} failed"
+        )
+
+
+class _EmbeddingStage(threading.Thread):
+    """Embeds queued chunks in fixed-size batches and writes them out.
+
+    Runs in a thread: embedding is either a network call or NumPy work,
+    both of which release the GIL while extraction workers keep going.
+    Documents are committed, to the store then to the manifest, once all
+    their chunks are written. Failed documents go through the stage too,
+    so the chunks of their previous version are dropped in order.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        store: ChunkStore,
+        manifest: Manifest,
+        batch_size: int,
+        queue_size: int,
+    ):
+        super().__init__(name="ingestion-embedding", daemon=True)
+        self.embedder = embedder
+        self.store = store
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.queue: Queue[ProcessedDocument | None] = Queue(queue_size)
+        self.error: Exception | None = None
+        # Documents not fully written yet, with the row of their first chunk.
+        self._unwritten: deque[tuple[FileRecord, int]] = deque()
+        self._next_row = store.rows
+        self._written_rows = store.rows
+
+    def _flush(self, batch: list[tuple[Chunk, str]]) -> None:
+        chunks = [chunk for chunk, _ in batch]
+        texts = [text for _, text in batch]
+        vectors = self.embedder.embed(texts)
+
+        # Append up to the end of each document in turn and commit it, so
+        # a commit never exposes part of a document.
+        start = 0
+        while start < len(batch):
+            self._commit_written()
+            record, first_row = self._unwritten[0]
+            end = min(len(batch), start + first_row + record.rows - self._written_rows)
+            rows = self.store.append(
+                chunks[start:end], texts[start:end], vectors[start:end]
+            )
+            self._written_rows = rows.stop
+            start = end
+        self._commit_written()
+
+    def _commit_written(self) -> None:
+        """Commit the documents whose chunks have all been written."""
+        written: list[FileRecord] = []
+        while self._unwritten:
+            record, first_row = self._unwritten[0]
+            if first_row + record.rows > self._written_rows:
+                break
+            self._unwritten.popleft()
+            # Drop the chunks of previous versions, including any committed
+            # to the store by a run interrupted before its manifest commit.
+            self.store.delete([record.path], before=first_row)
+            written.append(replace(record, first_row=first_row))
+        if written:
+            self.store.commit()
+            self.manifest.commit(written)
+
+    def run(self) -> None:
+        batch: list[tuple[Chunk, str]] = []
+        while (document := self.queue.get()) is not None:
+            # After a failure, keep draining so producers never block.
+            if self.error is not None:
+                continue
+            record = replace(document.record, rows=len(document.chunks))
+            self._unwritten.append((record, self._next_row))
+            self._next_row += record.rows
+            batch.extend(document.chunks)
+            try:
+                while len(batch) >= self.batch_size:
+                    self._flush(batch[: self.batch_size])
+                    del batch[: self.batch_size]
+                # Documents without chunks are committed right away.
+                self._commit_written()
+            except Exception as e:
+                self.error = e
+
+        if self.error is None:
+            try:
+                if batch:
+                    self._flush(batch)
+                self._commit_written()
+            except Exception as e:
+                self.error = e
+
+
+def ingest(
+    sources: Iterable[str | Path],
+    output: str | Path,
+    embedder: Embedder,
+    pattern: str = DEFAULT_PATTERN,
+    workers: int | None = None,
+    batch_size: int = 64,
+    queue_size: int = 16,
+    strategy: Strategy = "sentence",
+    chunk_size: int = 1500,
+    overlap: int = 200,
+    rebuild: bool = False,
+    dtype: Dtype = "float32",
+) -> IngestionReport:
+    """Ingest a corpus of PDFs into a chunk store.
+
+    Runs are incremental: only new and changed files are processed, and
+    files missing from ``sources`` are tombstoned, so pass the same sources
+    on each run. An interrupted run resumes after its last committed file.
+
+    Args:
+        sources: Directories, files or glob patterns to ingest.
+        output: Directory of the chunk store and the manifest.
+        embedder: Embedder of the chunks.
+        pattern: Glob pattern matched under directories.
+        workers: Number of extraction processes. Defaults to the CPU count.
+        batch_size: Number of chunks per embedding request.
+        queue_size: Number of documents buffered between stages.
+        strategy: Chunking strategy (see `pdf_context.iter_chunks`).
+        chunk_size: Maximum chunk size, in characters.
+        overlap: Number of characters shared by consecutive chunks.
+        rebuild: Reprocess every file into a fresh store.
+        dtype: Storage type of the embeddings of a new store.
+
+    Returns:
+        The run's counters. Unreadable documents are reported in
+        ``failures`` rather than stopping the run, and retried once they
+        change.
+
+    Raises:
+        Exception: Any error raised by the embedder or the store.
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    report = IngestionReport()
+
+    manifest = Manifest(output)
+    store = ChunkStore(output, dtype)
+    if rebuild:
+        manifest.clear()
+        store.clear()
+    embedding = _EmbeddingStage(embedder, store, manifest, batch_size, queue_size)
+    embedding.start()
+
+    def collect(future: Future[ProcessedDocument]) -> None:
+        document = future.result()
+        record = document.record
+        if document.unchanged:
+            # Only the modification time changed: keep the existing rows.
+            previous = manifest.get(record.path)
+            assert previous is not None
+            manifest.commit([replace(previous, mtime_ns=record.mtime_ns)])
+            report.skipped += 1
+        else:
+            if record.error is not None:
+                report.failures[record.path] = record.error
+            else:
+                report.documents += 1
+                report.pages += document.pages
+                report.chunks += len(document.chunks)
+            embedding.queue.put(document)
+
+    discovered: set[str] = set()
+    discovered_all = True
+    try:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Results are collected in submission order, so the store is
+                # deterministic, and only a bounded window of documents is in
+                # flight (at least one per worker, to keep them all busy).
+                in_flight = max(queue_size, workers)
+                pending: deque[Future[ProcessedDocument]] = deque()
+                for path in discover(sources, pattern):
+                    if embedding.error is not None:
+                        # Files weren't all discovered: none can be tombstoned.
+                        discovered_all = False
+                        break
+                    key = str(path)
+                    discovered.add(key)
+
+                    # Fast path: unchanged size and mtime, the file isn't read.
+                    previous = manifest.get(key)
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        # Gone since discovery: process_document records the
+                        # failure and the previous version is dropped.
+                        stat = None
+                    if (
+                        previous is not None
+                        and stat is not None
+                        and previous.size == stat.st_size
+                        and previous.mtime_ns == stat.st_mtime_ns
+                    ):
+                        report.skipped += 1
+                        continue
+
+                    pending.append(
+                        executor.submit(
+                            process_document,
+                            key,
+                            strategy,
+                            chunk_size,
+                            overlap,
+                            previous.sha256 if previous is not None else None,
+                        )
+                    )
+                    if len(pending) >= in_flight:
+                        collect(pending.popleft())
+                while pending:
+                    collect(pending.popleft())
+        finally:
+            embedding.queue.put(None)
+            embedding.join()
+
+        if embedding.error is not None:
+            raise embedding.error
+        if discovered_all:
+            deleted = manifest.paths() - discovered
+            store.delete(deleted)
+            store.commit()
+            manifest.tombstone(deleted)
+            report.deleted = len(deleted)
+    finally:
+        store.close()
+        manifest.close()
+
+    report.seconds = time.perf_counter() - start
+    return report
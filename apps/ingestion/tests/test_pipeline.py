@@ -0,0 +1,154 @@
+import os
+from pathlib import Path
+
+import pytest
+from ingestion import pipeline
+from ingestion.manifest import Manifest
+from ingestion.pipeline import IngestionReport, ingest
+from retrieval import ChunkStore, HashingEmbedder
+
+from .conftest import make_pdf
+
+
+def run(sources: list[Path], output: Path) -> IngestionReport:
+    return ingest(sources, output, HashingEmbedder(), workers=1, batch_size=4)
+
+
+def store_texts(output: Path) -> list[str]:
+    """Texts of the live chunks of a store, in row order."""
+    with ChunkStore(output, readonly=True) as store:
+        return [text for _, text in store.get(range(store.rows)).values()]
+
+
+def manifest_paths(output: Path) -> set[str]:
+    manifest = Manifest(output)
+    try:
+        return manifest.paths()
+    finally:
+        manifest.close()
+
+
+def test_first_run_ingests_every_file(corpus, tmp_path):
+    output = tmp_path / "index"
+
+    report = run([corpus], output)
+
+    assert report.documents == 2
+    assert report.pages == 3
+    assert report.chunks == len(store_texts(output)) == 2
+    assert report.failures == {}
+    assert manifest_paths(output) == {
+        str(corpus / "decree.pdf"),
+        str(corpus / "lease.pdf"),
+    }
+
+
+def test_unchanged_rerun_skips_every_file(corpus, tmp_path):
+    output = tmp_path / "index"
+    run([corpus], output)
+
+    report = run([corpus], output)
+
+    assert (report.documents, report.skipped, report.deleted) == (0, 2, 0)
+    assert len(store_texts(output)) == 2
+
+
+def test_touched_file_with_same_content_is_not_reprocessed(corpus, tmp_path):
+    output = tmp_path / "index"
+    run([corpus], output)
+    lease = corpus / "lease.pdf"
+    stat = lease.stat()
+    os.utime(lease, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    report = run([corpus], output)
+
+    assert (report.documents, report.skipped) == (0, 2)
+    assert len(store_texts(output)) == 2
+    manifest = Manifest(output)
+    record = manifest.get(str(lease))
+    manifest.close()
+    assert record is not None and record.mtime_ns == stat.st_mtime_ns + 10**9
+
+
+def test_changed_file_replaces_its_chunks(corpus, tmp_path):
+    output = tmp_path / "index"
+    run([corpus], output)
+    (corpus / "decree.pdf").write_bytes(make_pdf("The fees were abolished."))
+
+    report = run([corpus], output)
+
+    assert (report.documents, report.skipped) == (1, 1)
+    texts = store_texts(output)
+    assert "The fees were abolished." in texts
+    assert not any("2023-1234" in text for text in texts)
+
+
+def test_deleted_file_is_tombstoned(corpus, tmp_path):
+    output = tmp_path / "index"
+    run([corpus], output)
+    (corpus / "decree.pdf").unlink()
+
+    report = run([corpus], output)
+
+    assert report.deleted == 1
+    assert manifest_paths(output) == {str(corpus / "lease.pdf")}
+    assert not any("2023-1234" in text for text in store_texts(output))
+
+
+def test_unreadable_pdf_is_reported_and_retried_once_changed(corpus, tmp_path):
+    output = tmp_path / "index"
+    broken = corpus / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+
+    report = run([corpus], output)
+
+    assert report.documents == 2
+    assert list(report.failures) == [str(broken)]
+
+    report = run([corpus], output)
+    assert (report.skipped, report.failures) == (3, {})
+
+    broken.write_bytes(make_pdf("Repaired."))
+    report = run([corpus], output)
+    assert (report.documents, report.failures) == (1, {})
+    assert "Repaired." in store_texts(output)
+
+
+def test_file_vanishing_after_discovery_is_reported(corpus, tmp_path, monkeypatch):
+    output = tmp_path / "index"
+    run([corpus], output)
+    lease = corpus / "lease.pdf"
+
+    def discover(sources, pattern):
+        yield from sorted(corpus.iterdir())
+        lease.unlink()  # Between discovery and the stat of the next file.
+        yield lease
+
+    monkeypatch.setattr(pipeline, "discover", discover)
+    report = run([corpus], output)
+
+    assert list(report.failures) == [str(lease)]
+    assert not any("rent" in text for text in store_texts(output))
+
+
+def test_interrupted_run_resumes_without_duplicates(corpus, tmp_path, monkeypatch):
+    output = tmp_path / "index"
+    commit = Manifest.commit
+
+    def crash(self, records):
+        raise RuntimeError("interrupted")
+
+    # The store commits a document, then the process dies before the
+    # manifest records it.
+    monkeypatch.setattr(Manifest, "commit", crash)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        run([corpus], output)
+    assert len(store_texts(output)) > 0
+    assert manifest_paths(output) == set()
+
+    monkeypatch.setattr(Manifest, "commit", commit)
+    report = run([corpus], output)
+
+    assert report.documents == 2
+    texts = store_texts(output)
+    assert len(texts) == len(set(texts)) == 2
@@ -1,10 +1,10 @@
 import reflex as rx
 from reflex.constants.colors import ColorType
 
-from reflex_chat.state import QA, State
+from reflex_chat.state import QA, Document, State
 
 
-def message_content(text: str, color: ColorType) -> rx.Component:
+def message_content(text: str | rx.Var, color: ColorType) -> rx.Component:
     """Create a message content component.
 
     Args:
@@ -33,14 +33,27 @@ def message(qa: QA) -> rx.Component:
     Returns:
         A component displaying the question/answer pair.
     """
+    return exchange(qa["question"], qa["answer"])
+
+
+def exchange(question: str | rx.Var, answer: str | rx.Var) -> rx.Component:
+    """A question and its answer.
+
+    Args:
+        question: The question.
+        answer: The answer.
+
+    Returns:
+        A component displaying the question and the answer.
+    """
     return rx.box(
         rx.box(
-            message_content(qa["question"], "mauve"),
+            message_content(question, "mauve"),
             text_align="right",
             margin_bottom="8px",
         ),
         rx.box(
-            message_content(qa["answer"], "accent"),
+            message_content(answer, "accent"),
             text_align="left",
             margin_bottom="8px",
         ),
@@ -53,22 +66,35 @@ def chat() -> rx.Component:
     """List all the messages in a single conversation."""
     return rx.auto_scroll(
         rx.foreach(State.selected_chat, message),
+        # The question being answered, streamed separately from the chat.
+        rx.cond(
+            State.processing,
+            exchange(State.streaming_question, State.streaming_answer),
+        ),
         flex="1",
         padding="8px",
     )
 
 
-def render_attached_file(filename: str) -> rx.Component:
-    """Render a single attached file."""
+def render_attached_file(document: Document) -> rx.Component:
+    """Render a single attached document."""
     return rx.hstack(
         rx.icon("file-text", size=14, color=rx.color("ruby", 11)),
         rx.text(
-            filename, font_size="0.75em", color=rx.color("mauve", 12), weight="medium"
+            document["name"],
+            font_size="0.75em",
+            color=rx.color("mauve", 12),
+            weight="medium",
+        ),
+        rx.text(
+            f"{document['tokens']} tokens",
+            font_size="0.7em",
+            color=rx.color("mauve", 10),
         ),
         rx.icon(
             "x",
             size=14,
-            on_click=State.clear_attachment(filename),
+            on_click=State.clear_attachment(document["id"]),
             cursor="pointer",
             color=rx.color("mauve", 11),
             _hover={"color": rx.color("mauve", 12)},
@@ -89,9 +115,9 @@ def action_bar() -> rx.Component:
             rx.form(
                 rx.vstack(
                     rx.cond(
-                        State.attached_files,
+                        State.attached_documents,
                         rx.flex(
-                            rx.foreach(State.attached_files, render_attached_file),
+                            rx.foreach(State.attached_documents, render_attached_file),
                             wrap="wrap",
                             gap="2",
                             padding="8px 12px 0 12px",
@@ -1,10 +1,37 @@
+import asyncio
+import logging
 import os
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterable, AsyncIterator
 from typing import Any, TypedDict
 
+import httpx
 import reflex as rx
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
-from pdf_context import extract_text_from_bytes, format_as_context
+from conversation import ConversationHistory, ResponseCache, coalesce, replay
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
+from openai.types.chat import ChatCompletionChunk
+from pdf_context import ExtractionCache, cached_pages, estimate_tokens, iter_pages
+from retrieval import (
+    BM25Retriever,
+    ChunkStore,
+    EmbeddingCache,
+    HashingEmbedder,
+    HybridRetriever,
+    OpenAIEmbedder,
+    Retriever,
+    StoreRetriever,
+    VectorRetriever,
+    retrieve_context,
+)
+from telemetry import configure, count, measure_stream, observe, span
+
+logger = logging.getLogger(__name__)
+
+# Export traces and latency metrics as set by TELEMETRY (off by default):
+# "otel", "prometheus" (on TELEMETRY_PORT), "jsonl" (to TELEMETRY_FILE) or
+# "auto".
+configure()
 
 # Checking if the API keys are set properly
 if not os.getenv("OPENAI_API_KEY"):
@@ -13,6 +40,174 @@ if not os.getenv("OPENAI_API_KEY"):
 if not os.getenv("OPENAI_BASE_URL"):
     raise Exception("Please set OPENAI_BASE_URL environment variable for Albert API.")
 
+# One client shared by every session of the worker: its connection pool keeps
+# connections to the API alive between questions, so a turn doesn't pay for
+# a new TLS handshake, and streams are read without blocking a thread.
+client = AsyncOpenAI(
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+        )
+    ),
+)
+
+# Instructions sent first in every prompt.
+SYSTEM_PROMPT = "You are a friendly chatbot named Reflex. Respond in markdown."
+
+# Maximum number of tokens of past turns resent with each question; older
+# turns are folded into a summary.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+
+# Maximum number of tokens of attachment content injected in the prompt.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000"))
+
+# Number of attachment chunks injected per question.
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+# Seconds to wait for query embedding and vector search before answering
+# from lexical matches only.
+RETRIEVAL_BUDGET = float(os.getenv("RETRIEVAL_BUDGET", "2"))
+
+# Streamed answers are sent to the browser in chunks, at most every
+# STREAM_INTERVAL seconds or STREAM_MAX_CHARS characters, rather than token
+# by token.
+STREAM_INTERVAL = float(os.getenv("STREAM_INTERVAL", "0.05"))
+STREAM_MAX_CHARS = int(os.getenv("STREAM_MAX_CHARS", "256"))
+
+# Embed attachment chunks with EMBEDDING_MODEL when set; otherwise fall back
+# to an offline hashing embedder (lexical matching only). Embeddings are
+# cached, so re-uploaded documents and repeated questions aren't re-embedded;
+# set EMBEDDING_CACHE_DIR to also persist them on disk across restarts.
+embedder = (
+    OpenAIEmbedder(
+        OpenAI(base_url=os.getenv("OPENAI_BASE_URL")),
+        os.environ["EMBEDDING_MODEL"],
+        max_concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", "4")),
+        cache=EmbeddingCache(directory=os.getenv("EMBEDDING_CACHE_DIR")),
+    )
+    if os.getenv("EMBEDDING_MODEL")
+    else HashingEmbedder()
+)
+
+# Answers to questions already asked with the same history and context are
+# replayed from a cache for RESPONSE_CACHE_TTL seconds (0, the default,
+# disables it). Set RESPONSE_CACHE_SIMILARITY to also reuse the answers of
+# questions whose embeddings are at least that similar. Answers are only
+# replayed to the client that received them, unless RESPONSE_CACHE_SCOPE is
+# "shared": every user of the worker then gets the answers of the others.
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "0"))
+RESPONSE_CACHE_SHARED = os.getenv("RESPONSE_CACHE_SCOPE", "session") == "shared"
+RESPONSE_CACHE_SIMILARITY = os.getenv("RESPONSE_CACHE_SIMILARITY")
+response_cache = (
+    ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+        ttl=RESPONSE_CACHE_TTL,
+        embed=embedder.embed if RESPONSE_CACHE_SIMILARITY else None,
+        threshold=float(RESPONSE_CACHE_SIMILARITY or "0.95"),
+    )
+    if RESPONSE_CACHE_TTL > 0
+    else None
+)
+
+# Optional corpus ingested with `python -m ingestion`, searched alongside the
+# uploads. The store is memory-mapped, so opening it is instant and its pages
+# are shared by all the app's worker processes.
+corpus = (
+    StoreRetriever(ChunkStore(os.environ["INDEX_DIR"], readonly=True), embedder)
+    if os.getenv("INDEX_DIR")
+    else None
+)
+
+# Per-chat objects kept out of the state are dropped once CHAT_CACHE_SIZE of
+# them are held, least recently used first, or after CHAT_CACHE_TTL seconds
+# without use, and rebuilt when their chat is used again.
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "256"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "3600"))
+
+# Cache the pages of uploaded documents so re-uploads skip parsing, and so
+# evicted retrievers can be rebuilt. It holds PDF_CACHE_SIZE documents, by
+# default four per cached chat, so the pages of a chat are still cached
+# well after its retriever is evicted. Set PDF_CACHE_DIR to also persist
+# them on disk, for chats reopened after a restart or on another worker.
+PDF_CACHE_SIZE = int(os.getenv("PDF_CACHE_SIZE", str(4 * CHAT_CACHE_SIZE)))
+extraction_cache = ExtractionCache(
+    max_entries=PDF_CACHE_SIZE, directory=os.getenv("PDF_CACHE_DIR")
+)
+
+
+class ChatCache[V]:
+    """LRU cache of per-chat objects, by client token and chat name.
+
+    Args:
+        max_entries: Maximum number of objects kept.
+        ttl: Seconds an object is kept without being used.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[str, str], tuple[V, float]] = OrderedDict()
+
+    def get(self, key: tuple[str, str]) -> V | None:
+        """Return the object of a chat, or None if missing or evicted."""
+        self._evict()
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._entries[key] = (entry[0], time.monotonic())
+        return entry[0]
+
+    def put(self, key: tuple[str, str], value: V) -> None:
+        """Store the object of a chat, evicting the least recently used."""
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.monotonic())
+        self._evict()
+
+    def pop(self, key: tuple[str, str]) -> V | None:
+        """Remove and return the object of a chat, if any."""
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def _evict(self) -> None:
+        expired = time.monotonic() - self.ttl
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or next(iter(self._entries.values()))[1] < expired
+        ):
+            self._entries.popitem(last=False)
+
+
+# Retrievers over the documents attached to each chat. They are kept out of
+# the state because they hold indexes and the embedding client, which Reflex
+# would otherwise serialize with the state; a missing one is rebuilt from
+# the extraction cache.
+retrievers: ChatCache[HybridRetriever] = ChatCache(CHAT_CACHE_SIZE, CHAT_CACHE_TTL)
+
+
+def new_retriever() -> HybridRetriever:
+    """Create a retriever over a chat's documents and the corpus, if any."""
+    stages: dict[str, Retriever | StoreRetriever] = {
+        "bm25": BM25Retriever(),
+        "vector": VectorRetriever(embedder),
+    }
+    if corpus is not None:
+        stages["corpus"] = corpus
+    return HybridRetriever(
+        stages, budgets={"vector": RETRIEVAL_BUDGET, "corpus": RETRIEVAL_BUDGET}
+    )
+
+
+async def content_deltas(
+    stream: AsyncIterable[ChatCompletionChunk],
+) -> AsyncIterator[str]:
+    """Yield the text deltas of a chat completion stream."""
+    async for item in stream:
+        if item.choices and item.choices[0].delta.content:
+            yield item.choices[0].delta.content
+
 
 class QA(TypedDict):
     """A question and answer pair."""
@@ -21,6 +216,33 @@ class QA(TypedDict):
     answer: str
 
 
+class Document(TypedDict):
+    """A document attached to a chat."""
+
+    id: str
+    name: str
+    chunks: int
+    tokens: int
+    # Content key of the document in the extraction cache.
+    key: str
+
+
+# Bounded histories of the chats. Like the retrievers, they are kept out of
+# the state; a missing one (e.g. after a restart) is rebuilt from the chat.
+histories: ChatCache[ConversationHistory] = ChatCache(CHAT_CACHE_SIZE, CHAT_CACHE_TTL)
+
+
+def history_for(token: str, chat: str, qas: list[QA]) -> ConversationHistory:
+    """Return the history of a chat, rebuilding it from its answers if needed."""
+    history = histories.get((token, chat))
+    if history is None:
+        history = ConversationHistory(SYSTEM_PROMPT, max_tokens=HISTORY_TOKEN_BUDGET)
+        for qa in qas:
+            history.add(qa["question"], qa["answer"])
+        histories.put((token, chat), history)
+    return history
+
+
 class State(rx.State):
     """The app state."""
 
@@ -35,14 +257,20 @@ class State(rx.State):
     # Whether we are processing the question.
     processing: bool = False
 
+    # The question being answered, and its answer so far. The answer is only
+    # added to the chat once complete, so streaming doesn't resend the chat.
+    streaming_question: str = ""
+    streaming_answer: str = ""
+
     # Whether the new chat modal is open.
     is_modal_open: bool = False
 
-    # The current context from the uploaded PDF.
-    context: str = ""
+    # A dict from the chat name to the documents attached to it.
+    _documents: dict[str, list[Document]] = {}
 
-    # list of attached file names
-    attached_files: list[str] = []
+    # A dict from the chat name to the hashes of the context blocks sent
+    # with its last question.
+    _block_hashes: dict[str, list[str]] = {}
 
     # whether filtering is happening
     is_uploading: bool = False
@@ -50,27 +278,103 @@ class State(rx.State):
     async def handle_upload(self, files: list[rx.UploadFile]):
         """Handle the file upload."""
         self.is_uploading = True
+        chat = self.current_chat
+        retriever = await self._retriever(chat)
+        documents = self._documents.setdefault(chat, [])
         for file in files:
-            upload_data = await file.read()
-            text = extract_text_from_bytes(upload_data)
-            self.context += format_as_context(text, file.filename or "")
-            self.attached_files.append(file.filename or "unknown")
+            name = file.filename or "unknown"
+            with span("upload.read", file=name) as read:
+                upload_data = await file.read()
+                read.set(bytes=len(upload_data))
+            # Parsing and indexing are CPU-bound: keep them off the event loop.
+            with span("upload.extract", file=name) as extract:
+                content_key = await asyncio.to_thread(
+                    ExtractionCache.key_for_bytes, upload_data
+                )
+                pages = await asyncio.to_thread(
+                    lambda: list(
+                        iter_pages(upload_data, cache=extraction_cache, key=content_key)
+                    )
+                )
+                extract.set(pages=len(pages))
+
+            # Uploading a file again replaces it.
+            with span("upload.index", file=name):
+                chunks = await asyncio.to_thread(retriever.add_document, name, pages)
+            documents[:] = [
+                document for document in documents if document["id"] != name
+            ]
+            documents.append(
+                Document(
+                    id=name,
+                    name=name,
+                    chunks=chunks,
+                    tokens=sum(estimate_tokens(text) for _, text in pages),
+                    key=content_key,
+                )
+            )
+        self._documents = self._documents
         self.is_uploading = False
 
     @rx.event
-    def clear_attachment(self, filename: str):
-        """Clear an attached file."""
-        # For simple demonstration, clearing one clears the context if it matches,
-        # but since context is a string, we might just clear everything for now
-        # or implement more complex logic.
-        # To keep it consistent with the screenshot pattern (remove file),
-        # we'll reset context if we remove all files.
-        if filename in self.attached_files:
-            self.attached_files.remove(filename)
-
-        # If no files left, clear context
-        if not self.attached_files:
-            self.context = ""
+    def clear_attachment(self, doc_id: str):
+        """Remove a document from the current chat, with its chunks."""
+        key = (self.router.session.client_token, self.current_chat)
+        documents = self._documents.get(self.current_chat, [])
+        documents[:] = [document for document in documents if document["id"] != doc_id]
+        self._documents = self._documents
+
+        retriever = retrievers.get(key)
+        if retriever is not None:
+            retriever.remove_document(doc_id)
+            if not documents:
+                retrievers.pop(key)
+
+    async def _retriever(self, chat: str) -> HybridRetriever:
+        """Return the retriever of a chat, rebuilding it if it was dropped.
+
+        Retrievers live in the worker's memory while the documents are listed
+        in the state, so a retriever can be missing after an eviction, a
+        restart or on another worker. Its documents are then re-indexed from
+        the extraction cache; those no longer cached are dropped from the
+        chat, so the chat doesn't list documents it can't search.
+
+        Args:
+            chat: The chat name.
+        """
+        key = (self.router.session.client_token, chat)
+        retriever = retrievers.get(key)
+        documents = self._documents.get(chat, [])
+        if retriever is not None:
+            return retriever
+
+        retriever = new_retriever()
+        kept = []
+        for document in documents:
+            pages = cached_pages(extraction_cache, document.get("key", ""))
+            if pages is None:
+                logger.warning(
+                    "Dropping %s from chat %r: its text is no longer cached",
+                    document["name"],
+                    chat,
+                )
+                continue
+            await asyncio.to_thread(retriever.add_document, document["id"], pages)
+            kept.append(document)
+        if len(kept) < len(documents):
+            documents[:] = kept
+            self._documents = self._documents
+        retrievers.put(key, retriever)
+        return retriever
+
+    @rx.var
+    def attached_documents(self) -> list[Document]:
+        """Get the documents attached to the current chat.
+
+        Returns:
+            The list of documents.
+        """
+        return self._documents.get(self.current_chat, [])
 
     @rx.event
     def create_chat(self, form_data: dict[str, Any]):
@@ -79,6 +383,8 @@ class State(rx.State):
         new_chat_name = form_data["new_chat_name"]
         self.current_chat = new_chat_name
         self._chats[new_chat_name] = []
+        # Reusing the name of an existing chat starts it afresh.
+        self._forget_chat(new_chat_name)
         self.is_modal_open = False
 
     @rx.event
@@ -107,6 +413,7 @@ class State(rx.State):
         if chat_name not in self._chats:
             return
         del self._chats[chat_name]
+        self._forget_chat(chat_name)
         if len(self._chats) == 0:
             self._chats = {
                 "Intros": [],
@@ -114,6 +421,15 @@ class State(rx.State):
         if self.current_chat not in self._chats:
             self.current_chat = list(self._chats.keys())[0]
 
+    def _forget_chat(self, chat_name: str):
+        """Drop the attached documents, retriever and history of a chat."""
+        self._documents.pop(chat_name, None)
+        self._documents = self._documents
+        self._block_hashes.pop(chat_name, None)
+        self._block_hashes = self._block_hashes
+        retrievers.pop((self.router.session.client_token, chat_name))
+        histories.pop((self.router.session.client_token, chat_name))
+
     @rx.event
     def set_chat(self, chat_name: str):
         """Set the name of the current chat.
@@ -161,68 +477,126 @@ class State(rx.State):
             form_data: A dict with the current question.
         """
 
-        # Add the question to the list of questions.
-        qa = QA(question=question, answer="")
-        self._chats[self.current_chat].append(qa)
+        # Show the question, and answer it in the chat it was asked in.
+        chat = self.current_chat
+        self.streaming_question = question
+        self.streaming_answer = ""
 
         # Clear the input and start the processing.
         self.processing = True
         yield
 
-        # Build the messages.
-        messages: list[ChatCompletionMessageParam] = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a friendly chatbot named Reflex. Respond in markdown."
-                ),
-            }
-        ]
-
-        if self.context:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        "Use the following context to answer the user's questions:\n\n"
-                        f"{self.context}"
-                    ),
-                }
+        # This handler yields to Reflex between updates, so its stages are
+        # timed with histograms rather than spans, which must not span a
+        # yield.
+        started = time.perf_counter()
+        count("chat.questions", app="reflex")
+
+        # Only inject the chunks most relevant to the question, within the
+        # budget. They are only sent with this question; later turns keep a
+        # reference to the documents instead.
+        token = self.router.session.client_token
+        retriever = None
+        if self._documents.get(chat) or corpus is not None:
+            retriever = await self._retriever(chat)
+        context = reference = ""
+        block_hashes: list[str] = []
+        if retriever is not None and len(retriever):
+            retrieval = await retrieve_context(
+                retriever, question, RETRIEVAL_TOP_K, CONTEXT_TOKEN_BUDGET
             )
-
-        for qa in self._chats[self.current_chat]:
-            messages.append({"role": "user", "content": qa["question"]})
-            messages.append({"role": "assistant", "content": qa["answer"]})
-
-        # Remove the last mock answer.
-        messages = messages[:-1]
-
-        # Start a new session to answer the question.
-        session = OpenAI(
-            base_url=os.getenv("OPENAI_BASE_URL"),
-        ).chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-            messages=messages,
-            stream=True,
+            for stage, seconds in retrieval.timings.items():
+                observe("retrieval.stage", seconds, stage=stage)
+            if retrieval.context:
+                context = (
+                    "Use the following context to answer the question:\n\n"
+                    f"{retrieval.context}"
+                )
+                sources = sorted({result.chunk.doc_id for result in retrieval.results})
+                reference = f"[Context from: {', '.join(sources)}]"
+                block_hashes = retrieval.block_hashes
+
+        # Build the messages from the bounded history of the chat.
+        history = history_for(token, chat, self._chats.get(chat, []))
+        messages = history.messages(question, context)
+        previous_blocks = set(self._block_hashes.get(chat, []))
+        self._block_hashes[chat] = block_hashes
+        self._block_hashes = self._block_hashes
+        reused_blocks = sum(block in previous_blocks for block in block_hashes)
+        logger.info(
+            "Prompt prefix %s: %d messages, %d reused from the previous turn; "
+            "context blocks %s, %d reused",
+            history.prefix.hash,
+            history.prefix.messages,
+            history.prefix.reused,
+            " ".join(block_hashes) or "none",
+            reused_blocks,
+        )
+        # The share of prefix messages reused is prompt.prefix_reused over
+        # prompt.prefix_messages, and likewise for the context blocks.
+        count("prompt.prefix_messages", history.prefix.messages, app="reflex")
+        count("prompt.prefix_reused", history.prefix.reused, app="reflex")
+        count("prompt.context_blocks", len(block_hashes), app="reflex")
+        count("prompt.context_blocks_reused", reused_blocks, app="reflex")
+        observe("prompt.build", time.perf_counter() - started, app="reflex")
+
+        # Replay the answer to the same question asked with the same prompt.
+        model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        fingerprint = ResponseCache.fingerprint(
+            history.prefix.hash,
+            context,
+            "" if RESPONSE_CACHE_SHARED else self.router.session.client_token,
         )
+        cached = None
+        if response_cache is not None:
+            cached = await asyncio.to_thread(
+                response_cache.get, model, question, fingerprint
+            )
+            count("response_cache.lookups", app="reflex", hit=cached is not None)
+
+        try:
+            request_started = time.perf_counter()
+            if cached is not None:
+                deltas = replay(cached)
+            else:
+                # Start a new session to answer the question.
+                session = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                )
+                deltas = content_deltas(session)
+            deltas = measure_stream(
+                deltas, request_started, model=model, cached=cached is not None
+            )
 
-        # Stream the results, yielding after every word.
-        for item in session:
-            if item.choices and hasattr(item.choices[0].delta, "content"):
-                answer_text = item.choices[0].delta.content
-                # Ensure answer_text is not None before concatenation
-                if answer_text is not None:
-                    self._chats[self.current_chat][-1]["answer"] += answer_text
-                else:
-                    # Handle the case where answer_text is None,
-                    # perhaps log it or assign a default value.
-                    answer_text = ""
-                    self._chats[self.current_chat][-1]["answer"] += answer_text
-                self._chats = self._chats
+            # Stream the answer in coalesced chunks. Only the small streaming
+            # var is sent with each update, not the whole chat.
+            async for text in coalesce(deltas, STREAM_INTERVAL, STREAM_MAX_CHARS):
+                self.streaming_answer += text
                 yield
+            observe("chat.answer", time.perf_counter() - started, app="reflex")
+
+            if cached is None and response_cache is not None:
+                await asyncio.to_thread(
+                    response_cache.put,
+                    model,
+                    question,
+                    fingerprint,
+                    self.streaming_answer,
+                )
+        finally:
+            # Move the answer to the chat, sending the chat once.
+            if chat in self._chats:
+                self._chats[chat].append(
+                    QA(question=question, answer=self.streaming_answer)
+                )
+                self._chats = self._chats
+                history.add(question, self.streaming_answer, reference)
+            self.streaming_question = self.streaming_answer = ""
 
-        # Toggle the processing flag.
-        self.processing = False
+            # Toggle the processing flag.
+            self.processing = False
 
         # Note: We currently keep context persistent for "Chat with PDF" behavior.
         # If per-message attachment is desired, we should clear it here.
@@ -0,0 +1,130 @@
+"""Check that chat prompts keep a stable prefix across turns.
+
+Servers with prefix caching (vLLM, SGLang) only reuse the KV cache of the
+leading bytes a prompt shares with a previous one. This runs a conversation
+through a local stub of ``POST /v1/chat/completions``, which records the raw
+request bodies, and compares each request with the previous one:
+
+- the share of the previous request's stable prefix (the bytes before its
+  question) repeated verbatim at the start of the new request;
+- the prefix hash and reused messages reported by `ConversationHistory`.
+
+Every turn but the compacting ones should repeat 100% of the prefix.
+
+Usage:
+    uv run python benchmarks/prefix_cache.py --turns 20 --max-tokens 1000
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from conversation import ConversationHistory
+from openai import OpenAI
+
+
+class StubServer(ThreadingHTTPServer):
+    """OpenAI-compatible chat completions endpoint recording its requests."""
+
+    daemon_threads = True
+
+    def __init__(self, answer_words: int):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.answer_words = answer_words
+        self.bodies: list[bytes] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.bodies.append(body)
+        turn = len(self.server.bodies)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i in range(self.server.answer_words):
+            chunk = {
+                "id": f"stub-{turn}",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "stub",
+                "choices": [{"index": 0, "delta": {"content": f" word{turn}.{i}"}}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def stable_prefix(body: bytes) -> bytes:
+    """Bytes of a request body before its last message, the question."""
+    return body[: body.rfind(b'{"role":"user"')]
+
+
+def common_prefix(a: bytes, b: bytes) -> int:
+    """Length of the common prefix of two byte strings."""
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--context-words", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=1000)
+    args = parser.parse_args()
+
+    server = StubServer(args.answer_words)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(base_url=server.base_url, api_key="stub")
+    history = ConversationHistory(
+        "You are a helpful assistant.", max_tokens=args.max_tokens
+    )
+
+    print(
+        f"{'turn':>4} {'prefix hash':<17} {'messages':>8} {'reused':>6} "
+        f"{'bytes':>7} {'repeated':>9}"
+    )
+    previous = None
+    for turn in range(args.turns):
+        question = f"Question {turn}?"
+        context = " ".join(f"chunk{turn}.{i}" for i in range(args.context_words))
+        stream = client.chat.completions.create(
+            model="stub",
+            messages=history.messages(question, context),
+            stream=True,
+        )
+        answer = "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+        history.add(question, answer, f"[Context from: doc{turn}.pdf]")
+
+        body = server.bodies[-1]
+        repeated = ""
+        if previous is not None:
+            stable = stable_prefix(previous)
+            repeated = f"{common_prefix(stable, body) / len(stable):>9.0%}"
+        prefix = history.prefix
+        print(
+            f"{turn:>4} {prefix.hash:<17} {prefix.messages:>8} {prefix.reused:>6} "
+            f"{len(body):>7,} {repeated:>9}"
+        )
+        previous = body
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark the state-sync traffic of a streamed answer in the Reflex app.
+
+Reflex sends the dirty state vars to the browser with each update, as JSON.
+This replays a synthetic token stream and counts the updates and bytes sent
+for one answer when:
+
+- every token re-dirties the whole chat (the chat list is sent per token);
+- every token updates a dedicated streaming var;
+- tokens are coalesced with `coalesce` before updating that var.
+
+Usage:
+    uv run python benchmarks/streaming.py --history 0 10 50 --tokens 400
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from conversation import coalesce
+
+
+def payload(name: str, value: object) -> int:
+    """Size of the update sending a state var, in bytes."""
+    return len(json.dumps({"delta": {"state": {name: value}}}).encode())
+
+
+async def tokens(count: int, interval: float):
+    """Synthetic stream of word-sized tokens."""
+    for i in range(count):
+        await asyncio.sleep(interval)
+        yield f" mot{i % 97}"
+
+
+async def measure(args: argparse.Namespace, history: int) -> list[tuple]:
+    chat = [
+        {"question": f"Question {i}?", "answer": "réponse " * args.answer_words}
+        for i in range(history)
+    ]
+    rows = []
+
+    # Whole chat per token.
+    updates = sent = 0
+    answer = ""
+    async for token in tokens(args.tokens, 0):
+        answer += token
+        updates += 1
+        sent += payload(
+            "selected_chat", chat + [{"question": "Question?", "answer": answer}]
+        )
+    rows.append(("chat per token", updates, sent, None))
+
+    # Streaming var per token.
+    updates = sent = 0
+    answer = ""
+    async for token in tokens(args.tokens, 0):
+        answer += token
+        updates += 1
+        sent += payload("streaming_answer", answer)
+    rows.append(("var per token", updates, sent, None))
+
+    # Coalesced streaming var, with tokens arriving in real time.
+    updates = sent = 0
+    answer = ""
+    first = None
+    start = time.perf_counter()
+    async for text in coalesce(
+        tokens(args.tokens, args.token_interval),
+        args.interval,
+        args.max_chars,
+    ):
+        if first is None:
+            first = (time.perf_counter() - start) * 1000
+        answer += text
+        updates += 1
+        sent += payload("streaming_answer", answer)
+    rows.append(("coalesced var", updates, sent, first))
+    return rows
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 10, 50])
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--answer-words", type=int, default=300)
+    parser.add_argument("--token-interval", type=float, default=0.005)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--max-chars", type=int, default=256)
+    args = parser.parse_args()
+
+    print(
+        f"{'history':>7} {'strategy':<15} {'updates':>8} "
+        f"{'KB/answer':>10} {'first (ms)':>11}"
+    )
+    for history in args.history:
+        for strategy, updates, sent, first in await measure(args, history):
+            first = f"{first:>11.1f}" if first is not None else f"{'':>11}"
+            print(
+                f"{history:>7} {strategy:<15} {updates:>8} "
+                f"{sent / 1024:>10,.1f} {first}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
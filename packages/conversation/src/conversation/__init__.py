@@ -0,0 +1,44 @@
+"""Conversation - Response streaming and conversation state for the chat apps.
+
+This package holds the chat logic shared by the Chainlit and Reflex apps,
+independently of their UI framework.
+
+Example usage:
+    from conversation import ConversationHistory, StreamStats, coalesce
+
+    history = ConversationHistory("You are a helpful assistant.", max_tokens=4000)
+    messages = history.messages(question, context)
+
+    stats = StreamStats()
+    answer = ""
+    async for text in coalesce(tokens, interval=0.05, max_chars=256, stats=stats):
+        answer += text
+        await send(text)
+
+    history.add(question, answer, reference="[Attached: report.pdf]")
+
+    # Hash of the prompt prefix a server with prefix caching can reuse
+    print(history.prefix.hash, history.prefix.reused)
+"""
+
+from .cache import ResponseCache, ResponseCacheStats, normalize_question, replay
+from .history import ConversationHistory, Turn, truncate_summary
+from .prefix import PromptPrefix, prefix_hashes, shared_prefix
+from .streaming import StreamStats, coalesce
+
+__all__ = [
+    "ResponseCache",
+    "ResponseCacheStats",
+    "normalize_question",
+    "replay",
+    "ConversationHistory",
+    "Turn",
+    "truncate_summary",
+    "PromptPrefix",
+    "prefix_hashes",
+    "shared_prefix",
+    "StreamStats",
+    "coalesce",
+]
+
+__version__ = "0.1.0"
@@ -0,0 +1,225 @@
+"""Response cache for repeated questions.
+
+Users often ask the same question about the same documents, and each one
+costs a full completion. `ResponseCache` keeps recent answers keyed by the
+model, the normalized question and a fingerprint of everything else in the
+prompt (history, retrieved context), so an answer is only reused for an
+identical prompt up to the wording of the question. With an embedding
+function, a question whose embedding is close enough to a cached question's
+with the same fingerprint is a hit too. Answers expire after a TTL, and the
+least recently used are evicted beyond ``max_entries``.
+
+`replay` streams a cached answer back in chunks, so a hit goes through the
+same streaming path as a generated answer.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class ResponseCacheStats:
+    """Hit and miss counters of a `ResponseCache`."""
+
+    exact_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    expired: int = 0
+
+    @property
+    def hits(self) -> int:
+        """Total hits, exact and near-duplicate."""
+        return self.exact_hits + self.similar_hits
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class _Entry:
+    answer: str
+    group: str
+    expires: float
+    vector: np.ndarray | None
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different wordings match.
+
+    Applies Unicode compatibility normalization, case folding, whitespace
+    collapsing and strips trailing punctuation.
+    """
+    question = unicodedata.normalize("NFKC", question).casefold()
+    return " ".join(question.split()).rstrip(" ?!.")
+
+
+class ResponseCache:
+    """In-memory cache of answers with TTL and LRU eviction.
+
+    Args:
+        max_entries: Maximum number of answers kept.
+        ttl: Seconds an answer stays valid.
+        embed: Optional function embedding a list of texts into the rows of
+               an array (e.g. `OpenAIEmbedder.embed`). Enables near-duplicate
+               matching.
+        threshold: Minimum cosine similarity between two questions for a
+                   near-duplicate hit.
+        clock: Time source, in seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+        embed: Callable[[list[str]], np.ndarray] | None = None,
+        threshold: float = 0.95,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embed = embed
+        self.threshold = threshold
+        self.clock = clock
+        self.stats = ResponseCacheStats()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of answers kept, including expired ones not yet evicted."""
+        return len(self._entries)
+
+    @staticmethod
+    def fingerprint(*parts: str) -> str:
+        """Hash the parts of a prompt other than the question."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(model: str, question: str, fingerprint: str) -> str:
+        """Compute the cache key of a question asked with a given prompt."""
+        text = f"{model}\0{normalize_question(question)}\0{fingerprint}"
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, model: str, question: str, fingerprint: str) -> str | None:
+        """Look up the answer to a question.
+
+        Tries the exact key first, then, with an embedding function, the
+        most similar cached question with the same model and fingerprint.
+        Embedding runs outside the lock; call from a worker thread if the
+        function makes a network request.
+
+        Returns:
+            The cached answer, or None.
+        """
+        key = self.key(model, question, fingerprint)
+        group = f"{model}\0{fingerprint}"
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.stats.exact_hits += 1
+                return entry.answer
+            if self.embed is None or not self._has_group(group):
+                self.stats.misses += 1
+                return None
+
+        vector = _embed(self.embed, question)
+        with self._lock:
+            self._evict_expired()
+            best, best_score = None, self.threshold
+            for candidate, entry in self._entries.items():
+                if entry.group != group or entry.vector is None:
+                    continue
+                score = float(entry.vector @ vector)
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.stats.similar_hits += 1
+            return self._entries[best].answer
+
+    def put(self, model: str, question: str, fingerprint: str, answer: str) -> None:
+        """Cache the answer to a question, evicting the oldest if full."""
+        vector = _embed(self.embed, question) if self.embed is not None else None
+        key = self.key(model, question, fingerprint)
+        with self._lock:
+            self._entries[key] = _Entry(
+                answer=answer,
+                group=f"{model}\0{fingerprint}",
+                expires=self.clock() + self.ttl,
+                vector=vector,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, key: str) -> _Entry | None:
+        """Return a live entry, marking it recently used, and drop it if expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= self.clock():
+            del self._entries[key]
+            self.stats.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _evict_expired(self) -> None:
+        now = self.clock()
+        expired = [key for key, e in self._entries.items() if e.expires <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats.expired += len(expired)
+
+    def _has_group(self, group: str) -> bool:
+        return any(entry.group == group for entry in self._entries.values())
+
+
+def _embed(embed: Callable[[list[str]], np.ndarray], question: str) -> np.ndarray:
+    """Unit-length embedding of a normalized question."""
+    vector = np.asarray(embed([normalize_question(question)])[0], dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+async def replay(
+    answer: str, chunk_chars: int = 16, delay: float = 0.0
+) -> AsyncIterator[str]:
+    """Stream a cached answer in chunks cut at word boundaries.
+
+    Args:
+        answer: The text to stream.
+        chunk_chars: Approximate size of the chunks.
+        delay: Seconds to wait between chunks.
+
+    Yields:
+        Chunks whose concatenation is ``answer``.
+    """
+    start = 0
+    while start < len(answer):
+        end = answer.find(" ", start + chunk_chars)
+        end = len(answer) if end < 0 else end
+        yield answer[start:end]
+        start = end
+        await asyncio.sleep(delay)
@@ -0,0 +1,206 @@
+"""Bounded conversation history.
+
+Resending the whole conversation with every question makes prompts grow
+with each turn, and attachments pasted into a question are resent long
+after they were answered. `ConversationHistory` keeps the prompt bounded:
+
+- the context sent with a question (attachment text, retrieved chunks) is
+  only sent with that question, and replaced by a short reference in the
+  following turns;
+- the most recent turns are kept verbatim within a token budget;
+- older turns are folded into a rolling summary of bounded size.
+
+Prompts are also laid out for prefix caching: everything but the new
+question is identical to the previous prompt until the history is compacted,
+and `ConversationHistory.prefix` reports the hash of that stable prefix.
+"""
+
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, cast
+
+from pdf_context import estimate_tokens
+
+from .prefix import PromptPrefix, prefix_hashes, shared_prefix
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageParam
+
+# Characters of a question and of an answer kept by `truncate_summary`.
+_SUMMARY_QUESTION_CHARS = 200
+_SUMMARY_ANSWER_CHARS = 400
+
+
+@dataclass
+class Turn:
+    """A question and its answer.
+
+    Attributes:
+        question: The user's message, without the context sent with it.
+        answer: The assistant's answer.
+        reference: Short mention of the context that was sent with the
+                   question, e.g. ``"[Attached: report.pdf]"``.
+    """
+
+    question: str
+    answer: str
+    reference: str = ""
+
+    def messages(self) -> list[dict[str, str]]:
+        """The turn as chat completion messages."""
+        question = self.question
+        if self.reference:
+            question = f"{question}\n\n{self.reference}"
+        return [
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": self.answer},
+        ]
+
+
+def truncate_summary(summary: str, turns: Sequence[Turn], max_tokens: int) -> str:
+    """Fold turns into a summary by keeping the start of each message.
+
+    Needs no model call. Once the summary exceeds ``max_tokens``, its oldest
+    lines are dropped.
+    """
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        question = _shorten(turn.question, _SUMMARY_QUESTION_CHARS)
+        answer = _shorten(turn.answer, _SUMMARY_ANSWER_CHARS)
+        lines.append(f"- User: {question} {turn.reference}".rstrip())
+        lines.append(f"  Assistant: {answer}")
+
+    while len(lines) > 2 and estimate_tokens("\n".join(lines)) > max_tokens:
+        del lines[:2]
+    return "\n".join(lines)
+
+
+class ConversationHistory:
+    """Token-bounded history of a conversation.
+
+    Turns are kept verbatim until they exceed ``max_tokens``; the oldest
+    are then folded into the summary until they fit in half the budget, so
+    summarization runs every few turns rather than with each one.
+
+    Args:
+        system_prompt: Instructions sent first in every prompt.
+        max_tokens: Token budget of the verbatim turns.
+        summary_tokens: Token budget of the summary of older turns.
+        summarize: Function folding turns into the summary, called with the
+                   current summary, the turns and ``summary_tokens`` (e.g.
+                   a call to the LLM). Defaults to `truncate_summary`.
+        count_tokens: Token counting function.
+
+    Attributes:
+        prefix: Stable prefix of the last prompt built by `messages`.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str = "",
+        max_tokens: int = 4000,
+        summary_tokens: int = 500,
+        summarize: Callable[[str, Sequence[Turn], int], str] = truncate_summary,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize
+        self.count_tokens = count_tokens
+        self.turns: list[Turn] = []
+        self.summary = ""
+        self.prefix = PromptPrefix(hash="", messages=0, reused=0)
+        self._prefix_hashes: list[str] = []
+
+    def __len__(self) -> int:
+        """Number of turns kept verbatim."""
+        return len(self.turns)
+
+    @property
+    def tokens(self) -> int:
+        """Estimated tokens of the turns kept verbatim."""
+        return sum(self._turn_tokens(turn) for turn in self.turns)
+
+    def messages(
+        self, question: str, context: str = ""
+    ) -> list["ChatCompletionMessageParam"]:
+        """Build the messages of a prompt answering a question.
+
+        Args:
+            question: The user's message.
+            context: Text sent with this question only, e.g. retrieved
+                     chunks of the attached documents.
+
+        The context comes before the question in the last message, so the
+        prompt only differs from the previous one after its stable prefix.
+
+        Returns:
+            The system prompt, the summary of older turns, the recent turns
+            and the question with its context.
+        """
+        messages: list[dict[str, str]] = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        if self.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation:\n{self.summary}",
+                }
+            )
+        for turn in self.turns:
+            messages.extend(turn.messages())
+
+        hashes = prefix_hashes(messages)
+        self.prefix = PromptPrefix(
+            hash=hashes[-1] if hashes else "",
+            messages=len(hashes),
+            reused=shared_prefix(self._prefix_hashes, hashes),
+        )
+        self._prefix_hashes = hashes
+
+        context = context.strip()
+        content = f"{context}\n\n{question}" if context else question
+        messages.append({"role": "user", "content": content})
+        return cast("list[ChatCompletionMessageParam]", messages)
+
+    def add(self, question: str, answer: str, reference: str = "") -> None:
+        """Record an answered question, compacting older turns if needed.
+
+        Args:
+            question: The user's message, without its context.
+            answer: The assistant's answer.
+            reference: Short mention of the context sent with the question,
+                       kept in place of the context.
+        """
+        self.turns.append(Turn(question, answer, reference))
+        if self.tokens <= self.max_tokens:
+            return
+
+        folded = []
+        tokens = self.tokens
+        while self.turns and tokens > self.max_tokens // 2:
+            turn = self.turns.pop(0)
+            tokens -= self._turn_tokens(turn)
+            folded.append(turn)
+        self.summary = self.summarize(self.summary, folded, self.summary_tokens)
+
+    def clear(self) -> None:
+        """Forget every turn and the summary."""
+        self.turns.clear()
+        self.summary = ""
+        self.prefix = PromptPrefix(hash="", messages=0, reused=0)
+        self._prefix_hashes = []
+
+    def _turn_tokens(self, turn: Turn) -> int:
+        return sum(self.count_tokens(m["content"]) for m in turn.messages())
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    """Keep the start of a text on one line, cut at a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", max_chars // 2, max_chars)
+    return f"{text[: cut if cut > 0 else max_chars]}..."
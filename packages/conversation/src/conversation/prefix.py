@@ -0,0 +1,58 @@
+"""Prompt prefix hashing.
+
+Inference servers with prefix caching (vLLM, SGLang, most hosted APIs) only
+skip the prefill of a prompt's leading bytes when they are identical to a
+previous request's. `prefix_hashes` chains a hash over the messages of a
+prompt, so comparing the chains of two prompts shows how many leading
+messages they share, i.e. how much of the prompt a server can reuse.
+"""
+
+import hashlib
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """Stable prefix of a prompt.
+
+    Attributes:
+        hash: Hash of the prefix messages, identical across prompts whose
+              prefixes are identical byte for byte.
+        messages: Number of messages in the prefix.
+        reused: Number of leading messages shared with the previous prompt.
+    """
+
+    hash: str
+    messages: int
+    reused: int
+
+
+def prefix_hashes(messages: Sequence[dict[str, str]]) -> list[str]:
+    """Hash each prefix of a list of messages.
+
+    The i-th hash covers the first i + 1 messages, serialized as canonical
+    JSON, so two prompts have the same i-th hash exactly when their first
+    i + 1 messages are identical.
+
+    Returns:
+        One 16-character hex digest per message.
+    """
+    digest = hashlib.sha256()
+    hashes = []
+    for message in messages:
+        digest.update(json.dumps(message, sort_keys=True, ensure_ascii=False).encode())
+        digest.update(b"\0")
+        hashes.append(digest.copy().hexdigest()[:16])
+    return hashes
+
+
+def shared_prefix(previous: Sequence[str], current: Sequence[str]) -> int:
+    """Number of leading hashes two chains of `prefix_hashes` share."""
+    shared = 0
+    for a, b in zip(previous, current):
+        if a != b:
+            break
+        shared += 1
+    return shared
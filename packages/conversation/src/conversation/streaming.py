@@ -0,0 +1,110 @@
+"""Token coalescing for streamed responses.
+
+Chat completions stream one delta per token, and forwarding each of them to
+the browser costs a websocket message (and, in Reflex, a state update).
+`coalesce` merges the deltas of a stream into larger chunks, flushed every
+``interval`` seconds or once ``max_chars`` characters are buffered, so a
+reader sees the answer progress smoothly for a fraction of the messages.
+"""
+
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterable
+from dataclasses import dataclass
+
+
+@dataclass
+class StreamStats:
+    """Counters of a coalesced stream."""
+
+    tokens: int = 0
+    flushes: int = 0
+    chars: int = 0
+
+    @property
+    def tokens_per_flush(self) -> float:
+        """Average number of tokens merged into each flushed chunk."""
+        return self.tokens / self.flushes if self.flushes else 0.0
+
+
+async def coalesce(
+    tokens: AsyncIterable[str],
+    interval: float = 0.05,
+    max_chars: int = 256,
+    stats: StreamStats | None = None,
+) -> AsyncGenerator[str]:
+    """Merge the tokens of a stream into chunks.
+
+    The first token is yielded as soon as it arrives, so coalescing doesn't
+    delay the start of the answer. Later tokens are buffered until
+    ``interval`` seconds have passed since the previous chunk, even if the
+    stream stalls, or until ``max_chars`` characters are buffered. Whatever
+    is left is yielded when the stream ends. The stream is closed when the
+    consumer stops early.
+
+    Args:
+        tokens: Stream of text deltas; empty deltas are ignored.
+        interval: Maximum delay of a token, in seconds. 0 disables
+                  coalescing.
+        max_chars: Size of the buffer that triggers a flush regardless of
+                   the interval.
+        stats: Optional counters, updated as the stream is consumed.
+
+    Yields:
+        The concatenated text of the tokens, in order.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = aiter(tokens)
+    buffer: list[str] = []
+    size = 0
+    flushed_at = float("-inf")
+    next_token: asyncio.Future[str] | None = None
+
+    def flush() -> str:
+        nonlocal size, flushed_at
+        text = "".join(buffer)
+        buffer.clear()
+        size = 0
+        flushed_at = loop.time()
+        if stats is not None:
+            stats.flushes += 1
+            stats.chars += len(text)
+        return text
+
+    try:
+        while True:
+            if next_token is None:
+                next_token = asyncio.ensure_future(anext(iterator))
+            timeout = max(flushed_at + interval - loop.time(), 0) if buffer else None
+            done, _ = await asyncio.wait({next_token}, timeout=timeout)
+            if not done:
+                # The stream stalled: don't hold back what was received.
+                yield flush()
+                continue
+
+            try:
+                token = next_token.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_token = None
+            if not token:
+                continue
+
+            buffer.append(token)
+            size += len(token)
+            if stats is not None:
+                stats.tokens += 1
+            if size >= max_chars or loop.time() >= flushed_at + interval:
+                yield flush()
+
+        if buffer:
+            yield flush()
+    finally:
+        # Close the source, e.g. the HTTP stream of the answer, when the
+        # consumer stops early. A pending read must end before it can be.
+        if next_token is not None:
+            next_token.cancel()
+            await asyncio.wait({next_token})
+        close = getattr(iterator, "aclose", None)
+        if close is not None:
+            await close()
@@ -0,0 +1,110 @@
+import asyncio
+
+import numpy as np
+import pytest
+from conversation import ResponseCache, normalize_question, replay
+
+MODEL = "albert-large"
+FINGERPRINT = ResponseCache.fingerprint("prefix", "context")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def embed(texts: list[str]) -> np.ndarray:
+    """Embed questions on two axes: about the rent, and about the deposit."""
+    return np.array(
+        [[float("loyer" in text), float("caution" in text), 0.1] for text in texts]
+    )
+
+
+def test_normalize_question_ignores_case_whitespace_and_punctuation():
+    assert normalize_question("  Quel est le  LOYER ?! ") == "quel est le loyer"
+    assert normalize_question("ﬁn du bail.") == "fin du bail"
+
+
+def test_answers_are_keyed_by_model_question_and_fingerprint():
+    cache = ResponseCache()
+    cache.put(MODEL, "Quel est le loyer ?", FINGERPRINT, "800 €.")
+
+    assert cache.get(MODEL, "quel est le loyer", FINGERPRINT) == "800 €."
+    assert cache.get("other", "Quel est le loyer ?", FINGERPRINT) is None
+    other = ResponseCache.fingerprint("prefix", "context", "session")
+    assert cache.get(MODEL, "Quel est le loyer ?", other) is None
+    assert (cache.stats.exact_hits, cache.stats.misses) == (1, 2)
+    assert cache.stats.hit_rate == pytest.approx(1 / 3)
+
+
+def test_answers_expire_after_the_ttl():
+    clock = Clock()
+    cache = ResponseCache(ttl=60, clock=clock)
+    cache.put(MODEL, "Quel est le loyer ?", FINGERPRINT, "800 €.")
+
+    clock.now = 59.9
+    assert cache.get(MODEL, "Quel est le loyer ?", FINGERPRINT) == "800 €."
+    clock.now = 60
+    assert cache.get(MODEL, "Quel est le loyer ?", FINGERPRINT) is None
+    assert cache.stats.expired == 1
+    assert len(cache) == 0
+
+
+def test_least_recently_used_answers_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put(MODEL, "a", FINGERPRINT, "A")
+    cache.put(MODEL, "b", FINGERPRINT, "B")
+    cache.get(MODEL, "a", FINGERPRINT)
+    cache.put(MODEL, "c", FINGERPRINT, "C")
+
+    assert len(cache) == 2
+    assert cache.get(MODEL, "b", FINGERPRINT) is None
+    assert cache.get(MODEL, "a", FINGERPRINT) == "A"
+    assert cache.get(MODEL, "c", FINGERPRINT) == "C"
+
+
+def test_near_duplicates_hit_above_the_threshold():
+    cache = ResponseCache(embed=embed, threshold=0.95)
+    cache.put(MODEL, "Quel est le loyer ?", FINGERPRINT, "800 €.")
+
+    assert cache.get(MODEL, "Combien coûte le loyer ?", FINGERPRINT) == "800 €."
+    assert cache.get(MODEL, "Quelle est la caution ?", FINGERPRINT) is None
+    other = ResponseCache.fingerprint("prefix", "other context")
+    assert cache.get(MODEL, "Combien coûte le loyer ?", other) is None
+    assert (cache.stats.similar_hits, cache.stats.misses) == (1, 2)
+
+
+def test_near_duplicates_miss_below_the_threshold():
+    cache = ResponseCache(embed=embed, threshold=0.95)
+    cache.put(MODEL, "Le loyer et la caution ?", FINGERPRINT, "800 € et 1600 €.")
+
+    # Cosine similarity of about 0.71.
+    assert cache.get(MODEL, "Le loyer ?", FINGERPRINT) is None
+
+
+def test_near_duplicates_skip_expired_answers():
+    clock = Clock()
+    cache = ResponseCache(ttl=60, embed=embed, clock=clock)
+    cache.put(MODEL, "Quel est le loyer ?", FINGERPRINT, "800 €.")
+
+    clock.now = 60
+    assert cache.get(MODEL, "Combien coûte le loyer ?", FINGERPRINT) is None
+    assert cache.stats.expired == 1
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 5, 16, 1000])
+def test_replay_streams_the_whole_answer(chunk_chars):
+    answer = "Le loyer est de 800 € par mois, charges comprises."
+
+    async def run():
+        return [chunk async for chunk in replay(answer, chunk_chars)]
+
+    chunks = asyncio.run(run())
+
+    assert "".join(chunks) == answer
+    assert all(chunk for chunk in chunks)
+    if chunk_chars < len(answer):
+        assert len(chunks) > 1
@@ -0,0 +1,115 @@
+import json
+
+from conversation import ConversationHistory, truncate_summary
+from conversation.history import Turn
+from pdf_context import estimate_tokens
+
+
+def serialize(messages) -> bytes:
+    """The messages as sent in a request body."""
+    return json.dumps(messages, ensure_ascii=False).encode()
+
+
+def test_context_is_only_sent_with_its_question():
+    history = ConversationHistory("Be brief.")
+
+    messages = history.messages("What is the rent?", "lease.pdf: 800 EUR")
+    assert messages[-1] == {
+        "role": "user",
+        "content": "lease.pdf: 800 EUR\n\nWhat is the rent?",
+    }
+
+    history.add("What is the rent?", "800 EUR.", "[Context from: lease.pdf]")
+    messages = history.messages("And the deposit?")
+    assert "lease.pdf: 800 EUR" not in serialize(messages).decode()
+    assert messages[1]["content"] == "What is the rent?\n\n[Context from: lease.pdf]"
+
+
+def test_prompt_prefix_bytes_are_stable_across_turns():
+    history = ConversationHistory("Be brief.", max_tokens=10_000)
+    previous: list = []
+
+    for turn in range(5):
+        question = f"Question {turn}?"
+        messages = history.messages(question, f"context {turn}")
+        # Everything before the new question is the previous prompt's
+        # prefix followed by the previous turn, byte for byte.
+        prefix = serialize(messages[:-1])[:-1]
+        assert prefix.startswith(serialize(previous)[:-1])
+        assert history.prefix.messages == len(messages) - 1
+        # The whole previous prefix is reused: only the last turn is new.
+        assert history.prefix.reused == (len(messages) - 3 if turn else 0)
+
+        history.add(question, f"Answer {turn}.")
+        previous = messages[:-1]
+
+
+def test_prefix_hash_only_changes_when_the_prefix_does():
+    history = ConversationHistory("Be brief.")
+    history.messages("First?")
+    first = history.prefix.hash
+
+    history.messages("First, rephrased?", "some context")
+    assert history.prefix.hash == first
+
+    history.add("First?", "Yes.")
+    history.messages("Second?")
+    assert history.prefix.hash != first
+
+
+def test_old_turns_are_folded_into_a_summary():
+    history = ConversationHistory("Be brief.", max_tokens=100, summary_tokens=1000)
+
+    for turn in range(10):
+        history.add(f"Question {turn} " + "word " * 20, f"Answer {turn}.")
+
+    assert history.tokens <= 100
+    assert 0 < len(history) < 10
+    assert "Question 0" in history.summary
+    messages = history.messages("Next?")
+    summary = messages[1]
+    assert summary["role"] == "system"
+    assert summary.get("content") == (
+        f"Summary of the earlier conversation:\n{history.summary}"
+    )
+
+
+def test_compaction_resets_the_reused_prefix():
+    history = ConversationHistory("Be brief.", max_tokens=60)
+    history.messages("Question 0?")
+    for turn in range(5):
+        history.add(f"Question {turn}? " + "word " * 10, f"Answer {turn}.")
+        history.messages(f"Question {turn + 1}?")
+        if history.summary:
+            break
+
+    # The summary replaced the turns after the system prompt.
+    assert history.summary
+    assert history.prefix.reused == 1
+
+
+def test_truncate_summary_keeps_the_latest_lines_within_budget():
+    turns = [Turn(f"Question {i} " + "x" * 300, f"Answer {i}.") for i in range(20)]
+
+    summary = truncate_summary("", turns, max_tokens=200)
+
+    lines = summary.splitlines()
+    assert lines[-1] == "  Assistant: Answer 19."
+    assert "Question 0" not in summary
+    assert estimate_tokens(summary) <= 200
+    assert all(len(line) < 250 for line in lines)
+
+
+def test_clear_forgets_turns_summary_and_prefix():
+    history = ConversationHistory("Be brief.", max_tokens=20)
+    for turn in range(3):
+        history.add(f"Question {turn} " + "word " * 10, "Answer.")
+    history.messages("Next?")
+
+    history.clear()
+
+    assert (len(history), history.summary, history.prefix.hash) == (0, "", "")
+    assert history.messages("Hi?") == [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "Hi?"},
+    ]
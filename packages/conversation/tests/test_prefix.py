@@ -0,0 +1,35 @@
+from conversation import prefix_hashes, shared_prefix
+
+SYSTEM = {"role": "system", "content": "Be brief."}
+QUESTION = {"role": "user", "content": "Quel est le loyer ?"}
+ANSWER = {"role": "assistant", "content": "800 €."}
+
+
+def test_hashes_chain_over_the_messages():
+    hashes = prefix_hashes([SYSTEM, QUESTION, ANSWER])
+
+    assert len(hashes) == 3
+    assert len(set(hashes)) == 3
+    assert all(len(digest) == 16 for digest in hashes)
+    assert prefix_hashes([SYSTEM, QUESTION]) == hashes[:2]
+
+
+def test_hashes_ignore_key_order_but_not_content():
+    reordered = {"content": "Be brief.", "role": "system"}
+    changed = {"role": "system", "content": "Be brief!"}
+
+    assert prefix_hashes([reordered]) == prefix_hashes([SYSTEM])
+    assert prefix_hashes([changed]) != prefix_hashes([SYSTEM])
+
+
+def test_a_changed_message_changes_every_later_hash():
+    previous = prefix_hashes([SYSTEM, QUESTION, ANSWER])
+    current = prefix_hashes([{"role": "system", "content": "Hi."}, QUESTION, ANSWER])
+
+    assert shared_prefix(previous, current) == 0
+
+
+def test_shared_prefix_counts_leading_hashes():
+    assert shared_prefix(["a", "b", "c"], ["a", "b", "d", "e"]) == 2
+    assert shared_prefix(["a", "b"], ["a", "b", "c"]) == 2
+    assert shared_prefix([], ["a"]) == 0
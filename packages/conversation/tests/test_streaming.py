@@ -0,0 +1,100 @@
+import asyncio
+
+from conversation import StreamStats, coalesce
+
+
+class Source:
+    """Stream of tokens, with pauses given as numbers of seconds."""
+
+    def __init__(self, *items: str | float):
+        self.items = items
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for item in self.items:
+                if isinstance(item, str):
+                    yield item
+                else:
+                    await asyncio.sleep(item)
+        finally:
+            self.closed = True
+
+
+def collect(tokens, **options) -> list[str]:
+    async def run():
+        return [chunk async for chunk in coalesce(tokens, **options)]
+
+    return asyncio.run(run())
+
+
+def test_tokens_are_flushed_once_max_chars_are_buffered():
+    source = Source(*["ab"] * 6)
+
+    chunks = collect(source.stream(), interval=10, max_chars=4)
+
+    # The first token is sent at once, the last ones when the stream ends.
+    assert chunks == ["ab", "abab", "abab", "ab"]
+
+
+def test_tokens_are_flushed_on_interval():
+    source = Source("a", "b", 0.03, "c", 0.03, "d", 0.03, "e")
+
+    chunks = collect(source.stream(), interval=0.05, max_chars=100)
+
+    assert "".join(chunks) == "abcde"
+    assert chunks[0] == "a"
+    assert 2 <= len(chunks) < 5
+
+
+def test_buffered_tokens_are_flushed_when_the_stream_stalls():
+    source = Source("a", "b", "c", 0.3, "d")
+
+    chunks = collect(source.stream(), interval=0.05, max_chars=100)
+
+    assert chunks == ["a", "bc", "d"]
+
+
+def test_zero_interval_disables_coalescing():
+    source = Source("a", "", "b", "c")
+
+    assert collect(source.stream(), interval=0) == ["a", "b", "c"]
+
+
+def test_stats_count_tokens_flushes_and_chars():
+    stats = StreamStats()
+    source = Source(*["ab"] * 6, "")
+
+    collect(source.stream(), interval=10, max_chars=4, stats=stats)
+
+    assert (stats.tokens, stats.flushes, stats.chars) == (6, 4, 12)
+    assert stats.tokens_per_flush == 1.5
+    assert StreamStats().tokens_per_flush == 0.0
+
+
+def test_source_is_closed_when_the_consumer_stops_early():
+    source = Source("a", "b", "c")
+
+    async def run():
+        async with asyncio.timeout(1):
+            chunks = coalesce(source.stream(), interval=10)
+            assert await anext(chunks) == "a"
+            await chunks.aclose()
+            # Closed right away, not when the event loop shuts down.
+            assert source.closed
+
+    asyncio.run(run())
+
+
+def test_pending_read_is_cancelled_when_the_consumer_stops_early():
+    source = Source("a", "b", 10, "c")
+
+    async def run():
+        async with asyncio.timeout(1):
+            chunks = coalesce(source.stream(), interval=0.05)
+            assert [await anext(chunks), await anext(chunks)] == ["a", "b"]
+            await chunks.aclose()
+            # Closed right away, not when the event loop shuts down.
+            assert source.closed
+
+    asyncio.run(run())
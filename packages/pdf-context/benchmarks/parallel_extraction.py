@@ -0,0 +1,57 @@
+"""Benchmark serial vs. parallel page extraction against page count.
+
+Builds documents of increasing size by repeating the pages of a sample PDF,
+then times `extract_text_from_bytes` with and without a process pool.
+
+Usage:
+    uv run python benchmarks/parallel_extraction.py sample.pdf \
+        --pages 50 200 600 --workers 4
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+from pdf_context import extract_text_from_bytes
+from pypdf import PdfReader, PdfWriter
+
+
+def build_document(sample: PdfReader, page_count: int) -> bytes:
+    """Build a PDF of ``page_count`` pages by cycling the sample's pages."""
+    writer = PdfWriter()
+    for i in range(page_count):
+        writer.add_page(sample.pages[i % len(sample.pages)])
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def timed(pdf_bytes: bytes, workers: int | None) -> tuple[float, str]:
+    start = time.perf_counter()
+    text = extract_text_from_bytes(pdf_bytes, workers=workers)
+    return time.perf_counter() - start, text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sample", help="PDF whose pages are repeated")
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 600])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    sample = PdfReader(args.sample)
+    print(f"{'pages':>6} {'serial (s)':>11} {'parallel (s)':>13} {'speedup':>8}")
+
+    for page_count in args.pages:
+        pdf_bytes = build_document(sample, page_count)
+        serial, serial_text = timed(pdf_bytes, None)
+        parallel, parallel_text = timed(pdf_bytes, args.workers)
+        assert serial_text == parallel_text, "parallel output differs from serial"
+        print(
+            f"{page_count:>6} {serial:>11.2f} {parallel:>13.2f} "
+            f"{serial / parallel:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -14,17 +14,49 @@ Example usage:
 
     # Or use the convenience function
     context = process_pdf_file("document.pdf")
+
+    # Or stream page by page
+    for chunk in iter_as_context(iter_pages("document.pdf"), "document.pdf"):
+        ...
 """
 
-from .extractor import extract_text_from_bytes, extract_text_from_pdf
-from .formatter import format_as_context, process_multiple_files, process_pdf_file
+from .budget import BudgetedContext, build_context, estimate_tokens
+from .cache import CacheStats, ExtractionCache
+from .chunker import Chunk, chunk_text, iter_chunks
+from .extractor import (
+    PageSelection,
+    cached_pages,
+    extract_text_from_bytes,
+    extract_text_from_pdf,
+    iter_pages,
+)
+from .formatter import (
+    aprocess_multiple_files,
+    format_as_context,
+    iter_as_context,
+    process_multiple_files,
+    process_pdf_file,
+)
 
 __all__ = [
     "extract_text_from_pdf",
     "extract_text_from_bytes",
+    "iter_pages",
+    "cached_pages",
     "format_as_context",
+    "iter_as_context",
     "process_pdf_file",
     "process_multiple_files",
+    "aprocess_multiple_files",
+    "ExtractionCache",
+    "CacheStats",
+    "PageSelection",
+    "build_context",
+    "estimate_tokens",
+    "BudgetedContext",
+    "iter_chunks",
+    "chunk_text",
+    "Chunk",
 ]
 
 __version__ = "0.1.0"
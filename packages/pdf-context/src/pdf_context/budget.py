@@ -0,0 +1,174 @@
+"""Token-budget-aware context assembly.
+
+Fits the text of several documents into a token budget before it is
+injected into a prompt, instead of pasting every document in full.
+"""
+
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Literal
+
+from telemetry import traced
+
+from .formatter import format_as_context
+
+# Average characters per token of BPE tokenizers on French and English prose.
+CHARS_PER_TOKEN = 4
+
+# Number of excerpts kept from a document by the "sample" strategy.
+SAMPLE_WINDOWS = 8
+
+Strategy = Literal["truncate", "sample", "summarize"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text from its length.
+
+    Much faster than running a tokenizer, and close enough to size prompts.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass
+class BudgetedContext:
+    """Context fitted into a token budget.
+
+    Attributes:
+        text: Formatted context ready for injection into a prompt.
+        tokens: Estimated token count of ``text``.
+        dropped_tokens: Estimated number of document tokens left out.
+        reduced_files: Names of the documents that were cut down.
+        blocks: The delimited block of each document, in order; ``text`` is
+                their concatenation.
+    """
+
+    text: str
+    tokens: int
+    dropped_tokens: int = 0
+    reduced_files: list[str] = field(default_factory=list)
+    blocks: list[str] = field(default_factory=list)
+
+
+def _omission(tokens: int) -> str:
+    """Marker telling the LLM that part of a document was left out."""
+    return f"\n[... {tokens} tokens omitted ...]\n"
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Keep the beginning of a text, cut at a word boundary."""
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    cut = head.rfind(" ", max_chars // 2)
+    return head[:cut] if cut > 0 else head
+
+
+def _fit(text: str, tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """Truncate a text to about ``tokens`` tokens, using its own ratio."""
+    size = count_tokens(text)
+    if size <= tokens:
+        return text
+    return _truncate(text, len(text) * max(0, tokens) // size)
+
+
+def _sample(text: str, max_chars: int, windows: int) -> list[str]:
+    """Keep evenly spaced windows of a text, including its start and end."""
+    size = max_chars // windows
+    step = (len(text) - size) / (windows - 1)
+    return [text[round(i * step) : round(i * step) + size] for i in range(windows)]
+
+
+def _allocate(sizes: Sequence[int], budget: int) -> list[int]:
+    """Share a budget between documents, giving small ones all they need.
+
+    Documents under an equal share keep their full size and the remainder
+    is split again between the larger ones.
+    """
+    shares = [0] * len(sizes)
+    remaining = sorted(range(len(sizes)), key=lambda i: sizes[i])
+
+    while remaining:
+        share = budget // len(remaining)
+        index = remaining[0]
+        if sizes[index] > share:
+            for index in remaining:
+                shares[index] = share
+            break
+        shares[index] = sizes[index]
+        budget -= sizes[index]
+        remaining.pop(0)
+
+    return shares
+
+
+@traced("context.build")
+def build_context(
+    documents: Sequence[tuple[str, str]],
+    max_tokens: int,
+    strategy: Strategy = "truncate",
+    summarize: Callable[[str, int], str] | None = None,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> BudgetedContext:
+    """Format documents for context injection within a token budget.
+
+    The budget is shared fairly: documents that fit in an equal share are
+    kept whole, and the others are reduced to what is left.
+
+    Args:
+        documents: ``(filename, text)`` pairs, in the order to inject them.
+        max_tokens: Token budget for the whole formatted context.
+        strategy: How to reduce a document that doesn't fit:
+                  ``"truncate"`` keeps its beginning, ``"sample"`` keeps
+                  evenly spaced excerpts from start to end (falling back
+                  to truncation for very small shares), and
+                  ``"summarize"`` replaces it with ``summarize(text, tokens)``.
+        summarize: Summarization function, required by the ``"summarize"``
+                   strategy (e.g. a call to the LLM).
+        count_tokens: Token counting function. Defaults to a fast
+                      length-based estimate.
+
+    Returns:
+        The fitted context and how many tokens were dropped.
+
+    Raises:
+        ValueError: If the ``"summarize"`` strategy is used without a
+                    ``summarize`` function.
+    """
+    if strategy == "summarize" and summarize is None:
+        raise ValueError("The 'summarize' strategy requires a summarize function")
+
+    overhead = sum(count_tokens(format_as_context("", name)) for name, _ in documents)
+    sizes = [count_tokens(text) for _, text in documents]
+    shares = _allocate(sizes, max(0, max_tokens - overhead))
+
+    parts: list[str] = []
+    dropped_tokens = 0
+    reduced_files: list[str] = []
+
+    for (filename, text), size, share in zip(documents, sizes, shares, strict=True):
+        if size > share:
+            marker_tokens = count_tokens(_omission(size))
+            # Windows of at least ~50 tokens, one omission marker between each.
+            windows = min(SAMPLE_WINDOWS, share // 50)
+            if strategy == "summarize" and summarize is not None:
+                text = _fit(summarize(text, share), share, count_tokens)
+            elif strategy == "sample" and windows > 1:
+                available = max(0, share - (windows - 1) * marker_tokens)
+                excerpts = _sample(text, len(text) * available // size, windows)
+                omitted = (size - share) // (windows - 1)
+                text = _omission(omitted).join(excerpts)
+            else:
+                text = _fit(text, share - marker_tokens, count_tokens)
+                text += _omission(size - share)
+            dropped_tokens += size - share
+            reduced_files.append(filename)
+        parts.append(format_as_context(text, filename))
+
+    context = "".join(parts)
+    return BudgetedContext(
+        text=context,
+        tokens=count_tokens(context),
+        dropped_tokens=dropped_tokens,
+        reduced_files=reduced_files,
+        blocks=parts,
+    )
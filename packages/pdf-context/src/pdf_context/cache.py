@@ -0,0 +1,182 @@
+"""Content-addressed extraction cache.
+
+Caches extracted text keyed by a hash of the PDF content and the extractor
+version, so re-uploading the same document skips pypdf entirely. Entries
+live in an in-memory LRU tier and, optionally, in an on-disk SQLite tier
+that survives restarts and is shared between worker processes.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Buffer, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import pypdf
+
+# Bump when a change to the extractor alters its output, to invalidate
+# previously cached text.
+EXTRACTOR_VERSION = "1"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters of an `ExtractionCache`."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        """Total hits across both tiers."""
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ExtractionCache:
+    """Two-tier cache of extracted PDF text, keyed by content hash.
+
+    Args:
+        max_entries: Maximum number of documents kept in the memory tier.
+        directory: Optional directory for the on-disk SQLite tier.
+                   If not provided, only the memory tier is used.
+        max_disk_bytes: Size budget of the disk tier; least recently used
+                        entries are evicted once it is exceeded.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        directory: str | Path | None = None,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = CacheStats()
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+        if directory is not None:
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                directory / "extraction-cache.sqlite3", check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _hash(chunks: Iterable[Buffer]) -> str:
+        """Hash the extractor version followed by the content chunks."""
+        digest = hashlib.sha256()
+        digest.update(f"{EXTRACTOR_VERSION}/pypdf-{pypdf.__version__}\0".encode())
+        for chunk in chunks:
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    @classmethod
+    def key_for_bytes(cls, pdf_bytes: Buffer) -> str:
+        """Compute the cache key of in-memory PDF content."""
+        return cls._hash([pdf_bytes])
+
+    @classmethod
+    def key_for_file(cls, path: str | Path) -> str:
+        """Compute the cache key of a PDF file, reading it in chunks."""
+        with open(path, "rb") as f:
+            return cls._hash(iter(lambda: f.read(_HASH_CHUNK_SIZE), b""))
+
+    def get(self, key: str) -> str | None:
+        """Look up cached text, checking the memory tier then the disk tier.
+
+        Returns:
+            The cached text, or None on a miss.
+        """
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return text
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT text FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE entries SET accessed = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.stats.disk_hits += 1
+                    return row[0]
+
+            self.stats.misses += 1
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        """Store extracted text in both tiers."""
+        with self._lock:
+            self._remember(key, text)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    (key, text, len(text.encode()), time.time()),
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def _remember(self, key: str, text: str) -> None:
+        """Insert into the memory tier, evicting the least recently used."""
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """Delete least recently used disk entries until under budget."""
+        assert self._db is not None
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= self.max_disk_bytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT key, size FROM entries ORDER BY accessed ASC"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
@@ -0,0 +1,193 @@
+"""Text chunking module.
+
+Splits extracted text into overlapping chunks for retrieval. Chunks are
+described by compact records (document id, page and character offsets)
+and are produced in a single pass over the page stream, holding no more
+than a chunk's worth of text beyond the current page.
+"""
+
+import re
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Literal
+
+Strategy = Literal["fixed", "sentence", "page"]
+
+# Boundaries a chunk may end on, by strategy. Pages fall back to words
+# when a single page is larger than a chunk.
+_BOUNDARIES = {
+    "fixed": re.compile(r"\s+"),
+    "sentence": re.compile(r"(?<=[.!?…:;])\s+"),
+    "page": re.compile(r"\s+"),
+}
+_WORD_BOUNDARY = _BOUNDARIES["fixed"]
+
+
+@dataclass(frozen=True, slots=True)
+class Chunk:
+    """A chunk of a document, as offsets into its text.
+
+    Offsets index the document text as returned by `extract_text_from_pdf`
+    (non-empty pages joined by newlines), so ``text[chunk.start:chunk.end]``
+    gives the chunk's content.
+
+    Attributes:
+        doc_id: Identifier of the source document.
+        page: 1-based page number the chunk starts on.
+        start: Offset of the first character of the chunk.
+        end: Offset just past the last character of the chunk.
+    """
+
+    doc_id: str
+    page: int
+    start: int
+    end: int
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+
+def _last_boundary(
+    pattern: re.Pattern[str], text: str, low: int, high: int
+) -> int | None:
+    """Return the end of the last boundary match in ``text[low:high]``."""
+    end = None
+    for match in pattern.finditer(text, low, high):
+        end = match.end()
+    return end
+
+
+def _first_boundary(
+    pattern: re.Pattern[str], text: str, low: int, high: int
+) -> int | None:
+    """Return the end of the first boundary match in ``text[low:high]``."""
+    match = pattern.search(text, low, high)
+    return match.end() if match else None
+
+
+def iter_chunks(
+    pages: Iterable[tuple[int, str]],
+    doc_id: str,
+    strategy: Strategy = "sentence",
+    size: int = 1500,
+    overlap: int = 200,
+) -> Iterator[tuple[Chunk, str]]:
+    """Stream chunks of a document from its pages.
+
+    Args:
+        pages: Iterable of ``(page_number, text)`` tuples, e.g. from
+               `iter_pages`. Pages are consumed one at a time.
+        doc_id: Identifier of the document, copied into each chunk.
+        strategy: ``"fixed"`` cuts chunks of about ``size`` characters at
+                  word boundaries, ``"sentence"`` keeps whole sentences
+                  when possible, and ``"page"`` never lets a chunk span
+                  two pages.
+        size: Maximum chunk size, in characters.
+        overlap: Number of characters shared by consecutive chunks.
+
+    Yields:
+        Tuples of the chunk record and its text.
+
+    Raises:
+        ValueError: If ``overlap`` isn't smaller than ``size``.
+    """
+    if not 0 <= overlap < size:
+        raise ValueError(f"overlap must be in [0, size), got {overlap}")
+
+    boundary = _BOUNDARIES[strategy]
+    # Pending text, and the document offset of its first character.
+    buffer = ""
+    buffer_offset = 0
+    position = 0  # Start of the next chunk, relative to the buffer.
+    page_starts: list[int] = []
+    page_numbers: list[int] = []
+
+    def cut_chunks(final: bool) -> Iterator[tuple[Chunk, str]]:
+        nonlocal buffer, buffer_offset, position
+
+        while True:
+            # Skip whitespace so chunks never start with it.
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            remaining = len(buffer) - position
+            if remaining == 0 or (remaining <= size and not final):
+                break
+
+            if remaining <= size:
+                end = len(buffer)
+            else:
+                limit = position + size
+                end = (
+                    _last_boundary(boundary, buffer, position + size // 2, limit)
+                    or _last_boundary(_WORD_BOUNDARY, buffer, position + 1, limit)
+                    or limit
+                )
+
+            start = buffer_offset + position
+            page = page_numbers[bisect_right(page_starts, start) - 1]
+            text = buffer[position:end].rstrip()
+            yield Chunk(doc_id, page, start, start + len(text)), text
+
+            if end == len(buffer):
+                position = end
+                break
+
+            # Start the next chunk on a boundary within the overlap.
+            next_position = max(end - overlap, position + 1)
+            if overlap:
+                next_position = (
+                    _first_boundary(boundary, buffer, next_position, end)
+                    or _first_boundary(_WORD_BOUNDARY, buffer, next_position, end)
+                    or next_position
+                )
+            position = next_position
+
+        # Drop consumed text once it makes up most of the buffer, so long
+        # pages are compacted a bounded number of times.
+        if position > len(buffer) // 2:
+            buffer = buffer[position:]
+            buffer_offset += position
+            position = 0
+
+    for page_number, page_text in pages:
+        separator = "\n" if page_starts else ""
+        page_starts.append(buffer_offset + len(buffer) + len(separator))
+        page_numbers.append(page_number)
+        buffer += separator + page_text
+
+        if strategy == "page":
+            yield from cut_chunks(final=True)
+            # Keep the separator out of the next page's chunks.
+            buffer_offset += len(buffer)
+            buffer = ""
+            position = 0
+        else:
+            yield from cut_chunks(final=False)
+
+    yield from cut_chunks(final=True)
+
+
+def chunk_text(
+    text: str,
+    doc_id: str,
+    strategy: Strategy = "sentence",
+    size: int = 1500,
+    overlap: int = 200,
+) -> list[Chunk]:
+    """Chunk a document already held in memory.
+
+    Args:
+        text: The document text.
+        doc_id: Identifier of the document, copied into each chunk.
+        strategy: Chunking strategy (see `iter_chunks`). With ``"page"``,
+                  the whole text is treated as a single page.
+        size: Maximum chunk size, in characters.
+        overlap: Number of characters shared by consecutive chunks.
+
+    Returns:
+        Chunk records; use ``text[chunk.start:chunk.end]`` for their content.
+    """
+    return [
+        chunk for chunk, _ in iter_chunks([(1, text)], doc_id, strategy, size, overlap)
+    ]
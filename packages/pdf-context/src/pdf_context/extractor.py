@@ -3,26 +3,37 @@
 Provides functions to extract text content from PDF files using pypdf.
 """
 
+import json
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Buffer, Callable, Generator, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import SEEK_CUR, SEEK_END, SEEK_SET, RawIOBase
 from pathlib import Path
+from typing import BinaryIO, cast
 
 from pypdf import PdfReader
 from pypdf.errors import PdfReadError
+from telemetry import count, observe, traced
 
+from .cache import ExtractionCache
 
-def extract_text_from_pdf(path: str | Path) -> str:
-    """Extract all text content from a PDF file.
+# Below this many pages per worker, process start-up and re-parsing the PDF
+# cross-reference table cost more than the extraction work being split.
+MIN_PAGES_PER_WORKER = 8
 
-    Args:
-        path: Path to the PDF file (string or Path object).
+# Process pool shared by parallel extractions, started on first use.
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
 
-    Returns:
-        Extracted text content from all pages, with pages separated by newlines.
 
-    Raises:
-        FileNotFoundError: If the PDF file doesn't exist.
-        PdfReadError: If the PDF is corrupted or password-protected.
-        ValueError: If the path doesn't point to a PDF file.
-    """
+def _check_pdf_path(path: str | Path) -> Path:
+    """Validate that ``path`` points to an existing PDF file."""
     path = Path(path)
 
     if not path.exists():
@@ -31,43 +42,409 @@ def extract_text_from_pdf(path: str | Path) -> str:
     if not path.suffix.lower() == ".pdf":
         raise ValueError(f"Expected a PDF file, got: {path.suffix}")
 
+    return path
+
+
+class _BufferStream(RawIOBase):
+    """Read-only, seekable stream over a buffer that never copies it whole.
+
+    ``BytesIO`` copies any buffer that isn't ``bytes``; this stream slices a
+    memoryview instead, so only the ranges pypdf actually reads are copied.
+    """
+
+    def __init__(self, buffer: Buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_CUR:
+            offset += self._position
+        elif whence == SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def read(self, size: int | None = -1) -> bytes:
+        start = min(self._position, len(self._view))
+        end = len(self._view) if size is None or size < 0 else start + size
+        data = self._view[start:end].tobytes()
+        self._position = start + len(data)
+        return data
+
+    def readinto(self, buffer: Buffer) -> int:
+        target = memoryview(buffer).cast("B")
+        data = self.read(len(target))
+        target[: len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def _open_reader(source: str | Buffer) -> Generator[PdfReader]:
+    """Open a PdfReader on a file path or on a buffer, without copying it.
+
+    Files are memory-mapped rather than read whole into memory (which is
+    what pypdf does when given a path), so resident memory stays bounded
+    by the pages actually parsed and is shared through the OS page cache.
+
+    pypdf only reads, seeks and tells on the stream it is given, which both
+    ``_BufferStream`` and ``mmap`` support, but it is typed as ``IO``: hence
+    the casts.
+    """
+    if not isinstance(source, str):
+        yield PdfReader(cast(BinaryIO, _BufferStream(source)))
+        return
+
+    with open(source, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files can't be mapped; let pypdf report them.
+            yield PdfReader(f)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PdfReader(cast(BinaryIO, mapped))
+
+
+PageSelection = slice | range
+"""Pages to extract, as 0-based page indices (e.g. ``slice(0, 10)``)."""
+
+
+def _select_pages(page_count: int, pages: PageSelection | None) -> range:
+    """Resolve a page selection into page indices, clamped to the document."""
+    if pages is None:
+        return range(page_count)
+    if isinstance(pages, range):
+        pages = slice(pages.start, pages.stop, pages.step)
+    return range(*pages.indices(page_count))
+
+
+def _extract_page_range(source: str | bytes, indices: range) -> list[str]:
+    """Extract the non-empty text of the pages at ``indices``.
+
+    Runs inside pool workers, so it opens its own reader on the source.
+    """
+    with _open_reader(source) as reader:
+        return _extract_pages(reader, indices)
+
+
+def _extract_pages(
+    reader: PdfReader, indices: range, max_chars: int | None = None
+) -> list[str]:
+    """Extract the non-empty text of the pages at ``indices``.
+
+    When ``max_chars`` is given, stops parsing pages as soon as the joined
+    text would reach that length.
+    """
+    text_parts: list[str] = []
+    length = -1  # No separator before the first page
+
+    for index in indices:
+        page_text = reader.pages[index].extract_text()
+        if page_text:
+            text_parts.append(page_text)
+            length += len(page_text) + 1
+            if max_chars is not None and length >= max_chars:
+                break
+
+    return text_parts
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the shared extraction pool, with one worker per CPU.
+
+    Workers are started from a fork server (or spawned where there is
+    none): forking a multi-threaded process, such as a web app, can copy
+    locks held by other threads and deadlock the child.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            method = "forkserver" if "forkserver" in methods else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(method),
+            )
+        return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool, so the next extraction starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _split_pages(indices: range, workers: int) -> list[range]:
+    """Split page indices into at most ``workers`` contiguous ranges."""
+    workers = max(1, min(workers, len(indices) // MIN_PAGES_PER_WORKER))
+    size, remainder = divmod(len(indices), workers)
+    ranges: list[range] = []
+    start = 0
+
+    for i in range(workers):
+        stop = start + size + (1 if i < remainder else 0)
+        ranges.append(indices[start:stop])
+        start = stop
+
+    return ranges
+
+
+@traced("pdf.extract")
+def _extract_text(
+    source: str | Buffer,
+    workers: int | None,
+    pages: PageSelection | None = None,
+    max_chars: int | None = None,
+) -> str:
+    """Extract text from a path or buffer, serially or across a process pool."""
+    with _open_reader(source) as reader:
+        indices = _select_pages(len(reader.pages), pages)
+        count("pdf.pages", len(indices))
+
+        # A character budget needs pages in order to know when to stop.
+        if workers is None or workers <= 1 or max_chars is not None:
+            return "\n".join(_extract_pages(reader, indices, max_chars))[:max_chars]
+
+        ranges = _split_pages(indices, min(workers, os.cpu_count() or 1))
+        if len(ranges) == 1:
+            return "\n".join(_extract_pages(reader, indices))
+
+    # Buffers such as memoryviews can't be pickled to the workers.
+    payload = source if isinstance(source, str | bytes) else bytes(source)
+
+    text_parts: list[str] = []
+    pool = _get_pool()
     try:
-        reader = PdfReader(path)
-        text_parts: list[str] = []
+        futures = [
+            pool.submit(_extract_page_range, payload, page_range)
+            for page_range in ranges
+        ]
+        # Futures are consumed in submission order, so pages stay in order.
+        for future in futures:
+            text_parts.extend(future.result())
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+
+    return "\n".join(text_parts)
+
+
+def _selection_key(key: str, pages: PageSelection | None, max_chars: int | None) -> str:
+    """Extend a content cache key with the page selection and budget."""
+    if pages is None and max_chars is None:
+        return key
+    if pages is not None:
+        # A range and the equivalent slice share their entry.
+        pages = slice(pages.start, pages.stop, pages.step or 1)
+    return f"{key}:{pages}:{max_chars}"
+
+
+def _cached(
+    cache: ExtractionCache | None, key: Callable[[], str], extract: Callable[[], str]
+) -> str:
+    """Return the cached text for ``key`` or run ``extract`` and cache it."""
+    if cache is None:
+        return extract()
+
+    cache_key = key()
+    text = cache.get(cache_key)
+    if text is None:
+        text = extract()
+        cache.put(cache_key, text)
+    return text
+
+
+def extract_text_from_pdf(
+    path: str | Path,
+    workers: int | None = None,
+    cache: ExtractionCache | None = None,
+    pages: PageSelection | None = None,
+    max_chars: int | None = None,
+) -> str:
+    """Extract all text content from a PDF file.
 
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
+    Args:
+        path: Path to the PDF file (string or Path object).
+        workers: Optional number of worker processes. When greater than 1,
+                 the page range is split across a process pool shared by
+                 all extractions, each worker opening its own reader. The
+                 output is identical to the serial path. Small documents
+                 are always extracted serially, and the number of workers
+                 is capped at the number of CPUs.
+                 The file is memory-mapped rather than read into memory.
+        cache: Optional extraction cache. Documents whose content was
+               already extracted are served from it without parsing.
+        pages: Optional slice or range of 0-based page indices to extract,
+               e.g. ``slice(0, 5)`` for the first five pages. Other pages
+               are never parsed.
+        max_chars: Optional character budget. Extraction stops at the first
+                   page that reaches it and the text is truncated to it.
+                   Implies serial extraction.
+
+    Returns:
+        Extracted text content from the selected pages, with pages separated
+        by newlines.
 
-        return "\n".join(text_parts)
+    Raises:
+        FileNotFoundError: If the PDF file doesn't exist.
+        PdfReadError: If the PDF is corrupted or password-protected.
+        ValueError: If the path doesn't point to a PDF file.
+    """
+    path = _check_pdf_path(path)
+
+    try:
+        return _cached(
+            cache,
+            lambda: _selection_key(
+                ExtractionCache.key_for_file(path), pages, max_chars
+            ),
+            lambda: _extract_text(str(path), workers, pages, max_chars),
+        )
     except PdfReadError as e:
         raise PdfReadError(f"Failed to read PDF '{path}': {e}") from e
 
 
-def extract_text_from_bytes(pdf_bytes: bytes) -> str:
+def extract_text_from_bytes(
+    pdf_bytes: Buffer,
+    workers: int | None = None,
+    cache: ExtractionCache | None = None,
+    pages: PageSelection | None = None,
+    max_chars: int | None = None,
+) -> str:
     """Extract all text content from PDF bytes.
 
     Args:
-        pdf_bytes: Raw PDF file content as bytes.
+        pdf_bytes: Raw PDF file content as bytes, or any buffer such as a
+                   memoryview, bytearray or mmap. It is read in place,
+                   without being copied.
+        workers: Optional number of worker processes (see
+                 `extract_text_from_pdf`). The content is sent to each worker.
+        cache: Optional extraction cache (see `extract_text_from_pdf`).
+        pages: Optional page selection (see `extract_text_from_pdf`).
+        max_chars: Optional character budget (see `extract_text_from_pdf`).
 
     Returns:
-        Extracted text content from all pages, with pages separated by newlines.
+        Extracted text content from the selected pages, with pages separated
+        by newlines.
 
     Raises:
         PdfReadError: If the PDF is corrupted or password-protected.
     """
-    from io import BytesIO
-
     try:
-        reader = PdfReader(BytesIO(pdf_bytes))
-        text_parts: list[str] = []
+        return _cached(
+            cache,
+            lambda: _selection_key(
+                ExtractionCache.key_for_bytes(pdf_bytes), pages, max_chars
+            ),
+            lambda: _extract_text(pdf_bytes, workers, pages, max_chars),
+        )
+    except PdfReadError as e:
+        raise PdfReadError(f"Failed to read PDF from bytes: {e}") from e
+
+
+def iter_pages(
+    source: str | Path | Buffer,
+    pages: PageSelection | None = None,
+    cache: ExtractionCache | None = None,
+    key: str | None = None,
+) -> Iterator[tuple[int, str]]:
+    """Yield the text of a PDF one page at a time.
+
+    Pages are parsed lazily, so consumers can start working on the first
+    page before the last one is read, and only one page's text is held in
+    memory at a time. Pages without text are skipped, so joining the yielded
+    texts with newlines gives the same result as `extract_text_from_pdf`.
+
+    Args:
+        source: Path to a PDF file, or raw PDF content as bytes or any buffer.
+        pages: Optional page selection (see `extract_text_from_pdf`).
+        cache: Optional extraction cache. On a hit, pages are replayed from
+               it; on a miss, they are collected as they are yielded and
+               cached once the document has been fully read.
+        key: Content key of the PDF in the cache, if already computed with
+             `ExtractionCache.key_for_bytes` or `ExtractionCache.key_for_file`,
+             to avoid hashing it again.
+
+    Yields:
+        Tuples of ``(page_number, text)``, with 1-based page numbers.
+
+    Raises:
+        FileNotFoundError: If the PDF file doesn't exist.
+        PdfReadError: If the PDF is corrupted or password-protected.
+        ValueError: If the path doesn't point to a PDF file.
+    """
+    if isinstance(source, str | Path):
+        source = str(_check_pdf_path(source))
+        label = f"'{source}'"
+    else:
+        label = "from bytes"
 
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
+    cache_key = None
+    if cache is not None:
+        if key is not None:
+            content_key = key
+        elif isinstance(source, str):
+            content_key = ExtractionCache.key_for_file(source)
+        else:
+            content_key = ExtractionCache.key_for_bytes(source)
+        cache_key = _pages_key(content_key, pages)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            for page_number, page_text in json.loads(cached):
+                yield page_number, page_text
+            return
 
-        return "\n".join(text_parts)
+    extracted: list[tuple[int, str]] = []
+    try:
+        with _open_reader(source) as reader:
+            for index in _select_pages(len(reader.pages), pages):
+                start = time.perf_counter()
+                page_text = reader.pages[index].extract_text()
+                observe("pdf.page", time.perf_counter() - start)
+                if page_text:
+                    if cache_key is not None:
+                        extracted.append((index + 1, page_text))
+                    yield index + 1, page_text
     except PdfReadError as e:
-        raise PdfReadError(f"Failed to read PDF from bytes: {e}") from e
+        raise PdfReadError(f"Failed to read PDF {label}: {e}") from e
+
+    if cache is not None and cache_key is not None:
+        cache.put(cache_key, json.dumps(extracted))
+
+
+def _pages_key(key: str, pages: PageSelection | None) -> str:
+    """Cache key of the pages `iter_pages` yields for a content key."""
+    return _selection_key(key, pages, None) + ":pages"
+
+
+def cached_pages(
+    cache: ExtractionCache, key: str, pages: PageSelection | None = None
+) -> list[tuple[int, str]] | None:
+    """Return the pages `iter_pages` cached for a document, without its content.
+
+    Lets a document be re-indexed from the cache once its bytes are gone,
+    e.g. after an upload.
+
+    Args:
+        cache: The cache ``iter_pages`` was given.
+        key: Content key of the document (see `ExtractionCache.key_for_bytes`
+             and `ExtractionCache.key_for_file`).
+        pages: The page selection ``iter_pages`` was given.
+
+    Returns:
+        The ``(page_number, text)`` tuples, or None if they aren't cached.
+    """
+    cached = cache.get(_pages_key(key, pages))
+    if cached is None:
+        return None
+    return [(page_number, text) for page_number, text in json.loads(cached)]
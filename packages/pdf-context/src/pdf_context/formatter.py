@@ -3,9 +3,13 @@
 Provides functions to format extracted text for LLM context injection.
 """
 
+import asyncio
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
 
-from .extractor import extract_text_from_pdf
+from .cache import ExtractionCache
+from .extractor import PageSelection, extract_text_from_pdf
 
 
 def format_as_context(text: str, filename: str) -> str:
@@ -28,7 +32,37 @@ def format_as_context(text: str, filename: str) -> str:
     )
 
 
-def process_pdf_file(path: str | Path, filename: str | None = None) -> str:
+def iter_as_context(pages: Iterable[tuple[int, str]], filename: str) -> Iterator[str]:
+    """Stream extracted pages as delimited chunks for context injection.
+
+    Streaming counterpart of `format_as_context`: joining the yielded chunks
+    gives the same string as formatting the fully extracted text, but pages
+    are consumed one at a time (e.g. from `iter_pages`).
+
+    Args:
+        pages: Iterable of ``(page_number, text)`` tuples.
+        filename: The name of the source file (for labeling).
+
+    Yields:
+        The opening delimiter, then each page's text, then the closing delimiter.
+    """
+    yield f"\n\n--- Content of attached file '{filename}' ---\n"
+
+    separator = ""
+    for _page_number, text in pages:
+        yield separator + text
+        separator = "\n"
+
+    yield "\n--- End of file ---\n"
+
+
+def process_pdf_file(
+    path: str | Path,
+    filename: str | None = None,
+    cache: ExtractionCache | None = None,
+    pages: PageSelection | None = None,
+    max_chars: int | None = None,
+) -> str:
     """Extract text from a PDF and format it for context injection.
 
     Convenience function that combines extraction and formatting.
@@ -37,6 +71,10 @@ def process_pdf_file(path: str | Path, filename: str | None = None) -> str:
         path: Path to the PDF file.
         filename: Optional display name for the file.
                   If not provided, uses the file's basename.
+        cache: Optional extraction cache for previously seen documents.
+        pages: Optional slice or range of 0-based page indices to extract.
+        max_chars: Optional character budget; extraction stops early once
+                   it is reached.
 
     Returns:
         Formatted text ready for context injection.
@@ -48,32 +86,71 @@ def process_pdf_file(path: str | Path, filename: str | None = None) -> str:
     path = Path(path)
     display_name = filename if filename else path.name
 
-    text = extract_text_from_pdf(path)
+    text = extract_text_from_pdf(path, cache=cache, pages=pages, max_chars=max_chars)
     return format_as_context(text, display_name)
 
 
-def process_multiple_files(paths: list[str | Path]) -> str:
+def _process_or_describe_error(path: str | Path) -> str:
+    """Process a PDF file, returning an error message instead of raising."""
+    try:
+        return process_pdf_file(path)
+    except Exception as e:
+        # Include error message in context so LLM knows about the failure
+        path_obj = Path(path)
+        return f"\n\nError reading PDF '{path_obj.name}': {e!s}\n"
+
+
+def process_multiple_files(
+    paths: list[str | Path], max_workers: int | None = None
+) -> str:
     """Process multiple PDF files and combine their context.
 
     Args:
         paths: List of paths to PDF files.
+        max_workers: Optional number of files processed concurrently, each
+                     in its own worker process. Files are processed one
+                     after another if not provided.
 
     Returns:
-        Combined formatted text from all files.
+        Combined formatted text from all files, in the order of ``paths``.
+        Files that fail to process are replaced by an error message.
+    """
+    if max_workers is None or max_workers <= 1 or len(paths) <= 1:
+        return "".join(_process_or_describe_error(path) for path in paths)
 
-    Raises:
-        FileNotFoundError: If any PDF file doesn't exist.
-        PdfReadError: If any PDF is corrupted or password-protected.
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        # map yields results in input order, whatever order they finish in.
+        return "".join(executor.map(_process_or_describe_error, paths))
+
+
+async def aprocess_multiple_files(
+    paths: list[str | Path],
+    max_concurrency: int = 4,
+    executor: Executor | None = None,
+) -> str:
+    """Process multiple PDF files without blocking the event loop.
+
+    Async variant of `process_multiple_files`: extraction runs in an
+    executor, with at most ``max_concurrency`` files in flight.
+
+    Args:
+        paths: List of paths to PDF files.
+        max_concurrency: Maximum number of files processed at the same time.
+        executor: Optional executor to run extraction in. Defaults to the
+                  event loop's default thread pool.
+
+    Returns:
+        Combined formatted text from all files, in the order of ``paths``.
+        Files that fail to process are replaced by an error message.
     """
-    results: list[str] = []
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-    for path in paths:
-        try:
-            formatted = process_pdf_file(path)
-            results.append(formatted)
-        except Exception as e:
-            # Include error message in context so LLM knows about the failure
-            path_obj = Path(path)
-            results.append(f"\n\nError reading PDF '{path_obj.name}': {e!s}\n")
+    async def process(path: str | Path) -> str:
+        async with semaphore:
+            return await loop.run_in_executor(
+                executor, _process_or_describe_error, path
+            )
 
+    results = await asyncio.gather(*(process(path) for path in paths))
     return "".join(results)
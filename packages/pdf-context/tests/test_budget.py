@@ -0,0 +1,46 @@
+import pytest
+from pdf_context import build_context, estimate_tokens, format_as_context
+
+DOCUMENTS = [
+    ("short.pdf", "The tenant pays the rent monthly. " * 5),
+    ("lease.pdf", " ".join(f"Article {i}. The rent is due." for i in range(2000))),
+    ("decree.pdf", " ".join(f"Section {i}. Fees apply." for i in range(1000))),
+]
+
+
+def summarize(text: str, tokens: int) -> str:
+    return "Summary: " + "rent " * tokens
+
+
+@pytest.mark.parametrize("strategy", ["truncate", "sample", "summarize"])
+@pytest.mark.parametrize("max_tokens", [300, 500, 2000, 8000])
+def test_context_stays_within_the_budget(strategy, max_tokens):
+    context = build_context(DOCUMENTS, max_tokens, strategy, summarize=summarize)
+
+    assert context.tokens <= max_tokens
+    assert context.text == "".join(context.blocks)
+    assert context.reduced_files == ["lease.pdf", "decree.pdf"]
+    assert context.dropped_tokens > 0
+    # Documents under their share are kept whole.
+    assert context.blocks[0] == format_as_context(DOCUMENTS[0][1], "short.pdf")
+
+
+def test_documents_that_fit_are_kept_whole():
+    context = build_context(DOCUMENTS[:1], 1000)
+
+    assert context.text == format_as_context(DOCUMENTS[0][1], "short.pdf")
+    assert context.tokens == estimate_tokens(context.text)
+    assert (context.dropped_tokens, context.reduced_files) == (0, [])
+
+
+def test_sample_keeps_the_start_and_end_of_documents():
+    context = build_context(DOCUMENTS[1:2], 2000, "sample")
+
+    assert "Article 0." in context.text
+    assert "Article 1999." in context.text
+    assert "tokens omitted" in context.text
+
+
+def test_summarize_requires_a_function():
+    with pytest.raises(ValueError):
+        build_context(DOCUMENTS, 1000, "summarize")
@@ -0,0 +1,57 @@
+from pdf_context import ExtractionCache
+
+
+def test_memory_tier_counts_hits_and_evicts_least_recently_used():
+    cache = ExtractionCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+    assert (cache.stats.memory_hits, cache.stats.misses) == (3, 1)
+    assert cache.stats.hit_rate == 0.75
+
+
+def test_disk_tier_is_shared_and_survives_restarts(tmp_path):
+    ExtractionCache(directory=tmp_path).put("a", "A")
+
+    cache = ExtractionCache(directory=tmp_path)
+    assert cache.get("a") == "A"
+    assert cache.get("a") == "A"
+    assert cache.get("b") is None
+    assert (cache.stats.disk_hits, cache.stats.memory_hits) == (1, 1)
+    assert cache.stats.misses == 1
+
+
+def test_disk_tier_evicts_least_recently_used_beyond_its_size(tmp_path):
+    writer = ExtractionCache(max_entries=0, directory=tmp_path, max_disk_bytes=250)
+    writer.put("a", "a" * 100)
+    writer.put("b", "b" * 100)
+    assert writer.get("a") is not None
+    writer.put("c", "c" * 100)
+
+    reader = ExtractionCache(directory=tmp_path)
+    assert reader.get("b") is None
+    assert reader.get("a") == "a" * 100
+    assert reader.get("c") == "c" * 100
+
+
+def test_keys_depend_on_content_only(tmp_path):
+    path = tmp_path / "lease.pdf"
+    path.write_bytes(b"%PDF-1.4 content")
+
+    key = ExtractionCache.key_for_bytes(b"%PDF-1.4 content")
+    assert ExtractionCache.key_for_file(path) == key
+    assert ExtractionCache.key_for_bytes(memoryview(b"%PDF-1.4 content")) == key
+    assert ExtractionCache.key_for_bytes(b"%PDF-1.4 other") != key
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = ExtractionCache(directory=tmp_path)
+    cache.put("a", "A")
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert ExtractionCache(directory=tmp_path).get("a") is None
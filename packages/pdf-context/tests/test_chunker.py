@@ -0,0 +1,49 @@
+import pytest
+from pdf_context import chunk_text, iter_chunks
+
+# As from iter_pages: page 2 had no text.
+PAGES = [
+    (1, "Article 1. The tenant pays the rent monthly. " * 20),
+    (3, "Article 2. The landlord repairs the roof!   Then the walls? " * 15),
+    (4, "A single word" + "x" * 700),
+]
+
+
+@pytest.mark.parametrize("strategy", ["fixed", "sentence", "page"])
+@pytest.mark.parametrize("overlap", [0, 50])
+def test_offsets_index_the_joined_document(strategy, overlap):
+    document = "\n".join(text for _, text in PAGES)
+
+    chunks = list(iter_chunks(PAGES, "doc", strategy, size=300, overlap=overlap))
+
+    assert len(chunks) > 3
+    for chunk, text in chunks:
+        assert document[chunk.start : chunk.end] == text
+        assert 0 < len(text) <= 300
+        assert text == text.strip()
+
+
+def test_page_chunks_never_span_pages():
+    document = "\n".join(text for _, text in PAGES)
+    page_ends = {1: len(PAGES[0][1]), 3: len(PAGES[0][1]) + 1 + len(PAGES[1][1])}
+
+    for chunk, _ in iter_chunks(PAGES, "doc", "page", size=300, overlap=0):
+        if chunk.page in page_ends:
+            assert chunk.end <= page_ends[chunk.page]
+        assert "\n" not in document[chunk.start : chunk.end]
+
+
+def test_chunk_text_matches_iter_chunks():
+    text = PAGES[0][1]
+
+    chunks = chunk_text(text, "doc", size=200, overlap=20)
+
+    assert chunks == [
+        c for c, _ in iter_chunks([(1, text)], "doc", size=200, overlap=20)
+    ]
+    assert all(len(text[c.start : c.end]) == len(c) for c in chunks)
+
+
+def test_overlap_must_be_smaller_than_size():
+    with pytest.raises(ValueError):
+        chunk_text("text", "doc", size=100, overlap=100)
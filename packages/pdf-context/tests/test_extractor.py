@@ -0,0 +1,157 @@
+import os
+
+import pytest
+from pdf_context import (
+    ExtractionCache,
+    cached_pages,
+    extract_text_from_bytes,
+    extract_text_from_pdf,
+    extractor,
+    iter_pages,
+)
+
+from .conftest import make_pdf
+
+PDF = make_pdf("The tenant pays the rent.", "Article L. 123-4 applies.")
+PAGES = [(1, "The tenant pays the rent."), (2, "Article L. 123-4 applies.")]
+
+
+def test_iter_pages_caches_pages_under_the_given_key(monkeypatch):
+    cache = ExtractionCache()
+    key = ExtractionCache.key_for_bytes(PDF)
+
+    def rehash(*args):
+        raise AssertionError("the content was hashed again")
+
+    monkeypatch.setattr(ExtractionCache, "key_for_bytes", rehash)
+
+    assert list(iter_pages(PDF, cache=cache, key=key)) == PAGES
+    assert list(iter_pages(b"", cache=cache, key=key)) == PAGES
+    assert cached_pages(cache, key) == PAGES
+    assert cached_pages(cache, "unknown") is None
+
+
+@pytest.fixture
+def cpus(monkeypatch):
+    """Report 4 CPUs, and shut down the extraction pool afterwards."""
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    yield 4
+    if extractor._pool is not None:
+        extractor._pool.shutdown()
+        extractor._pool = None
+
+
+def test_parallel_extraction_matches_serial(cpus):
+    pdf = make_pdf(*(f"Page {i} of the lease." for i in range(40)))
+
+    serial = extract_text_from_bytes(pdf)
+    parallel = extract_text_from_bytes(pdf, workers=4)
+    pool = extractor._pool
+
+    assert parallel == serial
+    assert parallel.splitlines()[-1] == "Page 39 of the lease."
+    assert pool is not None
+    assert extract_text_from_bytes(pdf, workers=4) == serial
+    assert extractor._pool is pool
+
+
+def test_workers_are_capped_at_the_cpu_count(cpus, monkeypatch):
+    pdf = make_pdf(*(f"Page {i}." for i in range(80)))
+    split_pages = extractor._split_pages
+    splits = []
+
+    def spy(indices, workers):
+        ranges = split_pages(indices, workers)
+        splits.append(len(ranges))
+        return ranges
+
+    monkeypatch.setattr(extractor, "_split_pages", spy)
+
+    extract_text_from_bytes(pdf, workers=16)
+
+    assert splits == [cpus]
+
+
+def test_parallel_extraction_of_a_memoryview(cpus):
+    pdf = make_pdf(*(f"Page {i} of the lease." for i in range(40)))
+
+    assert extract_text_from_bytes(memoryview(pdf), workers=4) == (
+        extract_text_from_bytes(pdf)
+    )
+
+
+def test_iter_pages_numbers_pages_and_skips_empty_ones(tmp_path):
+    path = tmp_path / "lease.pdf"
+    path.write_bytes(make_pdf("The tenant pays.", "", "The landlord repairs."))
+
+    pages = list(iter_pages(path))
+
+    assert pages == [(1, "The tenant pays."), (3, "The landlord repairs.")]
+    assert "\n".join(text for _, text in pages) == extract_text_from_pdf(path)
+    assert list(iter_pages(memoryview(path.read_bytes()))) == pages
+
+
+def test_iter_pages_parses_pages_as_they_are_consumed(monkeypatch):
+    parsed = []
+    monkeypatch.setattr(extractor, "observe", lambda name, value: parsed.append(name))
+    pages = iter_pages(make_pdf(*(f"Page {i}." for i in range(10))))
+
+    assert next(pages) == (1, "Page 0.")
+    assert len(parsed) == 1
+
+
+def test_iter_pages_replays_cached_pages():
+    cache = ExtractionCache()
+
+    first = list(iter_pages(PDF, cache=cache))
+    second = list(iter_pages(PDF, cache=cache))
+
+    assert first == second == PAGES
+    assert (cache.stats.misses, cache.stats.memory_hits) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    ("pages", "expected"),
+    [
+        (slice(0, 2), ["Page 0.", "Page 1."]),
+        (range(3, 5), ["Page 3.", "Page 4."]),
+        (slice(-1, None), ["Page 4."]),
+        (slice(None, None, 2), ["Page 0.", "Page 2.", "Page 4."]),
+        (slice(10, 20), []),
+    ],
+)
+def test_page_selection(pages, expected):
+    pdf = make_pdf(*(f"Page {i}." for i in range(5)))
+
+    assert extract_text_from_bytes(pdf, pages=pages) == "\n".join(expected)
+    assert [text for _, text in iter_pages(pdf, pages=pages)] == expected
+
+
+def test_character_budget_stops_parsing(monkeypatch):
+    pdf = make_pdf(*(f"Page {i}." for i in range(10)))
+    parsed = []
+    extract_pages = extractor._extract_pages
+
+    def spy(reader, indices, max_chars=None):
+        parts = extract_pages(reader, indices, max_chars)
+        parsed.extend(parts)
+        return parts
+
+    monkeypatch.setattr(extractor, "_extract_pages", spy)
+
+    assert extract_text_from_bytes(pdf, max_chars=12) == "Page 0.\nPage"
+    assert parsed == ["Page 0.", "Page 1."]
+    assert extract_text_from_bytes(pdf, max_chars=1000) == "\n".join(
+        f"Page {i}." for i in range(10)
+    )
+
+
+def test_selections_are_cached_separately():
+    cache = ExtractionCache()
+    pdf = make_pdf(*(f"Page {i}." for i in range(5)))
+
+    assert extract_text_from_bytes(pdf, cache=cache, pages=slice(0, 1)) == "Page 0."
+    assert extract_text_from_bytes(pdf, cache=cache, max_chars=3) == "Pag"
+    assert extract_text_from_bytes(pdf, cache=cache).endswith("Page 4.")
+    assert extract_text_from_bytes(pdf, cache=cache, pages=range(0, 1)) == "Page 0."
+    assert (cache.stats.misses, cache.stats.memory_hits) == (3, 1)
@@ -0,0 +1,70 @@
+"""Benchmark BM25 indexing and query latency over a synthetic corpus.
+
+Documents are drawn from a Zipf-distributed vocabulary, sprinkled with
+legal references, to mimic the term statistics of administrative texts.
+
+Usage:
+    uv run python benchmarks/bm25.py --docs 1000 10000 50000 --doc-length 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+from retrieval import BM25Index
+
+
+def synthetic_corpus(
+    rng: np.random.Generator, docs: int, doc_length: int, vocabulary: int
+) -> list[str]:
+    """Generate documents of Zipf-distributed words and article references."""
+    words = np.array([f"mot{i}" for i in range(vocabulary)])
+    ranks = np.minimum(rng.zipf(1.2, size=docs * doc_length), vocabulary) - 1
+    corpus = []
+    for i in range(docs):
+        text = " ".join(words[ranks[i * doc_length : (i + 1) * doc_length]])
+        corpus.append(f"{text} article L. {i % 997}-{i % 13}")
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--doc-length", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(
+        f"{'docs':>7} {'tokens':>11} {'index (s)':>10} "
+        f"{'tokens/s':>10} {'query (ms)':>11}"
+    )
+
+    for docs in args.docs:
+        corpus = synthetic_corpus(rng, docs, args.doc_length, args.vocabulary)
+        index = BM25Index()
+
+        start = time.perf_counter()
+        index.add(corpus)
+        indexing = time.perf_counter() - start
+        tokens = index.token_count
+
+        queries = [
+            f"mot{rng.integers(0, 200)} mot{rng.integers(0, 5000)} "
+            f"article L. {rng.integers(0, 997)}-{rng.integers(0, 13)}"
+            for _ in range(args.queries)
+        ]
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query, 10)
+        latency = (time.perf_counter() - start) / len(queries) * 1000
+
+        print(
+            f"{docs:>7} {tokens:>11,} {indexing:>10.2f} "
+            f"{tokens / indexing:>10,.0f} {latency:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark OpenAIEmbedder against a local stub of the embeddings endpoint.
+
+The stub answers ``POST /v1/embeddings`` with deterministic vectors after a
+fixed latency, and rejects a fraction of the requests with ``429 Too Many
+Requests`` and a ``Retry-After`` header, to measure batching, concurrency
+and retries without an API key. A second pass measures the cache. The
+tests run the embedder against the same stub.
+
+Usage:
+    uv run python benchmarks/embeddings.py --texts 2000 --concurrency 1 4 8
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from openai import OpenAI
+from retrieval import EmbeddingCache, OpenAIEmbedder
+
+
+class StubServer(ThreadingHTTPServer):
+    """OpenAI-compatible embeddings endpoint with latency and rate limits."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency: float,
+        rate_limited: float,
+        dimension: int,
+        retry_after: str = "0.05",
+    ):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.rate_limited = rate_limited
+        self.dimension = dimension
+        self.retry_after = retry_after
+        # Number of upcoming requests to reject, on top of the random ones.
+        self.reject_next = 0
+        self.requests = 0
+        self.rejected = 0
+        self.batch_sizes: list[int] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            reject = server.reject_next > 0 or random.random() < server.rate_limited
+            if reject:
+                server.reject_next = max(server.reject_next - 1, 0)
+                server.rejected += 1
+            else:
+                server.batch_sizes.append(len(body["input"]))
+        try:
+            time.sleep(server.latency)
+            if reject:
+                error = {"error": {"message": "Rate limited"}}
+                self._send(429, error, server.retry_after)
+                return
+            data = [
+                {"object": "embedding", "index": i, "embedding": embed(text, server)}
+                for i, text in enumerate(body["input"])
+            ]
+            self._send(200, {"object": "list", "data": data, "model": body["model"]})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status: int, payload: dict, retry_after: str | None = None):
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if retry_after is not None:
+            self.send_header("Retry-After", retry_after)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def embed(text: str, server: StubServer) -> list[float]:
+    """Deterministic pseudo-embedding of a text."""
+    rng = random.Random(zlib.crc32(text.encode()))
+    return [rng.uniform(-1, 1) for _ in range(server.dimension)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rate-limited", type=float, default=0.05)
+    parser.add_argument("--dimension", type=int, default=256)
+    args = parser.parse_args()
+
+    server = StubServer(args.latency, args.rate_limited, args.dimension)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(base_url=server.base_url, api_key="stub")
+    texts = [f"chunk {i}: article L. {i % 997}" for i in range(args.texts)]
+
+    print(
+        f"{'concurrency':>11} {'requests':>9} {'429s':>5} {'in flight':>9} "
+        f"{'texts/s':>9} {'cached (ms)':>12}"
+    )
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as directory:
+            embedder = OpenAIEmbedder(
+                client,
+                "stub-embeddings",
+                batch_size=args.batch_size,
+                max_concurrency=concurrency,
+                backoff=0.05,
+                cache=EmbeddingCache(directory=directory),
+            )
+            server.requests = server.rejected = server.max_in_flight = 0
+
+            start = time.perf_counter()
+            embedder.embed(texts)
+            seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            embedder.embed(texts)
+            cached = (time.perf_counter() - start) * 1000
+
+        print(
+            f"{concurrency:>11} {server.requests:>9} {server.rejected:>5} "
+            f"{server.max_in_flight:>9} {args.texts / seconds:>9,.0f} "
+            f"{cached:>12.1f}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
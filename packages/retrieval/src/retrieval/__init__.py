@@ -0,0 +1,65 @@
+"""Retrieval - Chunk indexing and retrieval for RAG applications.
+
+This package indexes the chunks of attached or ingested documents and
+retrieves the most relevant ones for a question, so only those are
+injected into the prompt.
+
+Example usage:
+    from retrieval import (
+        BM25Retriever,
+        HashingEmbedder,
+        HybridRetriever,
+        VectorRetriever,
+        retrieve_context,
+    )
+
+    retriever = HybridRetriever(
+        {"bm25": BM25Retriever(), "vector": VectorRetriever(HashingEmbedder())}
+    )
+    retriever.add_document("document.pdf", text)
+
+    result = await retrieve_context(retriever, "What does article 3 say?", k=5)
+    print(result.context, result.timings)
+"""
+
+from .bm25 import BM25Index, BM25Retriever
+from .cache import EmbeddingCache
+from .embeddings import Embedder, HashingEmbedder, OpenAIEmbedder, normalize
+from .hybrid import (
+    HybridRetriever,
+    Reranker,
+    RetrievalResult,
+    reciprocal_rank_fusion,
+    retrieve_context,
+)
+from .retriever import Retriever, SearchResult, VectorRetriever, results_as_documents
+from .store import ChunkStore, StoreRetriever
+from .tokenizer import tokenize
+from .vector import IVFIndex, VectorIndex, top_k
+
+__all__ = [
+    "Embedder",
+    "HashingEmbedder",
+    "OpenAIEmbedder",
+    "EmbeddingCache",
+    "normalize",
+    "VectorIndex",
+    "IVFIndex",
+    "top_k",
+    "Retriever",
+    "VectorRetriever",
+    "BM25Index",
+    "BM25Retriever",
+    "tokenize",
+    "SearchResult",
+    "results_as_documents",
+    "HybridRetriever",
+    "Reranker",
+    "RetrievalResult",
+    "reciprocal_rank_fusion",
+    "retrieve_context",
+    "ChunkStore",
+    "StoreRetriever",
+]
+
+__version__ = "0.1.0"
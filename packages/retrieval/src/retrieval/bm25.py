@@ -0,0 +1,176 @@
+"""BM25 lexical search.
+
+Complements embeddings on exact matches, such as legal references
+("article L. 123-4", "décret n° 2023-1234"), that embedding models handle
+poorly. Terms are mapped to integer ids, and each term's postings are kept
+in compact typed arrays that grow in place as documents are added.
+"""
+
+import math
+import threading
+from array import array
+from collections import Counter
+from collections.abc import Callable, Sequence
+
+import numpy as np
+from pdf_context.chunker import Strategy
+
+from .retriever import Retriever
+from .tokenizer import tokenize
+from .vector import top_k
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring.
+
+    Postings are stored per term as two ``array('i')``: the ids of the
+    documents containing the term and the term's frequency in each. They
+    are copied into NumPy arrays at query time, so scoring a term is a
+    single vectorised update over its postings. Adds and searches may run
+    concurrently, e.g. from worker threads: they take turns on a lock.
+
+    Args:
+        k1: Term frequency saturation.
+        b: Document length normalization.
+        tokenizer: Function splitting texts into terms.
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        tokenizer: Callable[[str], list[str]] = tokenize,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self._vocabulary: dict[str, int] = {}
+        self._postings_docs: list[array] = []
+        self._postings_freqs: list[array] = []
+        self._lengths = array("i")
+        self._total_length = 0
+        # Per-document length normalization, recomputed after adds.
+        self._norms: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def token_count(self) -> int:
+        """Total number of terms across the indexed documents."""
+        return self._total_length
+
+    @property
+    def vocabulary_size(self) -> int:
+        """Number of distinct terms in the index."""
+        return len(self._vocabulary)
+
+    def add(self, texts: Sequence[str]) -> range:
+        """Tokenize and index documents.
+
+        Args:
+            texts: Texts of the documents.
+
+        Returns:
+            The ids assigned to the documents.
+        """
+        documents = [Counter(self.tokenizer(text)) for text in texts]
+
+        with self._lock:
+            start = len(self._lengths)
+            for doc_id, terms in enumerate(documents, start):
+                length = terms.total()
+                self._lengths.append(length)
+                self._total_length += length
+
+                for term, frequency in terms.items():
+                    term_id = self._vocabulary.get(term)
+                    if term_id is None:
+                        term_id = self._vocabulary[term] = len(self._vocabulary)
+                        self._postings_docs.append(array("i"))
+                        self._postings_freqs.append(array("i"))
+                    self._postings_docs[term_id].append(doc_id)
+                    self._postings_freqs[term_id].append(frequency)
+
+            self._norms = None
+            return range(start, len(self._lengths))
+
+    def _length_norms(self) -> np.ndarray:
+        """Return the ``k1 * (1 - b + b * length / average)`` of each document."""
+        if self._norms is None:
+            lengths = np.array(self._lengths, dtype=np.float32)
+            average = self._total_length / len(lengths) if len(lengths) else 0.0
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / max(average, 1e-9))
+        return self._norms
+
+    def search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Find the ``k`` documents that best match a query.
+
+        Args:
+            query: Query text.
+            k: Number of results.
+
+        Returns:
+            The ids of the best matching documents and their BM25 scores,
+            best first. Documents sharing no term with the query are left out.
+        """
+        terms = set(self.tokenizer(query))
+
+        with self._lock:
+            count = len(self._lengths)
+            scores = np.zeros(count, dtype=np.float32)
+            norms = self._length_norms()
+
+            for term in terms:
+                term_id = self._vocabulary.get(term)
+                if term_id is None:
+                    continue
+                # Copies: a view would export the array's buffer, which an
+                # `add` can't extend while it is alive.
+                docs = np.array(self._postings_docs[term_id], dtype=np.intc)
+                freqs = np.array(self._postings_freqs[term_id], dtype=np.intc)
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                # A term's postings hold each document once, so this is a
+                # plain scatter and not an accumulation.
+                scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norms[docs])
+
+        matching = np.flatnonzero(scores)
+        best = matching[top_k(scores[matching], k)]
+        return best, scores[best]
+
+
+class BM25Retriever(Retriever):
+    """Lexical retriever over the chunks of a set of documents.
+
+    Documents can be added incrementally, e.g. as files are uploaded.
+
+    Args:
+        index: BM25 index to store chunks in. Defaults to a `BM25Index`
+               with the French-aware tokenizer.
+        strategy: Chunking strategy (see `pdf_context.iter_chunks`).
+        chunk_size: Maximum chunk size, in characters.
+        overlap: Number of characters shared by consecutive chunks.
+    """
+
+    def __init__(
+        self,
+        index: BM25Index | None = None,
+        strategy: Strategy = "sentence",
+        chunk_size: int = 1500,
+        overlap: int = 200,
+    ):
+        super().__init__(strategy, chunk_size, overlap)
+        self.index = index if index is not None else BM25Index()
+
+    def _add_chunks(self, texts: list[str]) -> None:
+        self.index.add(texts)
+
+    def _search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        return self.index.search(query, k)
+
+    def _compact(self, keep: list[int]) -> None:
+        # Postings can't drop documents, so index the remaining chunks anew.
+        index = BM25Index(self.index.k1, self.index.b, self.index.tokenizer)
+        index.add([self.text_of(self._chunks[i]) for i in keep])
+        self.index = index
@@ -0,0 +1,125 @@
+"""Embedding cache.
+
+Caches embedding vectors keyed by a hash of the model name and the text,
+so re-embedding identical chunks (a re-ingested document, a repeated
+question) costs no API call. Entries live in an in-memory LRU tier and,
+optionally, in an on-disk SQLite tier that survives restarts and is shared
+between processes.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+import numpy as np
+from pdf_context import CacheStats
+
+# Keys looked up per query, below SQLite's limit on bound parameters.
+_QUERY_KEYS = 500
+
+
+class EmbeddingCache:
+    """Two-tier cache of embedding vectors, keyed by model and text.
+
+    Args:
+        max_entries: Maximum number of vectors kept in the memory tier.
+        directory: Optional directory for the on-disk SQLite tier.
+                   If not provided, only the memory tier is used.
+    """
+
+    def __init__(self, max_entries: int = 10000, directory: str | Path | None = None):
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+        if directory is not None:
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                directory / "embedding-cache.sqlite3", check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """Compute the cache key of a text embedded with a model."""
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, np.ndarray]:
+        """Look up vectors, checking the memory tier then the disk tier.
+
+        Returns:
+            The vectors found, by key.
+        """
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.stats.memory_hits += 1
+                else:
+                    missing.append(key)
+
+            if self._db is not None and missing:
+                rows = []
+                for start in range(0, len(missing), _QUERY_KEYS):
+                    batch = missing[start : start + _QUERY_KEYS]
+                    placeholders = ", ".join("?" * len(batch))
+                    rows += self._db.execute(
+                        "SELECT key, vector FROM entries "
+                        f"WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, vector)
+                    found[key] = vector
+                self.stats.disk_hits += len(rows)
+                self.stats.misses += len(missing) - len(rows)
+            else:
+                self.stats.misses += len(missing)
+        return found
+
+    def put_many(self, vectors: Mapping[str, np.ndarray]) -> None:
+        """Store vectors in both tiers."""
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, np.asarray(vector, dtype=np.float32))
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?)",
+                    (
+                        (key, np.asarray(vector, dtype=np.float32).tobytes())
+                        for key, vector in vectors.items()
+                    ),
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Insert into the memory tier, evicting the least recently used."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,216 @@
+"""Embedding functions.
+
+Provides the `Embedder` protocol used by the indexes, a batching, retrying
+and caching embedder backed by an OpenAI-compatible endpoint, and a
+deterministic hashing embedder that runs offline (for tests and as a
+fallback when no embedding model is set).
+"""
+
+import itertools
+import random
+import re
+import threading
+import time
+import zlib
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Protocol
+
+import numpy as np
+
+from .cache import EmbeddingCache
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_WORD = re.compile(r"\w+")
+
+# Longest wait before retrying an embedding request, in seconds.
+_MAX_DELAY = 60.0
+
+
+class Embedder(Protocol):
+    """Turns texts into embedding vectors."""
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into a ``(len(texts), dimension)`` float32 matrix."""
+        ...
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length, so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder based on feature hashing.
+
+    Each lowercased word is hashed into one of ``dimension`` buckets with a
+    random-looking sign. Needs no model or network, so retrieval can be
+    tested offline and works without an embedding endpoint.
+
+    Args:
+        dimension: Size of the embedding vectors.
+    """
+
+    def __init__(self, dimension: int = 512):
+        self.dimension = dimension
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                digest = zlib.crc32(word.encode())
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dimension] += sign
+
+        return normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """Embedder backed by an OpenAI-compatible embeddings endpoint.
+
+    Texts are sent in batches of at most ``batch_size``, up to
+    ``max_concurrency`` batches at a time. Rate-limited (429), failed (5xx)
+    and dropped requests are retried with exponential backoff, honouring the
+    ``Retry-After`` header; a rate limit also holds back the other batches
+    until it expires. With a cache, texts already embedded with the same
+    model are not sent again.
+
+    Args:
+        client: OpenAI client, e.g. configured for the Albert API. Its own
+                retries are disabled in favour of the embedder's.
+        model: Name of the embedding model.
+        batch_size: Maximum number of texts per request.
+        max_concurrency: Maximum number of requests in flight.
+        max_retries: Retries of a failed request before giving up.
+        backoff: Delay before the first retry, in seconds; doubled after
+                 each attempt.
+        cache: Optional cache of embeddings.
+    """
+
+    def __init__(
+        self,
+        client: "OpenAI",
+        model: str,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        cache: EmbeddingCache | None = None,
+    ):
+        self.client = client.with_options(max_retries=0)
+        self.model = model
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self._limiter = _RateLimiter(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="embed")
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        vectors = self.cache.get_many(keys) if self.cache is not None else {}
+
+        # Send each missing text once, even if it is repeated.
+        missing = list(
+            {key: text for key, text in zip(keys, texts) if key not in vectors}.items()
+        )
+        if missing:
+            batches = [
+                missing[start : start + self.batch_size]
+                for start in range(0, len(missing), self.batch_size)
+            ]
+            if len(batches) == 1:
+                results = [self._embed_batch(batches[0])]
+            else:
+                results = self._executor.map(self._embed_batch, batches)
+            embedded = dict(itertools.chain.from_iterable(results))
+            if self.cache is not None:
+                self.cache.put_many(embedded)
+            vectors.update(embedded)
+
+        return np.stack([vectors[key] for key in keys])
+
+    def _embed_batch(
+        self, batch: list[tuple[str, str]]
+    ) -> list[tuple[str, np.ndarray]]:
+        """Embed a batch of ``(key, text)`` pairs, retrying transient errors."""
+        attempt = 0
+        while True:
+            try:
+                with self._limiter:
+                    response = self.client.embeddings.create(
+                        model=self.model, input=[text for _, text in batch]
+                    )
+            except Exception as error:
+                retry = _retry_delay(error, attempt, self.backoff)
+                if retry is None or attempt >= self.max_retries:
+                    raise
+                delay, rate_limited = retry
+                if rate_limited:
+                    self._limiter.pause(delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            data = sorted(response.data, key=lambda item: item.index)
+            vectors = normalize(np.array([item.embedding for item in data]))
+            return list(zip((key for key, _ in batch), vectors, strict=True))
+
+
+class _RateLimiter:
+    """Bounds the requests in flight, and holds them back after a rate limit."""
+
+    def __init__(self, max_concurrency: int):
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def __enter__(self) -> None:
+        self._semaphore.acquire()
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def __exit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back new requests for ``seconds``."""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def _retry_delay(
+    error: Exception, attempt: int, backoff: float
+) -> tuple[float, bool] | None:
+    """Compute the delay before retrying a failed request.
+
+    Returns:
+        The delay in seconds and whether the request was rate-limited, or
+        None if the error isn't transient.
+    """
+    from openai import APIConnectionError, APIStatusError
+
+    if isinstance(error, APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), _MAX_DELAY), error.status_code == 429
+            except ValueError:
+                pass
+    elif not isinstance(error, APIConnectionError):
+        return None
+
+    delay = min(backoff * 2**attempt, _MAX_DELAY) * random.uniform(0.5, 1.0)
+    return delay, getattr(error, "status_code", None) == 429
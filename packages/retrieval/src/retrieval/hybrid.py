@@ -0,0 +1,242 @@
+"""Hybrid retrieval pipeline.
+
+Runs several retrievers concurrently (typically BM25 and embeddings), fuses
+their rankings with reciprocal-rank fusion and optionally reranks a bounded
+set of candidates. Every stage has its own latency budget and is timed.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections.abc import Iterable, Mapping, Sequence
+from concurrent.futures import Executor
+from dataclasses import dataclass, field, replace
+from typing import Protocol
+
+from pdf_context import Chunk, build_context
+
+from .retriever import Retriever, SearchResult, results_as_documents
+from .store import StoreRetriever
+
+# Latency budget, in seconds, of stages without an explicit one.
+DEFAULT_BUDGET = 2.0
+
+
+class Reranker(Protocol):
+    """Reorders candidate chunks for a query, e.g. with a cross-encoder."""
+
+    def rerank(self, query: str, results: Sequence[SearchResult]) -> list[SearchResult]:
+        """Return the results rescored for the query, best first."""
+        ...
+
+
+@dataclass
+class RetrievalResult:
+    """Outcome of a hybrid retrieval.
+
+    Attributes:
+        results: The retrieved chunks, best first.
+        context: The chunks formatted for context injection (empty unless
+                 produced by `retrieve_context`).
+        timings: Duration of each stage, in seconds.
+        timed_out: Names of the stages that exceeded their budget and were
+                   skipped.
+        block_hashes: Content hash of each block of ``context`` as sent,
+                      after fitting into the budget, in order, to check
+                      which blocks are identical across prompts.
+    """
+
+    results: list[SearchResult]
+    context: str = ""
+    timings: dict[str, float] = field(default_factory=dict)
+    timed_out: list[str] = field(default_factory=list)
+    block_hashes: list[str] = field(default_factory=list)
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[SearchResult]], k: int = 60
+) -> list[SearchResult]:
+    """Merge rankings by summing ``1 / (k + rank)`` for each chunk.
+
+    Fusion only uses ranks, so retrievers with incomparable scores (BM25
+    and cosine similarity) can be combined without calibration.
+
+    Args:
+        rankings: Result lists, each best first.
+        k: Smoothing constant; larger values flatten the rank weights.
+
+    Returns:
+        The fused results, with their fused score, best first.
+    """
+    scores: dict[Chunk, float] = {}
+    results: dict[Chunk, SearchResult] = {}
+
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            scores[result.chunk] = scores.get(result.chunk, 0.0) + 1 / (k + rank)
+            results.setdefault(result.chunk, result)
+
+    ordered = sorted(scores, key=scores.__getitem__, reverse=True)
+    return [replace(results[chunk], score=scores[chunk]) for chunk in ordered]
+
+
+class HybridRetriever:
+    """Retrieval pipeline fusing several retrievers over the same documents.
+
+    Args:
+        retrievers: Retrievers by stage name, e.g.
+                    ``{"bm25": BM25Retriever(), "vector": VectorRetriever(...)}``.
+                    A `StoreRetriever` adds an ingested corpus to the search.
+        reranker: Optional reranker applied to the fused candidates.
+        candidates: Number of results requested from each retriever, and
+                    number of fused candidates passed to the reranker.
+        rrf_k: Smoothing constant of the reciprocal-rank fusion.
+        budgets: Latency budget of each stage (retriever names and
+                 ``"rerank"``), in seconds. Stages over budget are skipped:
+                 a slow retriever contributes nothing and a slow reranker
+                 leaves the fused order unchanged.
+        executor: Executor running the retrievers and the reranker.
+                  Defaults to the event loop's default thread pool.
+    """
+
+    def __init__(
+        self,
+        retrievers: Mapping[str, Retriever | StoreRetriever],
+        reranker: Reranker | None = None,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        budgets: Mapping[str, float] | None = None,
+        executor: Executor | None = None,
+    ):
+        self.retrievers = dict(retrievers)
+        self.reranker = reranker
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.budgets = dict(budgets or {})
+        self.executor = executor
+
+    def __len__(self) -> int:
+        return max(
+            (len(retriever) for retriever in self.retrievers.values()), default=0
+        )
+
+    def add_document(self, doc_id: str, pages: Iterable[tuple[int, str]] | str) -> int:
+        """Chunk and index a document in every retriever, except stores.
+
+        Returns:
+            The number of chunks indexed per retriever.
+        """
+        if not isinstance(pages, str):
+            pages = list(pages)
+        counts = [
+            retriever.add_document(doc_id, pages)
+            for retriever in self.retrievers.values()
+            if isinstance(retriever, Retriever)
+        ]
+        return max(counts, default=0)
+
+    def remove_document(self, doc_id: str) -> int:
+        """Remove a document from every retriever, except stores.
+
+        Returns:
+            The number of chunks removed per retriever.
+        """
+        counts = [
+            retriever.remove_document(doc_id)
+            for retriever in self.retrievers.values()
+            if isinstance(retriever, Retriever)
+        ]
+        return max(counts, default=0)
+
+    async def _run_stage(self, name: str, result: RetrievalResult, func, *args):
+        """Run a blocking stage in the executor within its budget.
+
+        Returns:
+            The stage's return value, or None if it exceeded its budget.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self.executor, func, *args),
+                self.budgets.get(name, DEFAULT_BUDGET),
+            )
+        except TimeoutError:
+            # The worker thread can't be interrupted; its result is discarded.
+            result.timed_out.append(name)
+            return None
+        finally:
+            result.timings[name] = time.perf_counter() - start
+
+    async def asearch(self, query: str, k: int = 5) -> RetrievalResult:
+        """Find the chunks most relevant to a query.
+
+        Args:
+            query: The user's question.
+            k: Maximum number of chunks to return.
+
+        Returns:
+            The fused (and possibly reranked) results with stage timings.
+        """
+        result = RetrievalResult(results=[])
+        start = time.perf_counter()
+
+        rankings = await asyncio.gather(
+            *(
+                self._run_stage(name, result, retriever.search, query, self.candidates)
+                for name, retriever in self.retrievers.items()
+            )
+        )
+
+        fusion_start = time.perf_counter()
+        fused = reciprocal_rank_fusion(
+            (ranking for ranking in rankings if ranking), self.rrf_k
+        )[: self.candidates]
+        result.timings["fusion"] = time.perf_counter() - fusion_start
+
+        if self.reranker is not None and fused:
+            reranked = await self._run_stage(
+                "rerank", result, self.reranker.rerank, query, fused
+            )
+            if reranked is not None:
+                fused = reranked
+
+        result.results = fused[:k]
+        result.timings["total"] = time.perf_counter() - start
+        return result
+
+
+async def retrieve_context(
+    retriever: HybridRetriever, query: str, k: int = 5, max_tokens: int = 4000
+) -> RetrievalResult:
+    """Retrieve the chunks relevant to a question, formatted for the prompt.
+
+    Single entry point for the chat apps: they inject ``result.context``
+    instead of whole documents. The chunks are laid out in document order
+    (source, page, position) rather than by score, so the same chunks always
+    give the same context, byte for byte, and prompt caches can reuse it.
+
+    Args:
+        retriever: Hybrid retriever over the conversation's documents.
+        query: The user's question.
+        k: Maximum number of chunks to inject.
+        max_tokens: Token budget of the formatted context.
+
+    Returns:
+        The retrieved chunks, their formatted context and stage timings.
+    """
+    result = await retriever.asearch(query, k)
+
+    start = time.perf_counter()
+    if result.results:
+        ordered = sorted(
+            result.results,
+            key=lambda r: (r.chunk.doc_id, r.chunk.page, r.chunk.start),
+        )
+        context = build_context(results_as_documents(ordered), max_tokens)
+        result.context = context.text
+        result.block_hashes = [
+            hashlib.sha256(block.encode()).hexdigest()[:16] for block in context.blocks
+        ]
+    result.timings["context"] = time.perf_counter() - start
+    return result
@@ -0,0 +1,212 @@
+"""Document retrievers.
+
+Chunk documents, index the chunks and find the most relevant ones for a
+question, so only those are injected into the prompt instead of whole
+documents.
+"""
+
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from pdf_context import Chunk, iter_chunks
+from pdf_context.chunker import Strategy
+
+from .embeddings import Embedder
+from .vector import VectorIndex
+
+
+@dataclass(frozen=True, slots=True)
+class SearchResult:
+    """A retrieved chunk.
+
+    Attributes:
+        chunk: The chunk record.
+        text: The chunk's content.
+        score: Relevance score of the chunk for the query (higher is better).
+    """
+
+    chunk: Chunk
+    text: str
+    score: float
+
+
+class Retriever(ABC):
+    """Base class of retrievers over the chunks of a set of documents.
+
+    Handles chunking and chunk bookkeeping; subclasses index the chunk
+    texts in `_add_chunks` and score them in `_search`, where chunk ids are
+    their positions in insertion order. Indexes are append-only: removing a
+    document tombstones its chunks, which searches skip, and the index is
+    compacted once more than ``compact_ratio`` of its chunks are tombstones.
+
+    Args:
+        strategy: Chunking strategy (see `pdf_context.iter_chunks`).
+        chunk_size: Maximum chunk size, in characters.
+        overlap: Number of characters shared by consecutive chunks.
+    """
+
+    # Fraction of removed chunks above which the index is compacted.
+    compact_ratio = 0.5
+
+    def __init__(
+        self,
+        strategy: Strategy = "sentence",
+        chunk_size: int = 1500,
+        overlap: int = 200,
+    ):
+        self.strategy: Strategy = strategy
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._documents: dict[str, str] = {}
+        self._chunks: list[Chunk] = []
+        self._removed: set[int] = set()
+
+    def __len__(self) -> int:
+        """Number of chunks of the indexed documents."""
+        return len(self._chunks) - len(self._removed)
+
+    def add_document(self, doc_id: str, pages: Iterable[tuple[int, str]] | str) -> int:
+        """Chunk and index a document, replacing any previous version.
+
+        Args:
+            doc_id: Identifier of the document, e.g. its file name.
+            pages: ``(page_number, text)`` tuples, e.g. from `iter_pages`, so
+                   chunks know their page; or the document text as a whole.
+
+        Returns:
+            The number of chunks indexed. When the new version has no text,
+            the previous one is still removed and 0 is returned.
+        """
+        if isinstance(pages, str):
+            pages = [(1, pages)]
+        pages = list(pages)
+
+        chunks: list[Chunk] = []
+        texts: list[str] = []
+        for chunk, chunk_text in iter_chunks(
+            pages, doc_id, self.strategy, self.chunk_size, self.overlap
+        ):
+            chunks.append(chunk)
+            texts.append(chunk_text)
+
+        self.remove_document(doc_id)
+        if not chunks:
+            return 0
+
+        self._add_chunks(texts)
+        self._documents[doc_id] = "\n".join(text for _, text in pages)
+        self._chunks.extend(chunks)
+        return len(chunks)
+
+    def remove_document(self, doc_id: str) -> int:
+        """Remove a document's chunks from the search results.
+
+        Returns:
+            The number of chunks removed.
+        """
+        if self._documents.pop(doc_id, None) is None:
+            return 0
+        removed = {
+            i
+            for i, chunk in enumerate(self._chunks)
+            if chunk.doc_id == doc_id and i not in self._removed
+        }
+        self._removed |= removed
+        if len(self._removed) > self.compact_ratio * len(self._chunks):
+            self.compact()
+        return len(removed)
+
+    def compact(self) -> None:
+        """Drop the chunks of removed documents from the index.
+
+        The remaining chunks are renumbered, so searches no longer have to
+        skip tombstones.
+        """
+        if not self._removed:
+            return
+        keep = [i for i in range(len(self._chunks)) if i not in self._removed]
+        self._compact(keep)
+        self._chunks = [self._chunks[i] for i in keep]
+        self._removed = set()
+
+    def text_of(self, chunk: Chunk) -> str:
+        """Return the content of an indexed chunk."""
+        return self._documents[chunk.doc_id][chunk.start : chunk.end]
+
+    def search(self, query: str, k: int = 5) -> list[SearchResult]:
+        """Find the chunks most relevant to a query.
+
+        Args:
+            query: The user's question.
+            k: Maximum number of chunks to return.
+
+        Returns:
+            The most relevant chunks, best first.
+        """
+        if not len(self):
+            return []
+
+        # Ask for enough chunks to make up for the removed ones.
+        ids, scores = self._search(query, k + len(self._removed))
+        return [
+            SearchResult(self._chunks[i], self.text_of(self._chunks[i]), float(score))
+            for i, score in zip(ids.tolist(), scores, strict=True)
+            if i not in self._removed
+        ][:k]
+
+    @abstractmethod
+    def _add_chunks(self, texts: list[str]) -> None:
+        """Index the texts of new chunks."""
+
+    @abstractmethod
+    def _search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ids and scores of the ``k`` best chunks, best first."""
+
+    @abstractmethod
+    def _compact(self, keep: list[int]) -> None:
+        """Keep only the given chunks in the index, renumbered in order."""
+
+
+class VectorRetriever(Retriever):
+    """Semantic retriever over the chunks of a set of documents.
+
+    Args:
+        embedder: Embedder used for both chunks and questions.
+        index: Vector index to store chunk embeddings in. Defaults to an
+               exact `VectorIndex`.
+        strategy: Chunking strategy (see `pdf_context.iter_chunks`).
+        chunk_size: Maximum chunk size, in characters.
+        overlap: Number of characters shared by consecutive chunks.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        index: VectorIndex | None = None,
+        strategy: Strategy = "sentence",
+        chunk_size: int = 1500,
+        overlap: int = 200,
+    ):
+        super().__init__(strategy, chunk_size, overlap)
+        self.embedder = embedder
+        self.index = index if index is not None else VectorIndex()
+
+    def _add_chunks(self, texts: list[str]) -> None:
+        self.index.add(self.embedder.embed(texts))
+
+    def _search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        (query_vector,) = self.embedder.embed([query])
+        return self.index.search(query_vector, k)
+
+    def _compact(self, keep: list[int]) -> None:
+        self.index.keep(keep)
+
+
+def results_as_documents(results: Sequence[SearchResult]) -> list[tuple[str, str]]:
+    """Label retrieved chunks with their source, for `pdf_context.build_context`."""
+    return [
+        (f"{result.chunk.doc_id} (page {result.chunk.page})", result.text)
+        for result in results
+    ]
@@ -0,0 +1,419 @@
+"""On-disk chunk store.
+
+Persists the chunks of an ingested corpus so the chat apps can search it
+without rebuilding anything at startup. A store directory holds:
+
+- ``chunks.sqlite3``: chunk records and texts, and the store metadata;
+- ``embeddings.bin``: the embeddings as a raw row-major matrix, in float32,
+  float16 or int8, opened with `np.memmap`;
+- ``scales.bin``: the float32 scale of each row, for int8 stores.
+
+Clearing a store starts new embedding files, ``embeddings.<n>.bin`` and
+``scales.<n>.bin`` after the n-th clear, so the files mapped by readers are
+never truncated under them.
+
+Opening a store only reads its metadata: embeddings are paged in by the OS
+as they are scanned, and the page cache is shared by every process that
+maps the same store. Chunk texts are fetched from SQLite for the results.
+"""
+
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+from pdf_context import Chunk
+
+from .embeddings import Embedder, normalize
+from .retriever import SearchResult
+from .vector import top_k
+
+Dtype = Literal["float32", "float16", "int8"]
+
+# Rows scored per matrix product, bounding the float32 copies made when
+# scanning float16 and int8 stores.
+_SCAN_ROWS = 65536
+
+# Rows fetched per query, below SQLite's limit on bound parameters.
+_QUERY_ROWS = 500
+
+
+class ChunkStore:
+    """Append-only store of chunks and their embeddings.
+
+    Writes are staged until `commit`, which makes the embeddings durable
+    before committing the chunk records and the new row count in one
+    SQLite transaction. Rows past the committed count, left by an
+    interrupted writer, are ignored by readers and truncated by the next
+    writer. Deleted chunks keep their embedding row, which searches skip.
+
+    Args:
+        directory: Store directory. Created if missing, unless read-only.
+        dtype: Storage type of the embeddings of a new store; existing
+               stores keep theirs. ``"float16"`` halves the size of
+               ``embeddings.bin``, ``"int8"`` quarters it, at a small cost
+               in score precision.
+        readonly: Open for searching only, e.g. while an ingestion run is
+                  writing to the store. Only committed rows are visible;
+                  `refresh` catches up with the later commits.
+
+    Raises:
+        FileNotFoundError: If a read-only store doesn't exist.
+    """
+
+    def __init__(
+        self, directory: str | Path, dtype: Dtype = "float32", readonly: bool = False
+    ):
+        self.directory = Path(directory)
+        self.readonly = readonly
+        self._lock = threading.Lock()
+
+        database = self.directory / "chunks.sqlite3"
+        if readonly:
+            if not database.exists():
+                raise FileNotFoundError(f"Chunk store not found: {self.directory}")
+            self._db = sqlite3.connect(
+                f"{database.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(database, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, "
+                "page INTEGER NOT NULL, start INTEGER NOT NULL, "
+                "end INTEGER NOT NULL, text TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), dtype TEXT NOT NULL, "
+                "dimension INTEGER NOT NULL, rows INTEGER NOT NULL, "
+                "live INTEGER NOT NULL)"
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO meta VALUES (0, ?, 0, 0, 0)", (dtype,)
+            )
+            self._db.commit()
+
+        self.dtype: Dtype = self._db.execute("SELECT dtype FROM meta").fetchone()[0]
+        self.generation, self.dimension, self.rows, self._live = self._read_meta()
+
+        self._files = []
+        if not readonly:
+            # Drop rows written after the last commit, and the files of other
+            # generations, left by an interrupted `clear`.
+            current = self._paths(self.generation)
+            for pattern in ("embeddings*.bin", "scales*.bin"):
+                for path in self.directory.glob(pattern):
+                    if path not in current:
+                        path.unlink()
+            self._files = [_open_truncated(current[0], self.rows * self._row_bytes)]
+            if self.dtype == "int8":
+                self._files.append(_open_truncated(current[1], self.rows * 4))
+        self._staged_rows = self.rows
+        self._mapped: tuple[np.ndarray, np.ndarray | None] | None = None
+
+    def __len__(self) -> int:
+        """Number of live chunks."""
+        return self._live
+
+    def __enter__(self) -> "ChunkStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dimension * np.dtype(self.dtype).itemsize
+
+    def _paths(self, generation: int) -> list[Path]:
+        """Embedding files of a generation: the matrix, and the int8 scales."""
+        suffix = f".{generation}" if generation else ""
+        paths = [self.directory / f"embeddings{suffix}.bin"]
+        if self.dtype == "int8":
+            paths.append(self.directory / f"scales{suffix}.bin")
+        return paths
+
+    def _read_meta(self) -> tuple[int, int, int, int]:
+        """Read the generation, dimension, rows and live chunks together."""
+        self._db.execute("BEGIN")
+        try:
+            (generation,) = self._db.execute("PRAGMA user_version").fetchone()
+            dimension, rows, live = self._db.execute(
+                "SELECT dimension, rows, live FROM meta"
+            ).fetchone()
+        finally:
+            self._db.execute("COMMIT")
+        return generation, dimension, rows, live
+
+    def _check_writable(self) -> None:
+        if self.readonly:
+            raise ValueError(f"Chunk store is read-only: {self.directory}")
+
+    def close(self) -> None:
+        """Close the store, discarding uncommitted writes."""
+        with self._lock:
+            for file in self._files:
+                file.close()
+            self._db.close()
+
+    def append(
+        self, chunks: Sequence[Chunk], texts: Sequence[str], vectors: np.ndarray
+    ) -> range:
+        """Stage chunks, their texts and their embeddings.
+
+        Returns:
+            The rows assigned to the chunks.
+
+        Raises:
+            ValueError: If the embeddings don't match the chunks or the
+                        store's dimension.
+        """
+        self._check_writable()
+        vectors = normalize(np.atleast_2d(vectors))
+        if len(vectors) != len(chunks):
+            raise ValueError(f"Got {len(vectors)} embeddings for {len(chunks)} chunks")
+
+        with self._lock:
+            if self.dimension == 0:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Expected embeddings of dimension {self.dimension}, "
+                    f"got {vectors.shape[1]}"
+                )
+
+            if self.dtype == "int8":
+                scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+                quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+                self._files[0].write(quantized.tobytes())
+                self._files[1].write(scales.astype(np.float32).tobytes())
+            else:
+                self._files[0].write(vectors.astype(self.dtype).tobytes())
+
+            rows = range(self._staged_rows, self._staged_rows + len(chunks))
+            self._db.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (row, chunk.doc_id, chunk.page, chunk.start, chunk.end, text)
+                    for row, chunk, text in zip(rows, chunks, texts, strict=True)
+                ),
+            )
+            self._staged_rows = rows.stop
+            self._live += len(chunks)
+            return rows
+
+    def delete(self, doc_ids: Iterable[str], before: int | None = None) -> int:
+        """Stage the deletion of the chunks of documents.
+
+        Args:
+            doc_ids: Identifiers of the documents.
+            before: Only delete rows below this one, e.g. to drop the
+                    previous version of a re-ingested document.
+
+        Returns:
+            The number of chunks deleted.
+        """
+        self._check_writable()
+        limit = self._staged_rows if before is None else before
+        with self._lock:
+            deleted = 0
+            for doc_id in doc_ids:
+                cursor = self._db.execute(
+                    "DELETE FROM chunks WHERE doc_id = ? AND row < ?", (doc_id, limit)
+                )
+                deleted += cursor.rowcount
+            self._live -= deleted
+            return deleted
+
+    def commit(self) -> None:
+        """Make the staged writes durable and visible to new readers."""
+        self._check_writable()
+        with self._lock:
+            for file in self._files:
+                file.flush()
+                os.fsync(file.fileno())
+            self._db.execute(
+                "UPDATE meta SET dimension = ?, rows = ?, live = ?",
+                (self.dimension, self._staged_rows, self._live),
+            )
+            self._db.commit()
+            self.rows = self._staged_rows
+            self._mapped = None
+
+    def refresh(self) -> bool:
+        """Catch up with the writes committed since the store was opened.
+
+        Read-only stores see chunk deletions as they are committed, but keep
+        their row count until refreshed, e.g. before each search.
+
+        Returns:
+            Whether the store changed since it was opened or last refreshed.
+            Always False for writable stores, which see their own commits.
+        """
+        if not self.readonly:
+            return False
+        with self._lock:
+            meta = self._read_meta()
+            if meta == (self.generation, self.dimension, self.rows, self._live):
+                return False
+            self.generation, self.dimension, self.rows, self._live = meta
+            self._staged_rows = self.rows
+            self._mapped = None
+            return True
+
+    def clear(self) -> None:
+        """Delete every chunk and start new embedding files.
+
+        The new files take effect with the commit that empties the store;
+        the old ones are then unlinked, while readers that mapped them keep
+        reading them until they refresh.
+        """
+        self._check_writable()
+        with self._lock:
+            generation = self.generation + 1
+            files = [_open_truncated(path, 0) for path in self._paths(generation)]
+            self._db.execute("DELETE FROM chunks")
+            self._db.execute("UPDATE meta SET dimension = 0, rows = 0, live = 0")
+            self._db.execute(f"PRAGMA user_version = {generation}")
+            self._db.commit()
+            for file in self._files:
+                file.close()
+            for path in self._paths(self.generation):
+                path.unlink(missing_ok=True)
+            self._files = files
+            self.generation = generation
+            self.dimension = self.rows = self._staged_rows = self._live = 0
+            self._mapped = None
+
+    def _matrix(self) -> tuple[np.ndarray, np.ndarray | None]:
+        """Map the committed embeddings, and the int8 row scales."""
+        while self._mapped is None:
+            try:
+                self._mapped = self._map()
+            except FileNotFoundError:
+                # Cleared by a writer since the metadata was read.
+                if not self.readonly or not self.refresh():
+                    raise
+        return self._mapped
+
+    def _map(self) -> tuple[np.ndarray, np.ndarray | None]:
+        if self.rows == 0:
+            return np.empty((0, self.dimension), dtype=self.dtype), None
+        paths = self._paths(self.generation)
+        matrix = np.memmap(
+            paths[0], dtype=self.dtype, mode="r", shape=(self.rows, self.dimension)
+        )
+        scales = None
+        if self.dtype == "int8":
+            scales = np.memmap(paths[1], dtype=np.float32, mode="r", shape=(self.rows,))
+        return matrix, scales
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Find the ``k`` rows most similar to a query, by exact scan.
+
+        Returns:
+            The rows and their cosine similarities, best first. Rows of
+            deleted chunks may be included; `get` leaves them out.
+        """
+        matrix, scales = self._matrix()
+        query = normalize(query)
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), _SCAN_ROWS):
+            block = matrix[start : start + _SCAN_ROWS]
+            block_scores = block.astype(np.float32, copy=False) @ query
+            if scales is not None:
+                block_scores *= scales[start : start + _SCAN_ROWS]
+            scores[start : start + len(block)] = block_scores
+        rows = top_k(scores, k)
+        return rows, scores[rows]
+
+    def get(self, rows: Iterable[int]) -> dict[int, tuple[Chunk, str]]:
+        """Fetch the records and texts of chunks by row.
+
+        Returns:
+            The chunks found, by row; deleted rows are missing.
+        """
+        rows = [int(row) for row in rows]
+        records = []
+        with self._lock:
+            for start in range(0, len(rows), _QUERY_ROWS):
+                batch = rows[start : start + _QUERY_ROWS]
+                placeholders = ", ".join("?" * len(batch))
+                records += self._db.execute(
+                    "SELECT row, doc_id, page, start, end, text FROM chunks "
+                    f"WHERE row IN ({placeholders})",
+                    batch,
+                ).fetchall()
+        return {
+            row: (Chunk(doc_id, page, start, end), text)
+            for row, doc_id, page, start, end, text in records
+        }
+
+
+class StoreRetriever:
+    """Read-only semantic retriever over a `ChunkStore`.
+
+    Searches a corpus ingested ahead of time, e.g. with the ingestion app,
+    alongside the documents attached to a conversation.
+
+    Args:
+        store: The chunk store.
+        embedder: Embedder of the questions; must be the one the store's
+                  chunks were embedded with.
+    """
+
+    def __init__(self, store: ChunkStore, embedder: Embedder):
+        self.store = store
+        self.embedder = embedder
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def search(self, query: str, k: int = 5) -> list[SearchResult]:
+        """Find the chunks most relevant to a query.
+
+        Args:
+            query: The user's question.
+            k: Maximum number of chunks to return.
+
+        Returns:
+            The most relevant chunks, best first.
+        """
+        self.store.refresh()
+        if not len(self.store):
+            return []
+
+        (query_vector,) = self.embedder.embed([query])
+        # Deleted chunks still have embeddings: widen the search until
+        # enough live chunks are found.
+        wanted = k
+        while True:
+            rows, scores = self.store.search(query_vector, wanted)
+            found = self.store.get(rows)
+            results = [
+                SearchResult(*found[row], float(score))
+                for row, score in zip(rows.tolist(), scores, strict=True)
+                if row in found
+            ]
+            if len(results) >= k or len(rows) < wanted:
+                return results[:k]
+            wanted *= 4
+
+
+def _open_truncated(path: Path, size: int):
+    """Open a file for appending, after truncating it to ``size`` bytes."""
+    file = open(path, "a+b")
+    file.truncate(size)
+    file.seek(size)
+    return file
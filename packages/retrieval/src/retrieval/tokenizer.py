@@ -0,0 +1,58 @@
+"""French-aware tokenization for lexical search.
+
+Folds case and accents, drops elisions and common stopwords, applies a
+light plural stemming, and keeps legal references such as "article
+L. 123-4" or "décret n° 2023-1234" searchable as single terms.
+"""
+
+import re
+import unicodedata
+
+# Legal code article references: "L. 123-4", "R123-4-1", "D. 12".
+_ARTICLE = re.compile(r"\b([lrd])\.?\s?(\d+(?:-\d+)*)\b")
+# Hyphenated or dotted numbers are kept whole ("2023-1234", "1.2.3").
+_TOKEN = re.compile(r"\d+(?:[-.]\d+)*|[^\W\d_]+|\d+")
+# Elided articles and pronouns: "l'article", "d'application", "qu'il".
+_ELISION = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’]")
+
+STOPWORDS = frozenset(
+    """
+    a au aux avec ce ces cette dans de des du elle en est et il ils la le les
+    leur leurs mais ne ni nous on ou par pas pour qu que qui sa se ses son sont
+    sur ta te tes ton un une vos votre vous y
+    an and are as at be by for from in is it of on or that the this to with
+    """.split()
+)
+
+
+def fold(text: str) -> str:
+    """Lowercase a text and strip its accents."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _stem(word: str) -> str:
+    """Strip French and English plural endings from longer words."""
+    if len(word) > 4 and word[-1] in "sx":
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Split a text into search terms.
+
+    Args:
+        text: Text of a chunk or a query.
+
+    Returns:
+        The terms, in order. Legal article references produce an extra
+        combined term (e.g. ``"l123-4"``) next to their number.
+    """
+    text = _ELISION.sub(" ", fold(text))
+    terms = [
+        _stem(token)
+        for token in _TOKEN.findall(text)
+        if token not in STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+    terms.extend(prefix + number for prefix, number in _ARTICLE.findall(text))
+    return terms
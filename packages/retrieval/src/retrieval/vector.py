@@ -0,0 +1,181 @@
+"""Vector indexes.
+
+Embeddings are stored in one contiguous float32 matrix, so exact search is
+a single vectorised matrix product. `IVFIndex` adds an inverted-file
+approximation for corpora too large to scan on every query.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+from .embeddings import normalize
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the ``k`` highest scores, best first.
+
+    Uses a partial sort, so it is linear in the number of scores.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """Exact cosine-similarity index with brute-force vectorised search.
+
+    Vectors are normalized on insertion and kept in a contiguous matrix
+    that grows geometrically, so adds are amortised O(1) per vector.
+    Vector ids are their insertion positions.
+    """
+
+    def __init__(self):
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The stored vectors, as a view of the underlying matrix."""
+        return self._vectors[: self._size]
+
+    def add(self, vectors: np.ndarray) -> range:
+        """Add vectors to the index.
+
+        Args:
+            vectors: ``(n, dimension)`` matrix of embeddings.
+
+        Returns:
+            The ids assigned to the vectors.
+
+        Raises:
+            ValueError: If the dimension differs from the indexed vectors.
+        """
+        vectors = normalize(np.atleast_2d(vectors))
+        count, dimension = vectors.shape
+
+        if self._size == 0 and self._vectors.shape[1] != dimension:
+            self._vectors = np.empty((max(count, 64), dimension), dtype=np.float32)
+        elif dimension != self._vectors.shape[1]:
+            raise ValueError(
+                f"Expected vectors of dimension {self._vectors.shape[1]}, "
+                f"got {dimension}"
+            )
+
+        if self._size + count > len(self._vectors):
+            capacity = max(self._size + count, 2 * len(self._vectors))
+            grown = np.empty((capacity, dimension), dtype=np.float32)
+            grown[: self._size] = self.vectors
+            self._vectors = grown
+
+        self._vectors[self._size : self._size + count] = vectors
+        ids = range(self._size, self._size + count)
+        self._size += count
+        return ids
+
+    def keep(self, ids: Sequence[int]) -> None:
+        """Drop every vector but the given ones, renumbered in that order."""
+        self._vectors = self.vectors[np.asarray(ids, dtype=np.int64)]
+        self._size = len(self._vectors)
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Find the ``k`` vectors most similar to a query.
+
+        Args:
+            query: Query embedding, of shape ``(dimension,)``.
+            k: Number of results.
+
+        Returns:
+            The ids of the nearest vectors and their cosine similarities,
+            best first.
+        """
+        if self._size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self.vectors @ normalize(query)
+        ids = top_k(scores, k)
+        return ids, scores[ids]
+
+
+class IVFIndex(VectorIndex):
+    """Approximate index that only scans the clusters nearest to a query.
+
+    Vectors are partitioned with k-means into ``n_lists`` clusters. A query
+    is compared to the cluster centroids, then only to the vectors of the
+    ``n_probe`` nearest clusters, which trades a little recall for a scan
+    of roughly ``n_probe / n_lists`` of the corpus.
+
+    Until `train` is called, searches are exact.
+
+    Args:
+        n_lists: Number of clusters. Defaults to about the square root of
+                 the number of vectors at training time.
+        n_probe: Number of clusters scanned per query.
+        seed: Seed of the k-means initialisation, for reproducible indexes.
+    """
+
+    def __init__(self, n_lists: int | None = None, n_probe: int = 8, seed: int = 0):
+        super().__init__()
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self._centroids: np.ndarray | None = None
+        self._assignments = np.empty(0, dtype=np.int32)
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether the clusters have been computed."""
+        return self._centroids is not None
+
+    def train(self, iterations: int = 10) -> None:
+        """Cluster the indexed vectors with spherical k-means."""
+        vectors = self.vectors
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        if n_lists == 0:
+            return
+
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            # Keep the previous centroid for clusters that became empty.
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+
+        self._centroids = centroids
+        self._assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def add(self, vectors: np.ndarray) -> range:
+        ids = super().add(vectors)
+        if self._centroids is not None:
+            assignments = np.argmax(
+                self.vectors[ids.start :] @ self._centroids.T, axis=1
+            ).astype(np.int32)
+            self._assignments = np.concatenate([self._assignments, assignments])
+        return ids
+
+    def keep(self, ids: Sequence[int]) -> None:
+        super().keep(ids)
+        if self._centroids is not None:
+            self._assignments = self._assignments[np.asarray(ids, dtype=np.int64)]
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        if self._centroids is None:
+            return super().search(query, k)
+
+        query = normalize(query)
+        lists = top_k(self._centroids @ query, self.n_probe)
+        candidates = np.flatnonzero(np.isin(self._assignments, lists))
+        scores = self.vectors[candidates] @ query
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
@@ -0,0 +1,29 @@
+import importlib.util
+import threading
+from pathlib import Path
+
+import pytest
+
+BENCHMARKS = Path(__file__).parents[1] / "benchmarks"
+
+
+@pytest.fixture(scope="session")
+def stub_module():
+    """The embeddings benchmark, which holds the stub embeddings endpoint."""
+    spec = importlib.util.spec_from_file_location(
+        "embeddings_benchmark", BENCHMARKS / "embeddings.py"
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def stub_server(stub_module):
+    """A stub embeddings endpoint answering at once, without random 429s."""
+    server = stub_module.StubServer(latency=0, rate_limited=0, dimension=8)
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
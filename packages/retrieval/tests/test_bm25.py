@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from retrieval import BM25Index, BM25Retriever, tokenize
+
+
+@pytest.mark.parametrize(
+    ("text", "term"),
+    [
+        ("l'article L. 123-4 du code", "l123-4"),
+        ("article R123-4-1", "r123-4-1"),
+        ("Article D. 12", "d12"),
+        ("décret n° 2023-1234", "2023-1234"),
+    ],
+)
+def test_legal_references_are_single_terms(text, term):
+    assert term in tokenize(text)
+
+
+def test_tokenize_folds_accents_elisions_and_plurals():
+    assert tokenize("L'Établissement des dépenses") == ["etablissement", "depense"]
+
+
+@pytest.fixture
+def retriever() -> BM25Retriever:
+    retriever = BM25Retriever(strategy="page")
+    retriever.add_document(
+        "code.pdf",
+        [
+            (1, "Article L. 123-4 : le locataire paie le loyer."),
+            (2, "Article L. 123-5 : le bailleur entretient le logement."),
+            (3, "Article R. 123-4 : les modalités du paiement."),
+        ],
+    )
+    retriever.add_document("decret.pdf", [(1, "Décret n° 2023-1234 fixant les frais.")])
+    return retriever
+
+
+@pytest.mark.parametrize(
+    ("query", "page"),
+    [
+        ("Que dit l'article L123-4 ?", 1),
+        ("article L. 123-5", 2),
+        ("R 123-4", 3),
+    ],
+)
+def test_article_references_match_their_article(retriever, query, page):
+    (best, *_) = retriever.search(query, k=3)
+
+    assert (best.chunk.doc_id, best.chunk.page) == ("code.pdf", page)
+
+
+def test_decree_numbers_match_whole(retriever):
+    (best, *_) = retriever.search("décret 2023-1234", k=3)
+
+    assert best.chunk.doc_id == "decret.pdf"
+    assert retriever.search("2023", k=3) == []
+
+
+def test_adds_and_searches_run_concurrently():
+    index = BM25Index()
+    index.add(["le loyer est payé"] * 1000)
+    errors = []
+
+    def search():
+        try:
+            for _ in range(200):
+                index.search("loyer", 5)
+        except Exception as error:
+            errors.append(error)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    for _ in range(200):
+        index.add(["le loyer est dû"] * 10)
+    searcher.join()
+
+    assert errors == []
+    assert len(index) == 3000
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+import pytest
+from openai import OpenAI
+from retrieval import EmbeddingCache, OpenAIEmbedder, normalize
+
+
+def make_embedder(server, **options) -> OpenAIEmbedder:
+    client = OpenAI(base_url=server.base_url, api_key="stub")
+    return OpenAIEmbedder(client, "stub-embeddings", **options)
+
+
+def test_texts_are_sent_in_batches(stub_module, stub_server):
+    texts = [f"chunk {i}" for i in range(10)]
+
+    vectors = make_embedder(stub_server, batch_size=4).embed(texts + texts[:3])
+
+    assert sorted(stub_server.batch_sizes) == [2, 4, 4]
+    expected = normalize(np.array([stub_module.embed(t, stub_server) for t in texts]))
+    np.testing.assert_allclose(vectors[:10], expected, rtol=1e-6)
+    np.testing.assert_allclose(vectors[10:], expected[:3], rtol=1e-6)
+
+
+def test_rate_limited_requests_wait_for_retry_after(stub_server):
+    stub_server.reject_next = 2
+    stub_server.retry_after = "0.2"
+    # Without the header, the first retry alone would wait at least 5s.
+    embedder = make_embedder(stub_server, backoff=10)
+
+    start = time.perf_counter()
+    vectors = embedder.embed(["chunk"])
+
+    assert 0.4 <= time.perf_counter() - start < 2
+    assert (stub_server.requests, stub_server.rejected) == (3, 2)
+    assert vectors.shape == (1, 8)
+
+
+def test_requests_give_up_after_max_retries(stub_server):
+    stub_server.reject_next = 3
+    stub_server.retry_after = "0"
+    embedder = make_embedder(stub_server, max_retries=2)
+
+    with pytest.raises(Exception, match="Rate limited"):
+        embedder.embed(["chunk"])
+    assert stub_server.requests == 3
+
+
+def test_requests_in_flight_are_bounded(stub_server):
+    stub_server.latency = 0.05
+    embedder = make_embedder(stub_server, batch_size=1, max_concurrency=2)
+
+    embedder.embed([f"chunk {i}" for i in range(8)])
+
+    assert stub_server.max_in_flight == 2
+    assert stub_server.requests == 8
+
+
+def test_cached_texts_are_not_sent_again(stub_server, tmp_path):
+    texts = [f"chunk {i}" for i in range(5)]
+    first = make_embedder(stub_server, cache=EmbeddingCache(directory=tmp_path))
+    vectors = first.embed(texts)
+
+    # A new process reads the vectors back from the disk tier.
+    cache = EmbeddingCache(directory=tmp_path)
+    again = make_embedder(stub_server, cache=cache).embed(texts[:3] + ["new"])
+
+    assert stub_server.requests == 2
+    assert stub_server.batch_sizes == [5, 1]
+    np.testing.assert_allclose(again[:3], vectors[:3])
+    assert (cache.stats.disk_hits, cache.stats.misses) == (3, 1)
+
+
+def test_lookups_past_the_sqlite_parameter_limit(tmp_path):
+    # More keys than SQLite binds in one statement, whatever its build.
+    cache = EmbeddingCache(max_entries=0, directory=tmp_path)
+    keys = [EmbeddingCache.key("model", str(i)) for i in range(300_000)]
+    cache.put_many({key: np.ones(2, dtype=np.float32) for key in keys[:10]})
+
+    assert len(cache.get_many(keys)) == 10
@@ -0,0 +1,22 @@
+import asyncio
+import hashlib
+
+from retrieval import BM25Retriever, HybridRetriever, retrieve_context
+
+
+def test_block_hashes_match_the_blocks_sent():
+    bm25 = BM25Retriever(chunk_size=2000, overlap=0)
+    bm25.add_document("lease.pdf", [(1, "The tenant pays the rent. " * 60)])
+    bm25.add_document("decree.pdf", [(1, "The rent is due monthly.")])
+    retriever = HybridRetriever({"bm25": bm25})
+
+    result = asyncio.run(retrieve_context(retriever, "rent", k=5, max_tokens=200))
+
+    # The lease is cut down to fit the budget: its hash is the one of the
+    # truncated block, not of the whole chunk.
+    assert "tokens omitted" in result.context
+    blocks = result.context.split("\n\n--- Content")[1:]
+    assert result.block_hashes == [
+        hashlib.sha256(f"\n\n--- Content{block}".encode()).hexdigest()[:16]
+        for block in blocks
+    ]
@@ -0,0 +1,78 @@
+import pytest
+from retrieval import (
+    BM25Retriever,
+    HashingEmbedder,
+    IVFIndex,
+    Retriever,
+    VectorRetriever,
+)
+
+
+@pytest.fixture(params=["bm25", "vector"])
+def retriever(request) -> Retriever:
+    if request.param == "bm25":
+        return BM25Retriever(chunk_size=200, overlap=0)
+    return VectorRetriever(HashingEmbedder(), chunk_size=200, overlap=0)
+
+
+def test_retriever_is_abstract():
+    with pytest.raises(TypeError):
+        Retriever()  # ty:ignore[call-non-callable]
+
+
+def test_add_document_replaces_previous_version(retriever):
+    retriever.add_document("a.pdf", [(1, "The tenant pays the rent monthly.")])
+    retriever.add_document("a.pdf", [(1, "The landlord repairs the roof.")])
+
+    results = retriever.search("landlord roof", k=5)
+    assert [r.text for r in results] == ["The landlord repairs the roof."]
+    assert len(retriever) == 1
+
+
+def test_empty_new_version_removes_previous_one(retriever):
+    retriever.add_document("a.pdf", [(1, "The tenant pays the rent monthly.")])
+    retriever.add_document("b.pdf", [(1, "The landlord repairs the roof.")])
+
+    assert retriever.add_document("a.pdf", [(1, "   ")]) == 0
+
+    assert len(retriever) == 1
+    assert all(r.chunk.doc_id == "b.pdf" for r in retriever.search("rent", k=5))
+
+
+def test_removed_chunks_are_compacted(retriever):
+    for i in range(4):
+        retriever.add_document(f"{i}.pdf", [(1, f"Article {i}. The rent is due.")])
+
+    retriever.remove_document("0.pdf")
+    assert len(retriever._removed) == 1
+    retriever.remove_document("1.pdf")
+    assert len(retriever._removed) == 2
+    retriever.remove_document("2.pdf")
+
+    assert retriever._removed == set()
+    assert len(retriever._chunks) == len(retriever) == 1
+    results = retriever.search("rent due", k=5)
+    assert [r.text for r in results] == ["Article 3. The rent is due."]
+
+    retriever.add_document("4.pdf", [(1, "Article 4. The rent is due.")])
+    results = retriever.search("rent due", k=5)
+    assert sorted(r.chunk.doc_id for r in results) == ["3.pdf", "4.pdf"]
+
+
+def test_compaction_keeps_trained_ivf_assignments():
+    index = IVFIndex(n_lists=2, n_probe=1)
+    retriever = VectorRetriever(
+        HashingEmbedder(), index=index, chunk_size=200, overlap=0
+    )
+    texts = ["rent due monthly", "roof repairs", "rent paid late", "roof leaks"]
+    for i, text in enumerate(texts):
+        retriever.add_document(f"{i}.pdf", text)
+    index.train()
+
+    retriever.remove_document("0.pdf")
+    retriever.remove_document("1.pdf")
+    retriever.remove_document("2.pdf")
+
+    assert len(index) == 1
+    (result,) = retriever.search("roof leaks", k=5)
+    assert result.chunk.doc_id == "3.pdf"
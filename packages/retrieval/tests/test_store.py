@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from pdf_context import Chunk
+from retrieval import ChunkStore, HashingEmbedder, StoreRetriever
+
+TEXTS = ["The tenant pays the rent monthly.", "The landlord repairs the roof."]
+
+
+def write_store(directory) -> None:
+    with ChunkStore(directory) as store:
+        chunks = [Chunk("lease.pdf", 1, 0, len(text)) for text in TEXTS]
+        store.append(chunks, TEXTS, HashingEmbedder().embed(TEXTS))
+        store.commit()
+
+
+def test_readonly_store_opens_through_relative_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_store("index")
+
+    with ChunkStore("index/", readonly=True) as store:
+        results = StoreRetriever(store, HashingEmbedder()).search("landlord roof", 1)
+
+    assert [result.text for result in results] == ["The landlord repairs the roof."]
+
+
+def test_readonly_store_sees_only_committed_rows(tmp_path):
+    write_store(tmp_path)
+    with ChunkStore(tmp_path) as writer:
+        writer.append(
+            [Chunk("draft.pdf", 1, 0, 5)], ["Draft"], HashingEmbedder().embed(["Draft"])
+        )
+
+        with ChunkStore(tmp_path, readonly=True) as reader:
+            assert (len(reader), reader.rows) == (2, 2)
+            with pytest.raises(ValueError):
+                reader.commit()
+
+
+def test_missing_readonly_store_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ChunkStore(tmp_path / "missing", readonly=True)
+    assert not (tmp_path / "missing").exists()
+
+
+def test_readonly_store_sees_later_commits(tmp_path):
+    write_store(tmp_path)
+    with ChunkStore(tmp_path, readonly=True) as reader:
+        retriever = StoreRetriever(reader, HashingEmbedder())
+        assert len(retriever.search("rent", 5)) == 2
+
+        with ChunkStore(tmp_path) as writer:
+            text = "The deposit is returned within two months."
+            writer.append(
+                [Chunk("deposit.pdf", 1, 0, len(text))],
+                [text],
+                HashingEmbedder().embed([text]),
+            )
+            writer.commit()
+
+        results = retriever.search("deposit returned", 1)
+        assert [result.text for result in results] == [text]
+        assert reader.rows == 3
+
+
+def test_clear_leaves_mapped_files_to_readers(tmp_path):
+    write_store(tmp_path)
+    with ChunkStore(tmp_path, readonly=True) as reader:
+        query = HashingEmbedder().embed(["rent"])[0]
+        before = reader.search(query, 2)
+
+        with ChunkStore(tmp_path) as writer:
+            writer.clear()
+            text = "The roof was repaired."
+            writer.append(
+                [Chunk("roof.pdf", 1, 0, len(text))],
+                [text],
+                HashingEmbedder().embed([text]),
+            )
+            writer.commit()
+
+        # The old files are still readable, and the store moved to new ones.
+        after = reader.search(query, 2)
+        assert all(np.array_equal(x, y) for x, y in zip(before, after, strict=True))
+        assert sorted(path.name for path in tmp_path.glob("*.bin")) == [
+            "embeddings.1.bin"
+        ]
+
+        results = StoreRetriever(reader, HashingEmbedder()).search("roof", 5)
+        assert [result.text for result in results] == [text]
+        assert reader.generation == 1
+
+
+def test_writer_removes_files_of_an_interrupted_clear(tmp_path):
+    write_store(tmp_path)
+    (tmp_path / "embeddings.1.bin").write_bytes(b"partial")
+
+    with ChunkStore(tmp_path) as store:
+        assert (store.generation, len(store)) == (0, 2)
+
+    assert not (tmp_path / "embeddings.1.bin").exists()
+
+
+def test_get_past_the_sqlite_parameter_limit(tmp_path):
+    # More keys than SQLite binds in one statement, whatever its build.
+    write_store(tmp_path)
+    with ChunkStore(tmp_path, readonly=True) as store:
+        assert len(store.get(range(300_000))) == 2
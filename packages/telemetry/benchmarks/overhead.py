@@ -0,0 +1,61 @@
+"""Benchmark the cost of instrumentation, disabled and enabled.
+
+Times a span, a histogram observation and a counter increment per call,
+with tracing disabled, aggregating in memory only, and exporting to a JSONL
+file, to check that instrumentation left in hot paths is negligible.
+
+Usage:
+    uv run python benchmarks/overhead.py --calls 100000
+"""
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from telemetry import JsonlExporter, Tracer, count, observe, set_tracer, span
+
+
+def per_call(function: Callable[[], None], calls: int) -> float:
+    """Average duration of a call, in nanoseconds."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def in_span() -> None:
+    with span("bench.span", size=1):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    operations = {
+        "span": in_span,
+        "observe": lambda: observe("bench.observe", 0.1, stage="a"),
+        "count": lambda: count("bench.count", stage="a"),
+        "baseline": lambda: None,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        tracers = {
+            "disabled": None,
+            "in memory": Tracer(),
+            "jsonl": Tracer([JsonlExporter(Path(directory) / "bench.jsonl")]),
+        }
+
+        print(f"{'tracer':<10} " + " ".join(f"{name:>9}" for name in operations))
+        for tracer_name, tracer in tracers.items():
+            set_tracer(tracer)
+            timings = [per_call(f, args.calls) for f in operations.values()]
+            print(f"{tracer_name:<10} " + " ".join(f"{ns:>7,.0f}ns" for ns in timings))
+        set_tracer(None)
+
+
+if __name__ == "__main__":
+    main()
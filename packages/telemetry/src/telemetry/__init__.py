@@ -0,0 +1,66 @@
+"""Telemetry - Request tracing and latency metrics for the chat pipeline.
+
+This package times the stages of a question (upload, extraction, retrieval,
+prompt assembly, generation, tools) with spans, histograms and counters,
+and exports them to OpenTelemetry, a Prometheus endpoint or a JSONL file.
+Tracing is disabled until `configure` is called with an exporter, and
+costs next to nothing until then.
+
+Example usage:
+    from telemetry import configure, count, observe, span
+
+    configure("prometheus")  # or set TELEMETRY=auto|otel|prometheus|jsonl
+
+    with span("pdf.extract", file="report.pdf") as s:
+        pages = extract(path)
+        s.set(pages=len(pages))
+
+    observe("llm.time_to_first_token", 0.42, model="gpt-4")
+    count("chat.questions")
+
+    @traced("context.build")
+    def build_context(documents): ...
+"""
+
+from .exporters import (
+    Exporter,
+    JsonlExporter,
+    OpenTelemetryExporter,
+    PrometheusExporter,
+    opentelemetry_available,
+)
+from .metrics import Histogram, Registry
+from .tracing import (
+    Span,
+    Tracer,
+    configure,
+    count,
+    get_tracer,
+    measure_stream,
+    observe,
+    set_tracer,
+    span,
+    traced,
+)
+
+__all__ = [
+    "configure",
+    "span",
+    "count",
+    "observe",
+    "traced",
+    "measure_stream",
+    "get_tracer",
+    "set_tracer",
+    "Tracer",
+    "Span",
+    "Registry",
+    "Histogram",
+    "Exporter",
+    "JsonlExporter",
+    "PrometheusExporter",
+    "OpenTelemetryExporter",
+    "opentelemetry_available",
+]
+
+__version__ = "0.1.0"
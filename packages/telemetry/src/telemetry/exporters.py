@@ -0,0 +1,242 @@
+"""Destinations of spans and metrics.
+
+- `OpenTelemetryExporter` forwards spans and metrics to the OpenTelemetry
+  API, for whichever SDK and exporters the application configures.
+- `PrometheusExporter` serves the aggregated metrics on a local HTTP
+  endpoint for Prometheus to scrape.
+- `JsonlExporter` appends every span and measurement to a JSONL file.
+"""
+
+import importlib.util
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .metrics import Labels, Registry
+
+if TYPE_CHECKING:
+    from .tracing import Span
+
+logger = logging.getLogger(__name__)
+
+
+def opentelemetry_available() -> bool:
+    """Whether the OpenTelemetry API is installed."""
+    return importlib.util.find_spec("opentelemetry") is not None
+
+
+class Exporter:
+    """Receives spans and metrics as they are recorded.
+
+    Every method does nothing by default; exporters override the ones they
+    need. They are called synchronously by the instrumented code, so they
+    must be fast.
+    """
+
+    def span_started(self, span: "Span") -> None:
+        """Called when a span is entered."""
+
+    def span_ended(self, span: "Span") -> None:
+        """Called when a span is exited, with its duration set."""
+
+    def counted(self, name: str, value: float, labels: Labels) -> None:
+        """Called when a value is added to a counter."""
+
+    def observed(self, name: str, value: float, labels: Labels) -> None:
+        """Called when a value is recorded in a histogram."""
+
+    def close(self) -> None:
+        """Flush and release resources."""
+
+
+class JsonlExporter(Exporter):
+    """Append spans and measurements to a JSONL file, one record per line.
+
+    Args:
+        path: File to append to; its directory is created if needed.
+    """
+
+    def __init__(self, path: str | Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def span_ended(self, span: "Span") -> None:
+        self._write(
+            {
+                "type": "span",
+                "name": span.name,
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "start": span.start,
+                "duration": span.duration,
+                "attributes": span.attributes,
+                "error": span.error,
+            }
+        )
+
+    def counted(self, name: str, value: float, labels: Labels) -> None:
+        self._write({"type": "counter", "name": name, "value": value}, labels)
+
+    def observed(self, name: str, value: float, labels: Labels) -> None:
+        if name == "span.duration":
+            return  # Already in the span record.
+        self._write({"type": "histogram", "name": name, "value": value}, labels)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _write(self, record: dict[str, Any], labels: Labels = ()) -> None:
+        if record["type"] != "span":
+            record["time"] = time.time()
+            if labels:
+                record["labels"] = dict(labels)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+
+class PrometheusExporter(Exporter):
+    """Serve the aggregated metrics in the Prometheus text format.
+
+    Starts an HTTP server in a daemon thread, answering ``GET /metrics``.
+    If the port is already taken (e.g. by another worker process of the
+    same app), a warning is logged and metrics are only kept in memory.
+
+    Args:
+        registry: Metrics to serve.
+        port: Port to listen on; 0 picks a free one.
+        host: Interface to listen on. Local only by default.
+    """
+
+    def __init__(self, registry: Registry, port: int = 9464, host: str = "127.0.0.1"):
+        self.registry = registry
+        self.server: ThreadingHTTPServer | None = None
+        try:
+            self.server = _MetricsServer((host, port), registry)
+        except OSError as e:
+            logger.warning("Cannot serve metrics on %s:%d: %s", host, port, e)
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int | None:
+        """Port the endpoint listens on, or None if it couldn't start."""
+        return self.server.server_address[1] if self.server is not None else None
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class _MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], registry: Registry):
+        super().__init__(address, _MetricsHandler)
+        self.registry = registry
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server: _MetricsServer
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        content = self.server.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class OpenTelemetryExporter(Exporter):
+    """Forward spans and metrics to the OpenTelemetry API.
+
+    Spans become OpenTelemetry spans, nested under the active OpenTelemetry
+    span (e.g. an instrumented HTTP request), counters become counters and
+    histograms become histograms. Where they are sent is up to the SDK the
+    application configures (e.g. with ``opentelemetry-instrument`` and the
+    ``OTEL_*`` environment variables); without one, the API drops them.
+
+    Args:
+        name: Instrumentation scope of the tracer and meter.
+    """
+
+    def __init__(self, name: str = "rag-facile"):
+        from opentelemetry import context, metrics, trace
+
+        self._context = context
+        self._trace = trace
+        self._tracer = trace.get_tracer(name)
+        self._meter = metrics.get_meter(name)
+        self._spans: dict[str, tuple[Any, Any]] = {}
+        self._counters: dict[str, Any] = {}
+        self._histograms: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def span_started(self, span: "Span") -> None:
+        otel_span = self._tracer.start_span(
+            span.name, attributes=_otel_attributes(span.attributes)
+        )
+        token = self._context.attach(self._trace.set_span_in_context(otel_span))
+        self._spans[span.span_id] = (otel_span, token)
+
+    def span_ended(self, span: "Span") -> None:
+        entry = self._spans.pop(span.span_id, None)
+        if entry is None:
+            return
+        otel_span, token = entry
+        otel_span.set_attributes(_otel_attributes(span.attributes))
+        if span.error is not None:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+            otel_span.set_attribute("error", span.error)
+        otel_span.end()
+        self._context.detach(token)
+
+    def counted(self, name: str, value: float, labels: Labels) -> None:
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.get(name)
+                if counter is None:
+                    counter = self._counters[name] = self._meter.create_counter(name)
+        counter.add(value, dict(labels))
+
+    def observed(self, name: str, value: float, labels: Labels) -> None:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._meter.create_histogram(
+                        name, unit="1/s" if name.endswith("_per_second") else "s"
+                    )
+                    self._histograms[name] = histogram
+        histogram.record(value, dict(labels))
+
+
+def _otel_attributes(attributes: dict[str, Any]) -> dict[str, Any]:
+    """Convert attribute values to the types OpenTelemetry accepts."""
+    return {
+        key: value if isinstance(value, str | bool | int | float) else str(value)
+        for key, value in attributes.items()
+        if value is not None
+    }
@@ -0,0 +1,166 @@
+"""In-process metrics: counters and histograms.
+
+Metrics are identified by a dotted name (``"llm.time_to_first_token"``) and
+a set of labels. The registry keeps one series per name and label values,
+and renders them in the Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+
+# Upper bounds of the buckets of duration histograms, in seconds: from 1 ms
+# to 2 minutes, covering page parsing as well as whole answers.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+# Bucket bounds of rate histograms, in units per second.
+RATE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0)
+
+# Histograms that aren't durations in seconds.
+NAMED_BUCKETS = {"llm.tokens_per_second": RATE_BUCKETS}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def labels_key(labels: Mapping[str, object]) -> Labels:
+    """Canonical, hashable form of a set of labels."""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+@dataclass
+class Histogram:
+    """Distribution of observed values, in cumulative buckets.
+
+    Attributes:
+        buckets: Upper bounds of the buckets, in increasing order.
+        counts: Number of observations per bucket (not cumulative), plus
+                one for the values above the last bound.
+        sum: Sum of the observed values.
+        count: Number of observations.
+    """
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile (0 to 1) from the buckets.
+
+        Returns the upper bound of the bucket holding the quantile, or the
+        last bound if it is above it.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Registry:
+    """Thread-safe store of counters and histograms.
+
+    Args:
+        buckets: Bucket bounds of the histograms.
+        named_buckets: Bucket bounds of specific histograms, by name.
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        named_buckets: Mapping[str, tuple[float, ...]] = NAMED_BUCKETS,
+    ):
+        self.buckets = buckets
+        self.named_buckets = dict(named_buckets)
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float, labels: Labels) -> None:
+        """Add a value to a counter."""
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        """Record a value in a histogram."""
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                buckets = self.named_buckets.get(name, self.buckets)
+                histogram = series[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render_prometheus(self) -> str:
+        """Render every series in the Prometheus text exposition format."""
+        with self._lock:
+            return "".join(self._render())
+
+    def _render(self) -> Iterator[str]:
+        for name, series in sorted(self.counters.items()):
+            metric = f"{_metric_name(name)}_total"
+            yield f"# TYPE {metric} counter\n"
+            for labels, value in sorted(series.items()):
+                yield f"{metric}{_render_labels(labels)} {value:g}\n"
+
+        for name, series in sorted(self.histograms.items()):
+            metric = _metric_name(name)
+            yield f"# TYPE {metric} histogram\n"
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = labels + (("le", f"{bound:g}"),)
+                    yield f"{metric}_bucket{_render_labels(le)} {cumulative}\n"
+                le = labels + (("le", "+Inf"),)
+                yield f"{metric}_bucket{_render_labels(le)} {histogram.count}\n"
+                yield f"{metric}_sum{_render_labels(labels)} {histogram.sum:g}\n"
+                yield f"{metric}_count{_render_labels(labels)} {histogram.count}\n"
+
+
+def _metric_name(name: str) -> str:
+    """Prometheus name of a dotted metric name."""
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _render_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{_metric_name(n)}="{v}"' for n, v in escaped) + "}"
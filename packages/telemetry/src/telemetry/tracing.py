@@ -0,0 +1,339 @@
+"""Spans, metrics and the process-wide tracer.
+
+Instrumented code calls the module-level `span`, `count` and `observe`
+functions. Until `configure` (or `set_tracer`) installs a tracer they do
+nothing: `span` returns a shared no-op context manager, so instrumentation
+left in hot paths costs a function call and an attribute check.
+"""
+
+import functools
+import inspect
+import os
+import random
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Sequence
+from contextvars import ContextVar
+from typing import Any
+
+from .exporters import (
+    Exporter,
+    JsonlExporter,
+    OpenTelemetryExporter,
+    PrometheusExporter,
+    opentelemetry_available,
+)
+from .metrics import Registry, labels_key
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation, used as a context manager.
+
+    Spans opened inside another span, in the same thread or task, are its
+    children. An exception raised inside the span is recorded in ``error``
+    and propagated.
+
+    Attributes:
+        name: Dotted name of the operation, e.g. ``"pdf.extract"``.
+        attributes: Details of the operation, set at creation or with `set`.
+        trace_id: Identifier shared by a span and its descendants.
+        span_id: Identifier of the span.
+        parent_id: Identifier of the enclosing span, if any.
+        start: Wall-clock start time, in seconds since the epoch.
+        duration: Duration in seconds, once the span has ended.
+        error: Representation of the exception that ended the span, if any.
+    """
+
+    __slots__ = (
+        "name",
+        "attributes",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "duration",
+        "error",
+        "_tracer",
+        "_started",
+        "_token",
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = ""
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id: str | None = None
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: str | None = None
+        self._tracer = tracer
+        self._started = 0.0
+        self._token = None
+
+    def set(self, **attributes: Any) -> None:
+        """Add or update attributes of the span."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        else:
+            self.trace_id = f"{random.getrandbits(128):032x}"
+        self._token = _current_span.set(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._tracer._span_started(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self._started
+        if exc is not None:
+            self.error = repr(exc)
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self._tracer._span_ended(self)
+
+
+class _NoopSpan:
+    """Span returned while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Records spans and metrics, and forwards them to exporters.
+
+    Every metric, and the duration of every span (as the ``span.duration``
+    histogram, labelled with the span name), is also aggregated in
+    ``registry``.
+
+    Args:
+        exporters: Destinations of the spans and metrics.
+        registry: Aggregated metrics. A new registry by default.
+    """
+
+    def __init__(
+        self, exporters: Sequence[Exporter] = (), registry: Registry | None = None
+    ):
+        self.exporters = list(exporters)
+        self.registry = registry if registry is not None else Registry()
+
+    def span(self, name: str, **attributes: Any) -> Span:
+        """Create a span, to be used as a context manager."""
+        return Span(self, name, attributes)
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Add a value to a counter."""
+        key = labels_key(labels)
+        self.registry.count(name, value, key)
+        for exporter in self.exporters:
+            exporter.counted(name, value, key)
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Record a value, usually a duration in seconds, in a histogram."""
+        key = labels_key(labels)
+        self.registry.observe(name, value, key)
+        for exporter in self.exporters:
+            exporter.observed(name, value, key)
+
+    def close(self) -> None:
+        """Flush and close the exporters."""
+        for exporter in self.exporters:
+            exporter.close()
+
+    def _span_started(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.span_started(span)
+
+    def _span_ended(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.span_ended(span)
+        self.observe("span.duration", span.duration, span=span.name)
+
+
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer | None:
+    """Return the process-wide tracer, or None while tracing is disabled."""
+    return _tracer
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """Install the process-wide tracer, closing the previous one.
+
+    Pass None to disable tracing.
+    """
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    if previous is not None and previous is not tracer:
+        previous.close()
+
+
+def configure(exporter: str | None = None) -> Tracer | None:
+    """Install a tracer exporting to the destination set in the environment.
+
+    Does nothing if a tracer is already installed, so every entry point of
+    an application can call it.
+
+    Args:
+        exporter: One of ``"off"``, ``"auto"``, ``"otel"``, ``"prometheus"``
+                  or ``"jsonl"``. Defaults to the ``TELEMETRY`` variable,
+                  itself ``"off"`` by default. ``"auto"`` exports to
+                  OpenTelemetry when it is installed, and otherwise to a
+                  JSONL file if ``TELEMETRY_FILE`` is set, or to a
+                  Prometheus endpoint. The endpoint listens on
+                  ``TELEMETRY_PORT`` (9464), and the file defaults to
+                  ``telemetry.jsonl``.
+
+    Returns:
+        The installed tracer, or None if tracing is disabled.
+
+    Raises:
+        ValueError: If the exporter is unknown.
+    """
+    if _tracer is not None:
+        return _tracer
+
+    exporter = (exporter or os.getenv("TELEMETRY") or "off").lower()
+    if exporter == "off":
+        return None
+    if exporter == "auto":
+        if opentelemetry_available():
+            exporter = "otel"
+        elif os.getenv("TELEMETRY_FILE"):
+            exporter = "jsonl"
+        else:
+            exporter = "prometheus"
+
+    registry = Registry()
+    if exporter == "otel":
+        exporters: list[Exporter] = [OpenTelemetryExporter()]
+    elif exporter == "prometheus":
+        port = int(os.getenv("TELEMETRY_PORT", "9464"))
+        exporters = [PrometheusExporter(registry, port)]
+    elif exporter == "jsonl":
+        exporters = [JsonlExporter(os.getenv("TELEMETRY_FILE", "telemetry.jsonl"))]
+    else:
+        raise ValueError(f"Unknown telemetry exporter: {exporter}")
+
+    set_tracer(Tracer(exporters, registry))
+    return _tracer
+
+
+def span(name: str, **attributes: Any) -> Span | _NoopSpan:
+    """Time an operation, as a context manager.
+
+    Example:
+        with span("pdf.extract", pages=12) as s:
+            text = extract()
+            s.set(chars=len(text))
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.span(name, **attributes)
+
+
+def traced[F: Callable[..., Any]](name: str | None = None) -> Callable[[F], F]:
+    """Decorate a function or coroutine function to run it in a span.
+
+    Args:
+        name: Name of the span. Defaults to the function's qualified name.
+    """
+
+    def decorate(function: F) -> F:
+        span_name = name or getattr(function, "__qualname__", repr(function))
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await function(*args, **kwargs)
+                with _tracer.span(span_name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper  # ty:ignore[invalid-return-type]
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with _tracer.span(span_name):
+                return function(*args, **kwargs)
+
+        return wrapper  # ty:ignore[invalid-return-type]
+
+    return decorate
+
+
+def count(name: str, value: float = 1, **labels: Any) -> None:
+    """Add a value to a counter of the process-wide tracer, if any."""
+    if _tracer is not None:
+        _tracer.count(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """Record a value in a histogram of the process-wide tracer, if any."""
+    if _tracer is not None:
+        _tracer.observe(name, value, **labels)
+
+
+def measure_stream(
+    stream: AsyncIterable[str], start: float | None = None, **labels: Any
+) -> AsyncIterable[str]:
+    """Measure a stream of text deltas as it is consumed.
+
+    Records ``llm.time_to_first_token`` and ``llm.tokens_per_second``
+    (counting one token per non-empty delta, from the first one) in
+    histograms, and the tokens in the ``llm.tokens`` counter. Returns the
+    stream unchanged while tracing is disabled.
+
+    Args:
+        stream: Text deltas of a completion.
+        start: `time.perf_counter` value the time to first token is measured
+               from, typically taken before sending the request. Defaults to
+               the start of the iteration.
+        labels: Labels of the metrics, e.g. the model.
+    """
+    if _tracer is None:
+        return stream
+    return _measured(stream, start, labels)
+
+
+async def _measured(
+    stream: AsyncIterable[str], start: float | None, labels: dict[str, Any]
+) -> AsyncIterator[str]:
+    start = time.perf_counter() if start is None else start
+    first = None
+    tokens = 0
+    try:
+        async for text in stream:
+            if text:
+                if first is None:
+                    first = time.perf_counter()
+                    observe("llm.time_to_first_token", first - start, **labels)
+                tokens += 1
+            yield text
+    finally:
+        if first is not None:
+            elapsed = time.perf_counter() - first
+            if tokens > 1 and elapsed > 0:
+                observe("llm.tokens_per_second", (tokens - 1) / elapsed, **labels)
+            count("llm.tokens", tokens, **labels)
@@ -0,0 +1,191 @@
+import asyncio
+import json
+
+import pytest
+from telemetry import (
+    JsonlExporter,
+    Registry,
+    Tracer,
+    configure,
+    count,
+    get_tracer,
+    measure_stream,
+    observe,
+    set_tracer,
+    span,
+    traced,
+)
+from telemetry.metrics import labels_key
+
+
+@pytest.fixture(autouse=True)
+def no_tracer(monkeypatch):
+    monkeypatch.delenv("TELEMETRY", raising=False)
+    set_tracer(None)
+    yield
+    set_tracer(None)
+
+
+@pytest.fixture
+def tracer(tmp_path) -> Tracer:
+    tracer = Tracer([JsonlExporter(tmp_path / "telemetry.jsonl")])
+    set_tracer(tracer)
+    return tracer
+
+
+def records(tracer: Tracer) -> list[dict]:
+    (exporter,) = tracer.exporters
+    assert isinstance(exporter, JsonlExporter)
+    return [json.loads(line) for line in exporter.path.read_text().splitlines()]
+
+
+def test_registry_renders_counters_and_histograms():
+    registry = Registry(buckets=(0.1, 1.0))
+    registry.count("chat.questions", 1, labels_key({"app": "reflex"}))
+    registry.count("chat.questions", 2, labels_key({"app": "reflex"}))
+    registry.observe("llm.latency", 0.05, ())
+    registry.observe("llm.latency", 0.5, ())
+    registry.observe("llm.latency", 5.0, ())
+
+    assert registry.render_prometheus() == (
+        "# TYPE chat_questions_total counter\n"
+        'chat_questions_total{app="reflex"} 3\n'
+        "# TYPE llm_latency histogram\n"
+        'llm_latency_bucket{le="0.1"} 1\n'
+        'llm_latency_bucket{le="1"} 2\n'
+        'llm_latency_bucket{le="+Inf"} 3\n'
+        "llm_latency_sum 5.55\n"
+        "llm_latency_count 3\n"
+    )
+
+
+def test_registry_escapes_label_values():
+    registry = Registry()
+    registry.count("errors", 1, labels_key({"message": 'a "quoted"\nline\\'}))
+
+    assert 'errors_total{message="a \\"quoted\\"\\nline\\\\"} 1\n' in (
+        registry.render_prometheus()
+    )
+
+
+def test_nothing_is_recorded_before_configure(tmp_path):
+    assert configure() is None
+    assert get_tracer() is None
+
+    with span("pdf.extract", pages=3) as s:
+        s.set(chars=10)
+    count("chat.questions")
+    observe("llm.latency", 0.1)
+
+    @traced("context.build")
+    def build() -> str:
+        return "context"
+
+    async def tokens():
+        yield "token"
+
+    assert build() == "context"
+    stream = tokens()
+    assert measure_stream(stream) is stream
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_configure_installs_a_single_tracer(tmp_path, monkeypatch):
+    monkeypatch.setenv("TELEMETRY_FILE", str(tmp_path / "telemetry.jsonl"))
+
+    tracer = configure("jsonl")
+
+    assert isinstance(tracer, Tracer)
+    assert get_tracer() is tracer
+    assert configure("prometheus") is tracer
+
+    set_tracer(None)
+    with pytest.raises(ValueError):
+        configure("statsd")
+
+
+def test_nested_traced_calls_are_child_spans(tracer):
+    @traced("retrieval.search")
+    def search() -> None:
+        with span("retrieval.bm25"):
+            pass
+
+    @traced()
+    async def answer() -> None:
+        search()
+
+    asyncio.run(answer())
+
+    bm25, search_span, answer_span = records(tracer)
+    assert [bm25["name"], search_span["name"]] == ["retrieval.bm25", "retrieval.search"]
+    assert answer_span["name"].endswith("answer")
+    assert answer_span["parent_id"] is None
+    assert search_span["parent_id"] == answer_span["span_id"]
+    assert bm25["parent_id"] == search_span["span_id"]
+    assert (
+        len({bm25["trace_id"], search_span["trace_id"], answer_span["trace_id"]}) == 1
+    )
+    assert len({bm25["span_id"], search_span["span_id"], answer_span["span_id"]}) == 3
+
+
+def test_sibling_traces_are_independent(tracer):
+    with span("first"):
+        pass
+    with span("second"):
+        pass
+
+    first, second = records(tracer)
+    assert first["trace_id"] != second["trace_id"]
+    assert first["parent_id"] is second["parent_id"] is None
+
+
+def test_jsonl_exporter_writes_spans_and_metrics(tracer):
+    with pytest.raises(RuntimeError):
+        with span("pdf.extract", file="bail.pdf") as s:
+            s.set(pages=3)
+            raise RuntimeError("corrupt")
+    count("chat.questions", app="reflex")
+    observe("llm.latency", 0.25, model="albert")
+
+    extract, counter, histogram = records(tracer)
+    assert extract["type"] == "span"
+    assert extract["attributes"] == {"file": "bail.pdf", "pages": 3}
+    assert extract["error"] == "RuntimeError('corrupt')"
+    assert extract["duration"] >= 0
+    assert counter["type"] == "counter"
+    assert (counter["name"], counter["value"]) == ("chat.questions", 1)
+    assert counter["labels"] == {"app": "reflex"}
+    assert histogram["type"] == "histogram"
+    assert (histogram["name"], histogram["value"]) == ("llm.latency", 0.25)
+    assert histogram["labels"] == {"model": "albert"}
+    # Span durations are aggregated, but not written twice.
+    assert 'span_duration_count{span="pdf.extract"} 1' in (
+        tracer.registry.render_prometheus()
+    )
+
+
+def test_exporters_are_closed_when_the_tracer_is_replaced(tracer):
+    (exporter,) = tracer.exporters
+    assert isinstance(exporter, JsonlExporter)
+
+    set_tracer(Tracer())
+    count("chat.questions")
+
+    assert exporter._file.closed
+
+
+def test_measure_stream_records_first_token_and_rate(tracer):
+    async def tokens():
+        for token in ["Le ", "", "loyer ", "est ", "dû."]:
+            yield token
+
+    async def consume() -> list[str]:
+        stream = measure_stream(tokens(), model="albert")
+        return [token async for token in stream]
+
+    assert asyncio.run(consume()) == ["Le ", "", "loyer ", "est ", "dû."]
+
+    histograms = tracer.registry.histograms
+    key = labels_key({"model": "albert"})
+    assert histograms["llm.time_to_first_token"][key].count == 1
+    assert tracer.registry.counters["llm.tokens"][key] == 4